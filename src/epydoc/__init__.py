@@ -158,8 +158,9 @@ the `docwriter` package.  See the submodule list for more
 information about the submodules and subpackages.
 
 :group User Interface: gui, cli
-:group Basic Data Types: apidoc
-:group Documentation Generation: docbuilder, docintrospecter, docparser
+:group Basic Data Types: apidoc, snapshot
+:group Documentation Generation: docbuilder, docintrospecter, docparser,
+    buildcache
 :group Docstring Processing: docstringparser, markup
 :group Output Generation: docwriter
 :group Completeness Checking: checker
@@ -213,10 +214,27 @@ __url__ = 'http://epydoc.sourceforge.net'
 __license__ = 'IBM Open Source License'
 """The license governing the use and distribution of epydoc"""
 
+import os as _os
+
 # [xx] this should probably be a private variable:
 DEBUG = False
 """True if debugging is turned on."""
 
+COMPACT_APIDOCS = bool(_os.environ.get('EPYDOC_COMPACT_APIDOCS'))
+"""True if `APIDoc <epydoc.apidoc.APIDoc>` objects should store their
+attributes in compact (slot-based) storage, rather than in an instance
+dictionary.  This reduces epydoc's memory use when documenting large
+projects, but makes attribute access slower.  It must be set before
+`epydoc.apidoc` is imported; it defaults to true if the
+``EPYDOC_COMPACT_APIDOCS`` environment variable is set."""
+
+TEMPLATE_CACHE = _os.environ.get('EPYDOC_TEMPLATE_CACHE') or None
+"""The directory where the HTML writer caches its compiled templates
+(as bytecode), or ``None`` to compile them each time
+`epydoc.docwriter.html` is imported.  It must be set before that
+module is imported; it defaults to the value of the
+``EPYDOC_TEMPLATE_CACHE`` environment variable."""
+
 # Changes needed for docs:
 #   - document the method for deciding what's public/private
 #   - epytext: fields are defined slightly differently (@group)
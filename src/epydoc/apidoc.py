@@ -38,7 +38,7 @@ __docformat__ = 'epytext en'
 ## Imports
 ######################################################################
 
-import types, re, os.path, pickle
+import types, re, os.path, pickle, UserDict
 from epydoc import log
 import epydoc
 import __builtin__
@@ -50,7 +50,7 @@ import epydoc.markup.pyval_repr
 # Dotted Names
 ######################################################################
 
-class DottedName:
+class DottedName(object):
     """
     A sequence of identifiers, separated by periods, used to name a
     Python variable, value, or argument.  The identifiers that make up
@@ -61,7 +61,13 @@ class DottedName:
         epydoc.apidoc.DottedName
         >>> name[1]
         'api_doc'
+
+    C{DottedName}s are immutable, and are X{interned}: constructing a
+    C{DottedName} that is equal to an existing C{DottedName} (with
+    the same string types) returns the existing object.
     """
+    __slots__ = ('_identifiers', '_hash')
+
     UNREACHABLE = "??"
     _IDENTIFIER_RE = re.compile("""(?x)
         (%s |             # UNREACHABLE marker, or..
@@ -79,11 +85,18 @@ class DottedName:
         its arguments is not a valid dotted name.
         """
 
-    _ok_identifiers = set()
-    """A cache of identifier strings that have been checked against
-    _IDENTIFIER_RE and found to be acceptable."""
-    
-    def __init__(self, *pieces, **options):
+    _interned = {}
+    """A table mapping identifier tuples to the C{DottedName}s that
+    use them.  (This table is never cleared: names are small, and
+    the names that are used by a run are needed until its output has
+    been written.)"""
+
+    _string_names = {}
+    """A cache mapping strings that have been split into identifiers
+    to the resulting names.  Only strings whose identifiers all match
+    _IDENTIFIER_RE are cached."""
+
+    def __new__(cls, *pieces, **options):
         """
         Construct a new dotted name from the given sequence of pieces,
         each of which can be either a C{string} or a C{DottedName}.
@@ -102,31 +115,91 @@ class DottedName:
         @kwparam strict: if true, then raise an L{InvalidDottedName}
         if the given name is invalid.
         """
-        if len(pieces) == 1 and isinstance(pieces[0], tuple):
-            self._identifiers = pieces[0] # Optimization
-            return
-        if len(pieces) == 0:
+        if len(pieces) == 1:
+            piece = pieces[0]
+            if type(piece) is tuple:
+                identifiers = piece # Optimization
+            elif isinstance(piece, basestring):
+                name = cls._string_names.get(piece)
+                if (name is not None and
+                    type(name._identifiers[0]) is type(piece)):
+                    return name
+                identifiers = tuple(piece.split('.'))
+                for subpiece in identifiers:
+                    if not cls._IDENTIFIER_RE.match(subpiece):
+                        # Invalid names are not cached, so they are
+                        # reported (or rejected) every time.
+                        return cls._intern(
+                            cls._split(piece, options.get('strict')))
+                name = cls._intern(identifiers)
+                cls._string_names[piece] = name
+                return name
+            elif isinstance(piece, DottedName):
+                return piece
+            else:
+                identifiers = cls._join(pieces, options.get('strict'))
+        elif len(pieces) == 0:
             raise DottedName.InvalidDottedName('Empty DottedName')
-        self._identifiers = []
+        else:
+            identifiers = cls._join(pieces, options.get('strict'))
+        return cls._intern(identifiers)
+
+    def _intern(cls, identifiers):
+        """
+        Return the interned C{DottedName} for the given tuple of
+        identifiers, creating it if necessary.
+        """
+        name = cls._interned.get(identifiers)
+        # Names that differ only in their string types (str vs
+        # unicode) are kept separate, since they display differently.
+        if name is not None and (
+            name._identifiers is identifiers or
+            map(type, name._identifiers) == map(type, identifiers)):
+            return name
+        new_name = object.__new__(cls)
+        new_name._identifiers = identifiers
+        new_name._hash = hash(identifiers)
+        if name is None:
+            cls._interned[identifiers] = new_name
+        return new_name
+    _intern = classmethod(_intern)
+
+    def _split(cls, piece, strict=False):
+        """
+        Return a tuple of the identifiers in the dotted string
+        C{piece}, checking that each one is valid.
+        """
+        identifiers = tuple(piece.split('.'))
+        for subpiece in identifiers:
+            if not cls._IDENTIFIER_RE.match(subpiece):
+                if strict:
+                    raise DottedName.InvalidDottedName(
+                        'Bad identifier %r' % (piece,))
+                else:
+                    log.warning("Identifier %r looks suspicious; "
+                                "using it anyway." % piece)
+        return identifiers
+    _split = classmethod(_split)
+
+    def _join(cls, pieces, strict=False):
+        """
+        Return a tuple of the identifiers in the given sequence of
+        C{string}s and C{DottedName}s.
+        """
+        identifiers = ()
         for piece in pieces:
             if isinstance(piece, DottedName):
-                self._identifiers += piece._identifiers
+                identifiers += piece._identifiers
             elif isinstance(piece, basestring):
-                for subpiece in piece.split('.'):
-                    if piece not in self._ok_identifiers:
-                        if not self._IDENTIFIER_RE.match(subpiece):
-                            if options.get('strict'):
-                                raise DottedName.InvalidDottedName(
-                                    'Bad identifier %r' % (piece,))
-                            else:
-                                log.warning("Identifier %r looks suspicious; "
-                                            "using it anyway." % piece)
-                        self._ok_identifiers.add(piece)
-                    self._identifiers.append(subpiece)
+                identifiers += cls._split(piece, strict)
             else:
                 raise TypeError('Bad identifier %r: expected '
                                 'DottedName or str' % (piece,))
-        self._identifiers = tuple(self._identifiers)
+        return identifiers
+    _join = classmethod(_join)
+
+    def __reduce__(self):
+        return (DottedName, (self._identifiers,))
 
     def __repr__(self):
         idents = [`ident` for ident in self._identifiers]
@@ -147,8 +220,10 @@ class DottedName:
         Return a new C{DottedName} whose identifier sequence is formed
         by adding C{other}'s identifier sequence to C{self}'s.
         """
-        if isinstance(other, (basestring, DottedName)):
-            return DottedName(self, other)
+        if isinstance(other, basestring):
+            other = DottedName(other)
+        if isinstance(other, DottedName):
+            return DottedName._intern(self._identifiers + other._identifiers)
         else:
             return DottedName(self, *other)
 
@@ -177,7 +252,7 @@ class DottedName:
             return self._identifiers[i]
 
     def __hash__(self):
-        return hash(self._identifiers)
+        return self._hash
 
     def __cmp__(self, other):
         """
@@ -190,6 +265,34 @@ class DottedName:
             return -1
         return cmp(self._identifiers, other._identifiers)
 
+    # Rich comparisons, which are faster than __cmp__ when sorting.
+    # (A DottedName is less than any value that is not a DottedName.)
+
+    def __eq__(self, other):
+        if self is other: return True
+        if not isinstance(other, DottedName): return False
+        return (self._hash == other._hash and
+                self._identifiers == other._identifiers)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __lt__(self, other):
+        if not isinstance(other, DottedName): return True
+        return self._identifiers < other._identifiers
+
+    def __le__(self, other):
+        if not isinstance(other, DottedName): return True
+        return self._identifiers <= other._identifiers
+
+    def __gt__(self, other):
+        if not isinstance(other, DottedName): return False
+        return self._identifiers > other._identifiers
+
+    def __ge__(self, other):
+        if not isinstance(other, DottedName): return False
+        return self._identifiers >= other._identifiers
+
     def __len__(self):
         """
         Return the number of identifiers in this dotted name.
@@ -206,7 +309,7 @@ class DottedName:
         if len(self._identifiers) == 1:
             return None
         else:
-            return DottedName(*self._identifiers[:-1])
+            return DottedName(self._identifiers[:-1])
 
     def dominates(self, name, strict=False):
         """
@@ -243,26 +346,17 @@ class DottedName:
         """
         if context is UNKNOWN or not context or len(self) <= 1:
             return self
-        if self[0] == context[0]:
-            return self[1:].contextualize(context[1:])
-        else:
+        # Strip off the identifiers that self & context have in common
+        # (but always keep at least one identifier).
+        identifiers = self._identifiers
+        context = context._identifiers
+        i = 0
+        end = min(len(identifiers)-1, len(context))
+        while i < end and identifiers[i] == context[i]:
+            i += 1
+        if i == 0:
             return self
-
-        # Find the first index where self & context differ.
-        for i in range(min(len(context), len(self))):
-            if self._identifiers[i] != context._identifiers[i]:
-                first_difference = i
-                break
-        else:
-            first_difference = i+1
-            
-        # Strip off anything before that index.
-        if first_difference == 0:
-            return self
-        elif first_difference == len(self):
-            return self[-1:]
-        else:
-            return self[first_difference:]
+        return DottedName(identifiers[i:])
 
 ######################################################################
 # UNKNOWN Value
@@ -286,11 +380,244 @@ UNKNOWN = _Sentinel('UNKNOWN')
 information about an object is unknown.  This is used as the
 default value for all instance variables."""
 
+######################################################################
+# Compact Attribute Storage
+######################################################################
+
+# When epydoc.COMPACT_APIDOCS is true, APIDoc objects have no
+# instance dictionary.  Instead, each APIDoc has a single slot that
+# holds a _FieldStore, which stores the values of the attributes
+# defined by its class in a list.  The _FieldStore is also returned
+# by the APIDoc's __dict__ property, so merged APIDocs can share it
+# (just like they would share an instance dictionary).
+
+_UNSET = _Sentinel('UNSET')
+"""The value of a L{_FieldStore} entry whose attribute has not been
+set."""
+
+class _FieldStore(object, UserDict.DictMixin):
+    """
+    A dictionary-like object that holds the attributes of a compact
+    L{APIDoc}.  The values of attributes that are defined by the
+    C{APIDoc}'s class are stored in a list, using the positions given
+    by the class's C{_field_index}; any other attributes are stored in
+    a separate dictionary.
+    """
+    __slots__ = ('_index', '_values', '_extra')
+
+    def __init__(self, index=None):
+        if index is None: index = {}
+        self._index = index
+        self._values = [_UNSET] * len(index)
+        self._extra = None
+
+    def _adopt(self, index):
+        """
+        Change the field index that is used to store attributes,
+        moving any existing values to their new positions.
+        """
+        if index is self._index: return
+        items = self.items()
+        self._index = index
+        self._values = [_UNSET] * len(index)
+        self._extra = None
+        for (key, val) in items:
+            self[key] = val
+
+    def __getitem__(self, key):
+        i = self._index.get(key)
+        if i is not None:
+            val = self._values[i]
+            if val is not _UNSET: return val
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, val):
+        i = self._index.get(key)
+        if i is not None:
+            self._values[i] = val
+        else:
+            if self._extra is None: self._extra = {}
+            self._extra[key] = val
+
+    def __delitem__(self, key):
+        i = self._index.get(key)
+        if i is not None and self._values[i] is not _UNSET:
+            self._values[i] = _UNSET
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        i = self._index.get(key)
+        if i is not None:
+            return self._values[i] is not _UNSET
+        return self._extra is not None and key in self._extra
+    has_key = __contains__
+
+    def keys(self):
+        values = self._values
+        keys = [key for (key, i) in self._index.iteritems()
+                if values[i] is not _UNSET]
+        if self._extra is not None: keys.extend(self._extra)
+        return keys
+
+    def items(self):
+        values = self._values
+        items = [(key, values[i]) for (key, i) in self._index.iteritems()
+                 if values[i] is not _UNSET]
+        if self._extra is not None: items.extend(self._extra.items())
+        return items
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def clear(self):
+        self._values = [_UNSET] * len(self._index)
+        self._extra = None
+
+    def copy(self):
+        store = _FieldStore(self._index)
+        store._values = self._values[:]
+        if self._extra is not None: store._extra = self._extra.copy()
+        return store
+
+    def __reduce__(self):
+        return (_restore_field_store, (dict(self.items()),))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+def _restore_field_store(state):
+    """
+    Unpickle a L{_FieldStore}.  If C{COMPACT_APIDOCS} is false, then
+    the state dictionary is used as-is.
+    """
+    if not epydoc.COMPACT_APIDOCS: return state
+    store = _FieldStore()
+    store.update(state)
+    return store
+
+class _Field(object):
+    """
+    A descriptor for an attribute of a compact L{APIDoc}, which takes
+    the place of the attribute's default value in the class.
+    """
+    __slots__ = ('index', 'default')
+    def __init__(self, index, default):
+        self.index = index
+        self.default = default
+    def __get__(self, obj, cls=None):
+        if obj is None: return self.default
+        val = _get_store(obj)._values[self.index]
+        if val is _UNSET: return self.default
+        return val
+
+def _is_field(name, val):
+    """
+    Return true if the class attribute C{name} is the default value
+    for an attribute of a compact L{APIDoc}.
+    """
+    return not (name.startswith('__') or name.isupper() or
+                isinstance(val, (types.FunctionType, classmethod,
+                                 staticmethod, property, type)))
+
+class _CompactAPIDocType(type):
+    """
+    The metaclass for compact L{APIDoc}s.  Each class attribute that
+    gives an attribute's default value is replaced by a L{_Field},
+    and is assigned a position in the class's C{_field_index}
+    (which extends its base class's index).  Classes that define
+    C{__slots__} themselves do not define any new attributes.
+    """
+    def __new__(mcls, name, bases, namespace):
+        index = {}
+        for base in bases:
+            index = getattr(base, '_field_index', index)
+        if '__slots__' not in namespace:
+            fields = [(key, val) for (key, val) in namespace.items()
+                      if _is_field(key, val)]
+            if fields:
+                index = index.copy()
+                for (key, val) in sorted(fields):
+                    index.setdefault(key, len(index))
+                    namespace[key] = _Field(index[key], val)
+            namespace['__slots__'] = ()
+        namespace['_field_index'] = index
+        return type.__new__(mcls, name, bases, namespace)
+
+class _CompactAPIDoc(object):
+    """
+    The base class for L{APIDoc} when C{COMPACT_APIDOCS} is true.
+    Its instances store their attributes in a L{_FieldStore}.
+    """
+    __metaclass__ = _CompactAPIDocType
+    __slots__ = ('_APIDoc__store', '__weakref__')
+
+    def __new__(cls, *args, **kwargs):
+        self = object.__new__(cls)
+        _set_store(self, _FieldStore(cls._field_index))
+        return self
+
+    def _get_dict(self):
+        return _get_store(self)
+
+    def _set_dict(self, state):
+        if not isinstance(state, _FieldStore):
+            store = _FieldStore()
+            store.update(state)
+            state = store
+        state._adopt(type(self)._field_index)
+        _set_store(self, state)
+
+    __dict__ = property(_get_dict, _set_dict)
+
+    def __setattr__(self, attr, val):
+        if attr == '__class__':
+            object.__setattr__(self, attr, val)
+            _get_store(self)._adopt(val._field_index)
+        elif attr == '__dict__':
+            self._set_dict(val)
+        else:
+            _get_store(self)[attr] = val
+
+    def __getattr__(self, attr):
+        extra = _get_store(self)._extra
+        if extra is not None and attr in extra:
+            return extra[attr]
+        raise AttributeError(attr)
+
+    def __delattr__(self, attr):
+        try: del _get_store(self)[attr]
+        except KeyError: raise AttributeError(attr)
+
+    def __getstate__(self):
+        return _get_store(self)
+
+    def __setstate__(self, state):
+        self.__dict__ = state
+
+_get_store = _CompactAPIDoc._APIDoc__store.__get__
+_set_store = _CompactAPIDoc._APIDoc__store.__set__
+
+if epydoc.COMPACT_APIDOCS:
+    _APIDocBase = _CompactAPIDoc
+else:
+    _APIDocBase = object
+
 ######################################################################
 # API Documentation Objects: Abstract Base Classes
 ######################################################################
 
-class APIDoc(object):
+class APIDoc(_APIDocBase):
     """
     API documentation information for a single element of a Python
     program.  C{APIDoc} itself is an abstract base class; subclasses
@@ -406,7 +733,7 @@ class APIDoc(object):
         # Don't intercept special assignments like __class__, or
         # assignments to private variables.
         if attr.startswith('_'):
-            return object.__setattr__(self, attr, val)
+            return _APIDocBase.__setattr__(self, attr, val)
         if not hasattr(self, attr):
             raise AttributeError('%s does not define attribute %r' %
                             (self.__class__.__name__, attr))
@@ -549,6 +876,18 @@ class APIDoc(object):
         """
         return []
 
+    def labeled_apidoc_links(self):
+        """
+        Return a list of C{(api_doc, filters)} pairs, one for each
+        C{APIDoc} that is directly linked from this C{APIDoc}, where
+        C{filters} is a tuple of the names of the L{apidoc_links()}
+        filter categories that the link belongs to.  A link is
+        excluded by C{apidoc_links()} iff any of its categories is
+        turned off.  Subclasses that override C{apidoc_links()} should
+        override this method as well.
+        """
+        return [(api_doc, ()) for api_doc in self.apidoc_links()]
+
 def reachable_valdocs(root, **filters):
     """
     Return a list of all C{ValueDoc}s that can be reached, directly or
@@ -573,6 +912,34 @@ def reachable_valdocs(root, **filters):
                              if v not in val_set and v not in var_set])
     return val_set
 
+_LINK_FILTER_DEFAULTS = {'overrides': False}
+"""The values of the L{APIDoc.apidoc_links()} filters that are not
+C{True} by default."""
+
+_LINK_FILTER_BITS = {}
+"""A mapping from L{APIDoc.apidoc_links()} filter names to the bits
+that are used for them in link masks.  (See L{_link_mask()}.)"""
+
+_LINK_MASKS = {}
+"""A cache for L{_link_mask()}."""
+
+def _link_mask(filters):
+    """
+    Return a bitmask with the bits for the given sequence of filter
+    names set.
+    """
+    filters = tuple(filters)
+    mask = _LINK_MASKS.get(filters)
+    if mask is None:
+        mask = 0
+        for name in filters:
+            bit = _LINK_FILTER_BITS.get(name)
+            if bit is None:
+                bit = _LINK_FILTER_BITS[name] = 1 << len(_LINK_FILTER_BITS)
+            mask |= bit
+        _LINK_MASKS[filters] = mask
+    return mask
+
 ######################################################################
 # Variable Documentation Objects
 ######################################################################
@@ -690,6 +1057,14 @@ class VariableDoc(APIDoc):
         else:
             return [self.value]+overrides
 
+    def labeled_apidoc_links(self):
+        links = []
+        if self.value not in (None, UNKNOWN):
+            links.append( (self.value, ()) )
+        if self.overrides not in (None, UNKNOWN):
+            links.append( (self.overrides, ('overrides',)) )
+        return links
+
     def is_detailed(self):
         pval = super(VariableDoc, self).is_detailed()
         if pval or self.value in (None, UNKNOWN):
@@ -757,6 +1132,12 @@ class ValueDoc(APIDoc):
        the initial assignment).
        @type: C{unicode}"""
 
+    pyval_record = UNKNOWN
+    """@ivar: A record of how L{pyval} is colorized, which is used to
+       display the value when L{pyval} is not available (e.g., if the
+       value was introspected by another process).
+       @type: L{RecordedPyval<epydoc.markup.pyval_repr.RecordedPyval>}"""
+
     REPR_MAXLINES = 5
     """@cvar: The maximum number of lines of text that should be
     generated by L{pyval_repr()}.  If the string representation does
@@ -864,7 +1245,7 @@ class ValueDoc(APIDoc):
         # Use self.__pyval_repr to cache the result.
         if not hasattr(self, '_ValueDoc__pyval_repr'):
             self.__pyval_repr = epydoc.markup.pyval_repr.colorize_pyval(
-                self.pyval, self.parse_repr, self.REPR_MIN_SCORE,
+                self._pyval_or_record(), self.parse_repr, self.REPR_MIN_SCORE,
                 self.REPR_LINELEN, self.REPR_MAXLINES, linebreakok=True)
         return self.__pyval_repr
 
@@ -884,15 +1265,22 @@ class ValueDoc(APIDoc):
         # If max_len is specified, then do *not* cache the result.
         if max_len is not None:
             return epydoc.markup.pyval_repr.colorize_pyval(
-                self.pyval, self.parse_repr, self.REPR_MIN_SCORE,
+                self._pyval_or_record(), self.parse_repr, self.REPR_MIN_SCORE,
                 max_len, maxlines=1, linebreakok=False)
             
         # Use self.__summary_pyval_repr to cache the result.
         if not hasattr(self, '_ValueDoc__summary_pyval_repr'):
             self.__summary_pyval_repr = epydoc.markup.pyval_repr.colorize_pyval(
-                self.pyval, self.parse_repr, self.REPR_MIN_SCORE,
+                self._pyval_or_record(), self.parse_repr, self.REPR_MIN_SCORE,
                 self.SUMMARY_REPR_LINELEN, maxlines=1, linebreakok=False)
         return self.__summary_pyval_repr
+
+    def _pyval_or_record(self):
+        # The record of the value's colorization stands in for the
+        # value, if the value itself is not available.
+        if self.pyval is UNKNOWN:
+            return self.pyval_record
+        return self.pyval
     #} end of "value representation" group
 
     def apidoc_links(self, **filters):
@@ -910,6 +1298,13 @@ class GenericValueDoc(ValueDoc):
     def is_detailed(self):
         return (not self.summary_pyval_repr().is_complete)
 
+# The filter categories for the links from namespaces to their
+# variables (see NamespaceDoc.labeled_apidoc_links).
+_VAR = ('variables',)
+_IMPORTED_VAR = ('variables', 'imports')
+_PRIVATE_VAR = ('variables', 'private')
+_PRIVATE_IMPORTED_VAR = ('variables', 'imports', 'private')
+
 class NamespaceDoc(ValueDoc):
     """
     API documentation information about a singe Python namespace
@@ -988,6 +1383,17 @@ class NamespaceDoc(ValueDoc):
                     v.is_imported != True]
         assert 0, 'this line should be unreachable'
 
+    def labeled_apidoc_links(self):
+        links = []
+        for v in self.variables.values():
+            if v.is_imported == True:
+                if v.is_public == False: filters = _PRIVATE_IMPORTED_VAR
+                else: filters = _IMPORTED_VAR
+            elif v.is_public == False: filters = _PRIVATE_VAR
+            else: filters = _VAR
+            links.append( (v, filters) )
+        return links
+
     def init_sorted_variables(self):
         """
         Initialize the L{sorted_variables} attribute, based on the
@@ -1154,6 +1560,14 @@ class ModuleDoc(NamespaceDoc):
             val_docs += self.submodules
         return val_docs
 
+    def labeled_apidoc_links(self):
+        links = NamespaceDoc.labeled_apidoc_links(self)
+        if self.package not in (None, UNKNOWN):
+            links.append( (self.package, ('packages',)) )
+        if self.submodules not in (None, UNKNOWN):
+            links += [(m, ('submodules',)) for m in self.submodules]
+        return links
+
     def init_submodule_groups(self):
         """
         Initialize the L{submodule_groups} attribute, based on the
@@ -1270,6 +1684,14 @@ class ClassDoc(NamespaceDoc):
             self.subclasses not in (None, UNKNOWN)):
             val_docs += self.subclasses
         return val_docs
+
+    def labeled_apidoc_links(self):
+        links = NamespaceDoc.labeled_apidoc_links(self)
+        if self.bases not in (None, UNKNOWN):
+            links += [(b, ('bases',)) for b in self.bases]
+        if self.subclasses not in (None, UNKNOWN):
+            links += [(c, ('subclasses',)) for c in self.subclasses]
+        return links
     
     def is_type(self):
         if self.canonical_name == DottedName('type'): return True
@@ -1775,10 +2197,46 @@ class DocIndex:
         self._container_cache = {}
         """A cache for the L{container()} method, to increase speed."""
 
+        self._link_graph = {}
+        """A mapping from C{APIDoc}s to the links from them, as
+        returned by L{_links()}.  This is used by
+        L{reachable_valdocs()}, and is filled in as C{APIDoc}s are
+        visited.  Entries are removed by L{invalidate_links()}."""
+
+        self._reachable_cache = {}
+        """A cache for the L{reachable_valdocs()} method, mapping tuples
+        of C{(filter, value)} pairs to sets of C{ValueDoc}s.  It is
+        cleared by L{invalidate_links()}."""
+
+        self._defining_vars = {}
+        """A reverse index mapping each C{ValueDoc} to a C{(container,
+        var_doc)} pair, where C{var_doc} is the C{VariableDoc} in
+        C{container} that gives the C{ValueDoc} its canonical name (or
+        C{None} if there is no such variable).  It is filled in by
+        L{docbuilder.assign_canonical_names()
+        <epydoc.docbuilder.assign_canonical_names>} (via
+        L{set_defining_variable()}), and by L{defining_variable()} for
+        values that were not named there."""
+
         self._get_cache = {}
         """A cache for the L{get_vardoc()} and L{get_valdoc()} methods,
         to increase speed."""
 
+        self._root_index = None
+        """A mapping from the identifier tuples of the names of the
+        C{ValueDoc}s in L{root} to lists of those C{ValueDoc}s (in
+        L{root} order).  This is used by L{_get()} to find the root
+        C{ValueDoc}s whose names are prefixes of a given name.  It is
+        built the first time it is used."""
+
+        self._submodule_index = {}
+        """A mapping from C{ModuleDoc}s to C{(submodules, index)}
+        pairs, where C{index} maps the last identifiers of the names
+        in the module's C{submodules} list to the submodules.  This is
+        used by L{_get_from()}, and is filled in as modules are looked
+        up.  (An index is rebuilt if its module's C{submodules} list
+        is replaced.)"""
+
     #////////////////////////////////////////////////////////////
     # Lookup methods
     #////////////////////////////////////////////////////////////
@@ -1820,13 +2278,17 @@ class DocIndex:
 
         # Look for an element in the root set whose name is a prefix
         # of `name`.  If we can't find one, then return None.
-        for root_valdoc in self.root:
-            if root_valdoc.canonical_name.dominates(name):
+        root_index = self._root_index
+        if root_index is None:
+            root_index = self._root_index = self._build_root_index()
+        identifiers = name._identifiers
+        for i in range(1, len(identifiers)+1):
+            for root_valdoc in root_index.get(identifiers[:i], ()):
                 # Starting at the root valdoc, walk down the variable/
                 # submodule chain until we find the requested item.
                 var_doc = None
                 val_doc = root_valdoc
-                for identifier in name[len(root_valdoc.canonical_name):]:
+                for identifier in identifiers[i:]:
                     if val_doc is None: break
                     var_doc, val_doc = self._get_from(val_doc, identifier)
                 else:
@@ -1839,6 +2301,17 @@ class DocIndex:
         self._get_cache[name] = (None, None)
         return None, None
 
+    def _build_root_index(self):
+        """
+        Return a mapping from the identifier tuples of the names of
+        the C{ValueDoc}s in L{root} to lists of those C{ValueDoc}s.
+        """
+        root_index = {}
+        for root_valdoc in self.root:
+            key = root_valdoc.canonical_name._identifiers
+            root_index.setdefault(key, []).append(root_valdoc)
+        return root_index
+
     def _get_from(self, val_doc, identifier):
         if isinstance(val_doc, NamespaceDoc):
             child_var = val_doc.variables.get(identifier)
@@ -1850,15 +2323,28 @@ class DocIndex:
         # If that fails, then see if it's a submodule.
         if (isinstance(val_doc, ModuleDoc) and
             val_doc.submodules is not UNKNOWN):
-            for submodule in val_doc.submodules:
-                if submodule.canonical_name[-1] == identifier:
-                    var_doc = None
-                    val_doc = submodule
-                    if val_doc is UNKNOWN: val_doc = None
-                    return var_doc, val_doc
+            index_list, submodules = self._submodule_index.get(val_doc,
+                                                               (None, None))
+            if index_list is not val_doc.submodules:
+                submodules = {}
+                for submodule in val_doc.submodules:
+                    submodules.setdefault(submodule.canonical_name[-1],
+                                          submodule)
+                self._submodule_index[val_doc] = (val_doc.submodules,
+                                                  submodules)
+            submodule = submodules.get(identifier)
+            if submodule is not None:
+                return None, submodule
 
         return None, None
 
+    _CALL_ARGS_RE = re.compile(r'\(.*\)$')
+    """Matches an argument list at the end of a name passed to
+    L{find()}."""
+
+    _NAME_RE = re.compile(r'^([a-zA-Z_]\w*)(\.[a-zA-Z_]\w*)*$')
+    """Matches the names that L{find()} can look up."""
+
     def find(self, name, context, not_found_exception=False):
         """
         Look for an C{APIDoc} named C{name}, relative to C{context}.
@@ -1880,8 +2366,8 @@ class DocIndex:
             function parameters, etc.)
         """
         if isinstance(name, basestring):
-            name = re.sub(r'\(.*\)$', '', name.strip())
-            if re.match('^([a-zA-Z_]\w*)(\.[a-zA-Z_]\w*)*$', name):
+            name = self._CALL_ARGS_RE.sub('', name.strip())
+            if self._NAME_RE.match(name):
                 name = DottedName(name)
             else:
                 if not_found_exception: raise ValueError(name)
@@ -1889,29 +2375,31 @@ class DocIndex:
         elif not isinstance(name, DottedName):
             raise TypeError("'name' should be a string or DottedName")
         
-        if context is None or context.canonical_name is None:
-            container_name = []
+        if (context is None or
+            not isinstance(context.canonical_name, DottedName)):
+            container_name = ()
         else:
-            container_name = context.canonical_name
+            container_name = context.canonical_name._identifiers
 
         # Check for the name in all containing namespaces, starting
-        # with the closest one.
+        # with the closest one.  (Each check is a single _get(), which
+        # takes a dictionary lookup per identifier.)
+        identifiers = name._identifiers
         for i in range(len(container_name), -1, -1):
-            relative_name = container_name[:i]+name
+            relative_name = DottedName._intern(container_name[:i]+identifiers)
+            var_doc, val_doc = self._get(relative_name)
             # Is `name` the absolute name of a documented value?
             # (excepting GenericValueDoc values.)
-            val_doc = self.get_valdoc(relative_name)
             if (val_doc is not None and
                 not isinstance(val_doc, GenericValueDoc)):
                 return val_doc
             # Is `name` the absolute name of a documented variable?
-            var_doc = self.get_vardoc(relative_name)
             if var_doc is not None: return var_doc
 
         # If the name begins with 'self', then try stripping that off
         # and see if we can find the variable.
-        if name[0] == 'self':
-            doc = self.find('.'.join(name[1:]), context)
+        if name[0] == 'self' and len(name) > 1:
+            doc = self.find(name[1:], context)
             if doc is not None: return doc
 
         # Is it the name of a builtin?
@@ -1994,8 +2482,97 @@ class DocIndex:
             when looking for C{ValueDoc}s that can be reached from the
             root set.  See C{APIDoc.apidoc_links} for a more complete
             description.
-        """
-        return reachable_valdocs(self.root, **filters)
+
+        @note: The links from each C{APIDoc} are only looked up once,
+            and the result for each set of filters is cached.  If the
+            links between the C{APIDoc}s in the index are changed,
+            then L{invalidate_links()} must be called.  (The
+            C{overrides} links are the exception: they are always
+            followed as they are now.)
+        """
+        key = [(name, bool(value)) for (name, value) in filters.items()]
+        key.sort()
+        key = tuple(key)
+        val_set = self._reachable_cache.get(key)
+        if val_set is None:
+            val_set = self._reachable_cache[key] = self._reachable(filters)
+        return set(val_set)
+
+    def invalidate_links(self, api_doc=None):
+        """
+        Discard the results that have been cached by
+        L{reachable_valdocs()}, and the links that were looked up for
+        C{api_doc} (or for every C{APIDoc}, if C{api_doc} is not
+        given).  This should be called whenever the links from an
+        C{APIDoc} in the index are changed (e.g., by adding variables
+        to a namespace, or changing the value of a variable).  It
+        should be called with no C{api_doc} whenever L{root} is
+        changed, since that also discards the names that were looked
+        up in the old L{root}.
+        """
+        if api_doc is None:
+            self._link_graph.clear()
+            self._get_cache.clear()
+            self._submodule_index.clear()
+            self._root_index = None
+        else:
+            self._link_graph.pop(api_doc, None)
+            self._submodule_index.pop(api_doc, None)
+        self._reachable_cache.clear()
+
+    def _reachable(self, filters):
+        # The mask of the link categories that are turned off.
+        names = set(filters).union(_LINK_FILTER_DEFAULTS)
+        excluded = _link_mask([name for name in names if not
+                               filters.get(name, _LINK_FILTER_DEFAULTS.get(
+                                   name, True))])
+        overrides = filters.get('overrides', False)
+        graph = self._link_graph
+        apidoc_set = set(self.root)
+        apidoc_queue = list(apidoc_set)
+        while apidoc_queue:
+            api_doc = apidoc_queue.pop()
+            links = graph.get(api_doc)
+            if links is None:
+                links = graph[api_doc] = self._links(api_doc)
+            for (linked_doc, mask, var_doc) in links:
+                if mask & excluded: continue
+                if linked_doc is not None and linked_doc not in apidoc_set:
+                    apidoc_set.add(linked_doc)
+                    apidoc_queue.append(linked_doc)
+                # Follow the chain of variables that var_doc overrides
+                # to their values.
+                while overrides and var_doc is not None:
+                    var_doc = var_doc.overrides
+                    if (var_doc in (None, UNKNOWN) or
+                        var_doc in apidoc_set): break
+                    apidoc_set.add(var_doc)
+                    if (var_doc.value not in (None, UNKNOWN) and
+                        var_doc.value not in apidoc_set):
+                        apidoc_set.add(var_doc.value)
+                        apidoc_queue.append(var_doc.value)
+        return set([api_doc for api_doc in apidoc_set
+                    if isinstance(api_doc, ValueDoc)])
+
+    def _links(self, api_doc):
+        """
+        Return a list of C{(linked_doc, mask, var_doc)} triples for the
+        links from C{api_doc}, where C{mask} is a bitmask of the link's
+        filter categories (see L{_link_mask()}).  A link to a
+        C{VariableDoc} is replaced by a link to its value (or to
+        C{None} if the value is unknown), and the C{VariableDoc} is
+        given as C{var_doc}, so that its C{overrides} can be followed.
+        For other links, C{var_doc} is C{None}.
+        """
+        links = []
+        for (linked_doc, filters) in api_doc.labeled_apidoc_links():
+            if linked_doc.__class__ is VariableDoc:
+                value = linked_doc.value
+                if value is UNKNOWN: value = None
+                links.append( (value, _link_mask(filters), linked_doc) )
+            else:
+                links.append( (linked_doc, _link_mask(filters), None) )
+        return links
 
     def container(self, api_doc):
         """
@@ -2023,6 +2600,47 @@ class DocIndex:
             self._container_cache[api_doc] = parent
             return parent
 
+    def defining_variable(self, val_doc):
+        """
+        Return the C{VariableDoc} that defines the given C{ValueDoc}:
+        i.e., the variable in the value's L{container()} whose name
+        gives the value its canonical name.  If the container has no
+        such variable, then return any variable in the container whose
+        value is C{val_doc}; and if there is none, return C{None}.
+
+        A variable recorded by L{set_defining_variable()} is only used
+        if it belongs to the value's L{container()}.
+        """
+        entry = self._defining_vars.get(val_doc)
+        container = self.container(val_doc)
+        if entry is None or entry[0] != container:
+            entry = (container, self._find_defining_variable(val_doc,
+                                                             container))
+            self._defining_vars[val_doc] = entry
+        return entry[1]
+
+    def set_defining_variable(self, val_doc, container, var_doc):
+        """
+        Record that C{var_doc}, a variable in the C{NamespaceDoc}
+        C{container}, defines C{val_doc}.  (See L{defining_variable()}.)
+        """
+        self._defining_vars[val_doc] = (container, var_doc)
+
+    def _find_defining_variable(self, val_doc, container):
+        if (not isinstance(container, NamespaceDoc) or
+            container.variables in (None, UNKNOWN)):
+            return None
+        if isinstance(val_doc.canonical_name, DottedName):
+            var_doc = container.variables.get(val_doc.canonical_name[-1])
+            if (var_doc not in (UNKNOWN, None) and
+                var_doc.value == val_doc):
+                return var_doc
+        for var_doc in container.variables.values():
+            if var_doc in (UNKNOWN, None): continue
+            if var_doc.value == val_doc:
+                return var_doc
+        return None
+
     #////////////////////////////////////////////////////////////
     # Profiling information
     #////////////////////////////////////////////////////////////
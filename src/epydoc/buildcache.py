@@ -0,0 +1,708 @@
+# epydoc -- Persistent build cache
+#
+# Copyright (C) 2005 Edward Loper
+# Author: Edward Loper <edloper@loper.org>
+# URL: <http://epydoc.sf.net>
+#
+# $Id$
+
+"""
+A persistent, on-disk cache for the per-module documentation that is
+extracted by L{docparser.parse_docs()
+<epydoc.docparser.parse_docs>} and L{docintrospecter.introspect_docs()
+<epydoc.docintrospecter.introspect_docs>}.
+
+When the same set of modules is documented repeatedly (e.g., by a
+nightly build), most of the modules do not change between runs.  The
+L{BuildCache} class records the C{(introspect_doc, parse_doc)} pair
+that was built for each module file, and allows
+L{build_doc_index()<epydoc.docbuilder.build_doc_index>} to reuse it
+on subsequent runs, skipping both parsing and introspection for that
+module.  Cache entries are keyed by the module's filename, and are
+validated against the file's modification time & size, the SHA-1
+hash of its contents, the epydoc version, and the build options
+that affect the module's documentation.
+
+The C{APIDoc} graph for a single module usually contains pointers to
+C{APIDoc}s that belong to other modules (e.g., imported values, base
+classes, and the containing package).  These X{foreign} C{APIDoc}s
+are not written to the cache.  Instead, they are recorded by name,
+and are looked up again (using the ordinary parser & introspecter
+caches) when the cache entry is loaded.  See L{dump_module_docs()}
+and L{load_module_docs()}.
+
+Note that a cache entry is only invalidated when the module's own
+source file changes.  If the structure of a module's values depends on
+other modules (e.g., a class that is created dynamically using values
+from another module), then the cache should be cleared when those
+modules change.
+
+@group Serialization: dump_module_docs, load_module_docs, ModuleDocPickler,
+    ModuleDocUnpickler, UncacheableError
+"""
+__docformat__ = 'epytext en'
+
+######################################################################
+## Imports
+######################################################################
+
+import sys, os, os.path, pickle, copy_reg, tempfile
+try: import cPickle
+except ImportError: import pickle as cPickle
+import __builtin__, exceptions
+from cStringIO import StringIO
+try: from hashlib import sha1
+except ImportError: from sha import new as sha1
+import epydoc
+from epydoc import log
+from epydoc.apidoc import *
+import epydoc.docparser, epydoc.docintrospecter
+import epydoc.markup.pyval_repr
+from epydoc.compat import * # Backwards compatibility
+
+######################################################################
+## Module Doc Serialization
+######################################################################
+
+class UncacheableError(Exception):
+    """
+    An exception raised by L{dump_module_docs()} when the
+    documentation for a module can not be serialized (e.g., because
+    it points to a foreign C{APIDoc} that has no usable name); and by
+    L{load_module_docs()} when a foreign reference can not be
+    resolved.
+    """
+
+_SIMPLE_PYVAL_TYPES = (type(None), bool, int, long, float, complex,
+                       str, unicode)
+
+def _is_simple_pyval(pyval, depth=0):
+    """
+    Return true if C{pyval} can safely be pickled along with the
+    C{ValueDoc} that describes it.  Only builtin literal types (and
+    containers of them) are accepted.
+    """
+    if isinstance(pyval, _SIMPLE_PYVAL_TYPES):
+        return type(pyval) in _SIMPLE_PYVAL_TYPES
+    if depth > 5:
+        return False
+    if type(pyval) in (tuple, list, set, frozenset):
+        for elt in pyval:
+            if not _is_simple_pyval(elt, depth+1): return False
+        return True
+    if type(pyval) is dict:
+        for (key, val) in pyval.items():
+            if not (_is_simple_pyval(key, depth+1) and
+                    _is_simple_pyval(val, depth+1)): return False
+        return True
+    return False
+
+class ModuleDocPickler(pickle.Pickler):
+    """
+    A pickler for the C{(introspect_doc, parse_doc)} pair that was
+    built for a single module.  C{APIDoc}s that belong to the module
+    are pickled by value; any other C{APIDoc}s are pickled as
+    X{foreign references} (see L{_foreign_ref()}).  C{pyval}
+    attributes are only pickled if they contain simple builtin
+    values; other C{pyval}s are replaced by records of their
+    colorization (see L{ValueDoc.pyval_record}).
+
+    @ivar detached: If true, then the docs will be loaded by a process
+        that does not import the module, so its values can't be
+        looked up again.  Foreign C{APIDoc}s that can't be recorded
+        as foreign references are pickled by value, rather than
+        raising L{UncacheableError}.
+    """
+    def __init__(self, file, roots, detached=False):
+        pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+        self.roots = [r for r in roots if r is not None]
+        self.detached = detached
+
+    def persistent_id(self, obj):
+        if obj is UNKNOWN:
+            return 'UNKNOWN'
+        # Introspected literal values may be shared with other modules
+        # (e.g., None); so look them up again when loading.
+        if (isinstance(obj, GenericValueDoc) and
+            obj.docs_extracted_by == 'introspecter' and
+            obj.canonical_name in (None, UNKNOWN) and
+            type(obj.pyval) in _SIMPLE_PYVAL_TYPES):
+            return ('value', obj.pyval)
+        if isinstance(obj, APIDoc) and not self._is_local(obj):
+            try:
+                return self._foreign_ref(obj)
+            except UncacheableError:
+                if not self.detached: raise
+        return None
+
+    def save(self, obj):
+        # APIDocs are pickled using their instance dictionary, minus
+        # any private (cached) attributes; and without ValueDoc's
+        # __getstate__, which would permanently cache its pyval
+        # representations on the live object.
+        if isinstance(obj, APIDoc) and id(obj) not in self.memo:
+            pid = self.persistent_id(obj)
+            if pid is None:
+                self.save_reduce(copy_reg.__newobj__, (obj.__class__,),
+                                 state=self._state(obj), obj=obj)
+                return
+        pickle.Pickler.save(self, obj)
+
+    def _is_local(self, api_doc):
+        """
+        Return true if C{api_doc} belongs to the module whose docs are
+        being pickled.
+        """
+        for root in self.roots:
+            if api_doc is root: return True
+        if isinstance(api_doc, VariableDoc): return True
+        if isinstance(api_doc, ModuleDoc):
+            # Unnamed modules are proxies created by import statements.
+            return api_doc.canonical_name in (None, UNKNOWN)
+        module_doc = api_doc.defining_module
+        if module_doc not in (None, UNKNOWN):
+            for root in self.roots:
+                if module_doc is root: return True
+            return False
+        return api_doc.canonical_name in (None, UNKNOWN)
+
+    def _foreign_ref(self, api_doc):
+        """
+        Return a persistent id for a foreign C{APIDoc}.  Introspected
+        values are recorded by a name that can be used to look them up
+        (usually their canonical name), along with a flag indicating
+        whether they had been fully introspected.
+        Parsed values are recorded by the filename of their defining
+        module and their name relative to that module.
+
+        @raise UncacheableError: If C{api_doc} can not be recorded.
+        """
+        name = api_doc.canonical_name
+        if api_doc.docs_extracted_by == 'introspecter':
+            pyval = api_doc.pyval
+            if pyval is UNKNOWN:
+                raise UncacheableError('no value for %r' % api_doc)
+            # (A value's canonical name may not find it -- e.g., for a
+            # copy of a module that was imported under the same name.)
+            if (name in (None, UNKNOWN) or name[0].startswith('script-')
+                or not _names_value(name, pyval)):
+                name = _lookup_name(pyval)
+                if name is None:
+                    raise UncacheableError('no name for %r' % api_doc)
+            introspected = (id(pyval) in
+                            epydoc.docintrospecter._introspected_values)
+            return ('introspect', str(name), introspected)
+        if name in (None, UNKNOWN) or name[0].startswith('script-'):
+            raise UncacheableError('no name for %r' % api_doc)
+        if api_doc.docs_extracted_by == 'parser':
+            if isinstance(api_doc, ModuleDoc):
+                module_doc = api_doc
+            else:
+                module_doc = api_doc.defining_module
+            if (not isinstance(module_doc, ModuleDoc) or
+                module_doc.filename is UNKNOWN or
+                not module_doc.canonical_name.dominates(name)):
+                raise UncacheableError('no module for %s' % name)
+            relname = name[len(module_doc.canonical_name):]
+            if relname: relname = str(relname)
+            else: relname = None
+            return ('parse', module_doc.filename, relname)
+        else:
+            raise UncacheableError('unknown source for %s' % name)
+
+    def _state(self, api_doc):
+        state = {}
+        for (key, val) in api_doc.__dict__.items():
+            if not key.startswith('_'):
+                state[key] = val
+        # Submodules & subclasses are re-linked by their own modules
+        # when those modules are loaded.
+        if isinstance(state.get('submodules'), list):
+            state['submodules'] = []
+        # (Record the order of all the subclasses -- of this class,
+        # and of its bases, which may not be cached -- so it can be
+        # restored when they are re-linked.)
+        if isinstance(state.get('subclasses'), list):
+            state['_subclass_order'] = _subclass_order(api_doc)
+            state['subclasses'] = [c for c in state['subclasses']
+                                   if self._is_local(c)]
+        if (isinstance(api_doc, ClassDoc) and
+            isinstance(state.get('bases'), list)):
+            state['_base_subclass_orders'] = [
+                _subclass_order(base) for base in state['bases']]
+        if isinstance(api_doc, ValueDoc) and 'pyval' in state:
+            pyval = state['pyval']
+            # Values that can't be pickled are replaced by records of
+            # their colorization.  (Values that are found again when
+            # the docs are loaded get their pyvals back.)
+            if not _is_simple_pyval(pyval):
+                state['pyval'] = UNKNOWN
+                if pyval is not UNKNOWN:
+                    state['pyval_record'] = (
+                        epydoc.markup.pyval_repr.record_pyval(pyval))
+        return state
+
+def _subclass_order(class_doc):
+    """
+    Return a list of the names of C{class_doc}'s subclasses, or
+    C{None} if its subclasses are unknown.
+    """
+    if not isinstance(getattr(class_doc, 'subclasses', None), list):
+        return None
+    return [str(c.canonical_name) for c in class_doc.subclasses]
+
+def _lookup_name(pyval):
+    """
+    Return a name that can be used to look up a value that has no
+    canonical name (such as C{types.ClassType}, or a builtin function
+    whose C{__module__} is not set), or C{None} if no such name is
+    found.  The value's C{__module__} and the C{types} module are
+    checked first; then all imported modules are searched.
+    """
+    modules = []
+    module_name = getattr(pyval, '__module__', None)
+    if isinstance(module_name, basestring) and module_name in sys.modules:
+        modules.append(module_name)
+    modules.append('types')
+    modules += sorted(sys.modules)
+    for module_name in modules:
+        module = sys.modules.get(module_name)
+        if module is None: continue
+        for (name, val) in module.__dict__.items():
+            if val is pyval and not name.startswith('_'):
+                return '%s.%s' % (module_name, name)
+    return None
+
+class ModuleDocUnpickler:
+    """
+    An unpickler for data written by L{ModuleDocPickler}.  Foreign
+    references are resolved using the parser's and the introspecter's
+    caches; the ids of all resolved foreign C{APIDoc}s are recorded in
+    L{foreign_ids}.  (Unlike the pickler, the unpickler doesn't need
+    to customize anything but L{persistent_load()}, so it uses
+    C{cPickle}, which is much faster.)
+
+    @ivar resolve_parsed: The function used to look up a parsed
+        C{APIDoc}, given its module's filename and its name relative
+        to that module.
+    @ivar resolve_introspected: The function used to look up an
+        introspected C{APIDoc}, given its canonical name and a flag
+        indicating whether it had been fully introspected.
+    """
+    def __init__(self, file, resolve_parsed=None, resolve_introspected=None):
+        self._unpickler = cPickle.Unpickler(file)
+        self._unpickler.persistent_load = self.persistent_load
+        self.foreign_ids = set()
+        self.resolve_parsed = resolve_parsed or _resolve_parsed
+        self.resolve_introspected = (resolve_introspected or
+                                     _resolve_introspected)
+
+    def load(self):
+        return self._unpickler.load()
+
+    def persistent_load(self, pid):
+        if pid == 'UNKNOWN':
+            return UNKNOWN
+        try:
+            if pid[0] == 'introspect':
+                api_doc = self.resolve_introspected(DottedName(pid[1]),
+                                                    pid[2])
+            elif pid[0] == 'parse':
+                api_doc = self.resolve_parsed(pid[1], pid[2])
+            elif pid[0] == 'value':
+                api_doc = epydoc.docintrospecter.introspect_docs(pid[1])
+            else:
+                raise pickle.UnpicklingError('Invalid persistent id')
+        except (KeyError, AttributeError, ImportError,
+                epydoc.docparser.ParseError), e:
+            raise UncacheableError('Unable to resolve %r: %s' % (pid, e))
+        self.foreign_ids.add(id(api_doc))
+        return api_doc
+
+def _find_pyval(name):
+    """
+    Return the value named by C{name}, without importing anything.
+    @raise KeyError: If the value can not be found.
+    """
+    identifiers = [ident.rstrip("'") for ident in name]
+    for i in range(len(identifiers), 0, -1):
+        pyval = sys.modules.get('.'.join(identifiers[:i]))
+        if pyval is not None: break
+    else:
+        if not hasattr(__builtin__, identifiers[0]):
+            raise KeyError(str(name))
+        i, pyval = 1, getattr(__builtin__, identifiers[0])
+    for identifier in identifiers[i:]:
+        try: pyval = getattr(pyval, identifier)
+        except AttributeError: raise KeyError(str(name))
+    return pyval
+
+def _names_value(name, pyval):
+    """
+    Return true if looking up C{name} with L{_find_pyval()} would
+    find C{pyval}.
+    """
+    try: return _find_pyval(name) is pyval
+    except KeyError: return False
+
+def _resolve_introspected(name, introspected):
+    from epydoc.docintrospecter import introspect_docs, _get_valuedoc
+    pyval = _find_pyval(name)
+    if introspected:
+        return introspect_docs(pyval)
+    else:
+        return _get_valuedoc(pyval)
+
+def _resolve_parsed(filename, relname):
+    from epydoc.docparser import parse_docs, _moduledoc_cache
+    api_doc = _moduledoc_cache.get(filename)
+    if api_doc is None:
+        api_doc = parse_docs(filename=filename)
+    if relname is not None:
+        for identifier in relname.split('.'):
+            api_doc = api_doc.variables[identifier].value
+            if api_doc is UNKNOWN: raise KeyError(relname)
+    return api_doc
+
+def dump_module_docs(doc_pair, out, detached=False):
+    """
+    Write the C{(introspect_doc, parse_doc)} pair that was built for
+    a single module to the file C{out}.  Either element of the pair
+    may be C{None}.
+
+    @param detached: If true, then the pair will be loaded by a
+        process that does not import the module.  Foreign C{APIDoc}s
+        that can't be looked up by name are written along with the
+        module's own C{APIDoc}s (so when the pair is loaded, they are
+        not shared with the module they belong to).
+    @raise UncacheableError: If the pair can't be serialized.
+    """
+    pickler = ModuleDocPickler(out, doc_pair, detached)
+    try:
+        pickler.dump(tuple(doc_pair))
+    except (pickle.PicklingError, TypeError), e:
+        raise UncacheableError(str(e))
+
+def load_module_docs(infile, resolve_parsed=None):
+    """
+    Read a C{(introspect_doc, parse_doc)} pair that was written by
+    L{dump_module_docs()}, and link it into the current run:
+      - The loaded introspected C{ValueDoc}s get their C{pyval}s back
+        (by looking up the corresponding values in the already
+        imported module), and are registered with the introspecter's
+        cache, so that any other module that introspects those values
+        will get the loaded C{ValueDoc}s.
+      - The loaded parsed C{ModuleDoc} is registered with the
+        parser's cache.
+      - The loaded modules & classes are added to their packages'
+        C{submodules} and their bases' C{subclasses} lists.
+
+    @param resolve_parsed: The function used to resolve foreign
+        references to parsed C{APIDoc}s; see L{ModuleDocUnpickler}.
+    @raise UncacheableError: If a foreign reference can't be resolved.
+    """
+    unpickler = ModuleDocUnpickler(infile, resolve_parsed)
+    introspect_doc, parse_doc = unpickler.load()
+    foreign_ids = unpickler.foreign_ids
+
+    # Collect the APIDocs that belong to this module.  The introspected
+    # docs come first, since the introspecter runs before the parser
+    # (this affects the order of the re-linked subclass lists).
+    local_docs = _local_docs((introspect_doc, parse_doc), foreign_ids)
+
+    # Link the introspected docs to their values.
+    if introspect_doc is not None:
+        pyval = sys.modules.get(str(introspect_doc.canonical_name
+                                    ).rstrip("'"))
+        if pyval is None:
+            raise UncacheableError('%s is not imported' %
+                                   introspect_doc.canonical_name)
+        _bind_pyvals(introspect_doc, pyval, foreign_ids, set())
+
+    # Register the parsed module.  (parse_docs() always introspects
+    # the builtins, so do the same here.)
+    if parse_doc is not None:
+        epydoc.docparser._moduledoc_cache[parse_doc.filename] = parse_doc
+        epydoc.docintrospecter.introspect_docs(__builtin__)
+        epydoc.docintrospecter.introspect_docs(exceptions)
+
+    _relink_docs(local_docs)
+    return introspect_doc, parse_doc
+
+def _local_docs(roots, foreign_ids):
+    """
+    Return a list of the loaded C{APIDoc}s that can be reached from
+    C{roots} (which may contain C{None}) without following any foreign
+    references.
+    """
+    local_docs = []
+    seen = set()
+    for root in roots:
+        if root is None: continue
+        seen.add(id(root))
+        queue = [root]
+        for api_doc in queue:
+            for linked_doc in api_doc.apidoc_links():
+                if (id(linked_doc) not in seen and
+                    id(linked_doc) not in foreign_ids):
+                    seen.add(id(linked_doc))
+                    queue.append(linked_doc)
+        local_docs += queue
+    return local_docs
+
+def _relink_docs(local_docs):
+    """
+    Add each of the given loaded modules and classes to its package's
+    C{submodules} list and its bases' C{subclasses} lists.
+    (L{ModuleDocPickler} leaves out the links in that direction.)
+    """
+    for api_doc in local_docs:
+        if (isinstance(api_doc, ModuleDoc) and
+            isinstance(api_doc.package, ModuleDoc) and
+            api_doc.package.submodules is not UNKNOWN):
+            _append_once(api_doc.package.submodules, api_doc)
+        if isinstance(api_doc, ClassDoc) and api_doc.bases is not UNKNOWN:
+            orders = api_doc.__dict__.get('_base_subclass_orders')
+            for i, base in enumerate(api_doc.bases):
+                if (isinstance(base, ClassDoc) and
+                    isinstance(base.subclasses, list)):
+                    _add_subclass(base, api_doc, orders and orders[i])
+
+def _append_once(lst, api_doc):
+    # APIDocs that were merged by merge_and_overwrite() share their
+    # instance dictionary, and describe the same object.
+    for elt in lst:
+        if elt.__dict__ is api_doc.__dict__: return
+    lst.append(api_doc)
+
+def _add_subclass(class_doc, subclass, order=None):
+    """
+    Add C{subclass} to C{class_doc}'s C{subclasses} list (unless it's
+    already there).  If C{class_doc} was loaded from the cache, then
+    its subclasses are kept in the order that they had when it was
+    built; otherwise, they are kept in the given C{order} (a list of
+    names), if any.
+    """
+    subclasses = class_doc.subclasses
+    for elt in subclasses:
+        if elt.__dict__ is subclass.__dict__: return
+    order = class_doc.__dict__.get('_subclass_order') or order
+    name = str(subclass.canonical_name)
+    if order and name in order:
+        pos = order.index(name)
+        for i, elt in enumerate(subclasses):
+            elt_name = str(elt.canonical_name)
+            if elt_name in order and order.index(elt_name) > pos:
+                subclasses.insert(i, subclass)
+                return
+    subclasses.append(subclass)
+
+def _bind_pyvals(val_doc, pyval, foreign_ids, bound):
+    """
+    Set the C{pyval} attribute of a loaded introspected C{ValueDoc},
+    and of the values of its local variables; and register them with
+    the introspecter's cache.
+    """
+    if (not isinstance(val_doc, ValueDoc) or id(val_doc) in foreign_ids or
+        id(val_doc) in bound):
+        return
+    bound.add(id(val_doc))
+    # The value may have been modified since the cache entry was
+    # written; so always use the current value (and discard any
+    # stored representation of the old one).
+    val_doc.pyval = pyval
+    val_doc.pyval_record = UNKNOWN
+    _register_introspected(val_doc, pyval)
+
+    if isinstance(val_doc, PropertyDoc):
+        for attr in ('fget', 'fset', 'fdel'):
+            if hasattr(pyval, attr):
+                _bind_pyvals(getattr(val_doc, attr), getattr(pyval, attr),
+                             foreign_ids, bound)
+    if not isinstance(val_doc, NamespaceDoc):
+        return
+    if isinstance(val_doc, ClassDoc):
+        namespace = getattr(pyval, '__dict__', {})
+        private_prefix = '_%s' % getattr(pyval, '__name__', '<none>')
+    else:
+        namespace = None
+    for (name, var_doc) in val_doc.variables.items():
+        if namespace is None:
+            if not hasattr(pyval, name): continue
+            child = getattr(pyval, name)
+        elif name.startswith('__') and private_prefix+name in namespace:
+            child = namespace[private_prefix+name]
+        elif name in namespace:
+            child = namespace[name]
+        else:
+            continue
+        # Literal values are shared by identity (see persistent_id).
+        if (isinstance(var_doc.value, GenericValueDoc) and
+            id(var_doc.value) in foreign_ids and
+            var_doc.value.pyval is not child):
+            var_doc.value = epydoc.docintrospecter.introspect_docs(child)
+            continue
+        _bind_pyvals(var_doc.value, child, foreign_ids, bound)
+
+def _register_introspected(val_doc, pyval):
+    """
+    Register a loaded C{ValueDoc} as the introspecter's C{ValueDoc}
+    for C{pyval}.  If the introspecter already created a C{ValueDoc}
+    for C{pyval}, then merge it into the loaded one.
+    """
+    from epydoc.docintrospecter import _valuedoc_cache, _introspected_values
+    pyid = id(pyval)
+    old_doc = _valuedoc_cache.get(pyid)
+    if old_doc is not None and old_doc is not val_doc:
+        if (isinstance(getattr(old_doc, 'subclasses', None), list) and
+            isinstance(getattr(val_doc, 'subclasses', None), list)):
+            for elt in old_doc.subclasses: _add_subclass(val_doc, elt)
+        if (isinstance(getattr(old_doc, 'submodules', None), list) and
+            isinstance(getattr(val_doc, 'submodules', None), list)):
+            for elt in old_doc.submodules:
+                _append_once(val_doc.submodules, elt)
+        val_doc.merge_and_overwrite(old_doc, ignore_hash_conflict=True)
+    else:
+        _valuedoc_cache[pyid] = val_doc
+    _introspected_values[pyid] = True
+
+######################################################################
+## Build Cache
+######################################################################
+
+class BuildCache:
+    """
+    A persistent cache of the C{(introspect_doc, parse_doc)} pairs
+    built for individual module files.  Each module is stored in its
+    own file in the cache directory.  The file contains two pickles:
+    a header, used to decide whether the entry is still valid; and
+    the module's docs.
+
+    A cache entry is valid if its header matches the current epydoc
+    version, build configuration, module name, and the module file's
+    contents.  The file's contents are compared using its
+    modification time and size; if those don't match, then the
+    SHA-1 hash of the file's contents is compared instead.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        """The directory where cache entries are stored.
+           @type: C{str}"""
+
+        self.hits = 0
+        """The number of modules that were loaded from the cache."""
+
+        self.misses = 0
+        """The number of modules that were not found in the cache."""
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _entry_filename(self, filename):
+        return os.path.join(self.directory,
+                            sha1(filename).hexdigest() + '.pickle')
+
+    def _config(self, modulename, introspect, parse):
+        """
+        Return a tuple describing everything other than the module
+        file's contents that affects the docs built for a module.
+        """
+        dp = epydoc.docparser
+        return (epydoc.__version__, sys.version, str(modulename),
+                introspect, parse, dp.PARSE_TRY_BLOCKS,
+                dp.PARSE_EXCEPT_BLOCKS, dp.PARSE_FINALLY_BLOCKS,
+                dp.PARSE_IF_BLOCKS, dp.PARSE_ELSE_BLOCKS,
+                dp.PARSE_WHILE_BLOCKS, dp.PARSE_FOR_BLOCKS,
+                dp.IMPORT_HANDLING, dp.IMPORT_STAR_HANDLING,
+                dp.DEFAULT_DECORATOR_BEHAVIOR, dp.BASE_HANDLING,
+                dp.PUBLIC_DECORATOR_APPENDS_TO_ALL,
+                dp.COMMENT_DOCSTRING_MARKER, dp.START_GROUP_MARKER,
+                dp.END_GROUP_MARKER)
+
+    def _file_signature(self, filename):
+        st = os.stat(filename)
+        return (st.st_mtime, st.st_size)
+
+    def _file_digest(self, filename):
+        f = open(filename, 'rb')
+        try: return sha1(f.read()).hexdigest()
+        finally: f.close()
+
+    def load(self, filename, modulename, introspect, parse):
+        """
+        Return the cached C{(introspect_doc, parse_doc)} pair for the
+        given module file, or C{None} if there is no valid entry.
+
+        @param filename: The (normalized) name of the module's
+            source file.
+        @param modulename: The dotted name of the module.
+        @param introspect: Whether the module should be introspected.
+        @param parse: Whether the module should be parsed.
+        """
+        entry = self._entry_filename(filename)
+        if not os.path.exists(entry):
+            self.misses += 1
+            return None
+        try:
+            f = open(entry, 'rb')
+            try:
+                header = pickle.load(f)
+                if not self._header_matches(header, filename, modulename,
+                                            introspect, parse):
+                    self.misses += 1
+                    return None
+                doc_pair = load_module_docs(f)
+            finally:
+                f.close()
+        except (KeyboardInterrupt, SystemExit): raise
+        except Exception, e:
+            log.debug('Discarding build cache entry for %s: %s' %
+                      (filename, e))
+            self.misses += 1
+            return None
+        log.info('Loaded %s from the build cache' % filename)
+        self.hits += 1
+        return doc_pair
+
+    def _header_matches(self, header, filename, modulename,
+                        introspect, parse):
+        if header.get('filename') != filename: return False
+        if header.get('config') != self._config(modulename,
+                                                introspect, parse):
+            return False
+        if header.get('signature') == self._file_signature(filename):
+            return True
+        return header.get('digest') == self._file_digest(filename)
+
+    def store(self, filename, modulename, introspect, parse, doc_pair):
+        """
+        Add the C{(introspect_doc, parse_doc)} pair that was built for
+        the given module file to the cache.  If the pair can't be
+        serialized, then it is silently left out of the cache.
+        """
+        header = dict(filename=filename,
+                      config=self._config(modulename, introspect, parse),
+                      signature=self._file_signature(filename),
+                      digest=self._file_digest(filename))
+        buf = StringIO()
+        pickle.dump(header, buf, pickle.HIGHEST_PROTOCOL)
+        try:
+            dump_module_docs(doc_pair, buf)
+        except UncacheableError, e:
+            log.debug('Not caching %s: %s' % (filename, e))
+            return
+
+        # Write the entry atomically, so that concurrent builds sharing
+        # a cache directory never see a partial entry.
+        entry = self._entry_filename(filename)
+        fd, tmpname = tempfile.mkstemp('.tmp', '', self.directory)
+        try:
+            os.write(fd, buf.getvalue())
+            os.close(fd)
+            if os.path.exists(entry) and sys.platform == 'win32':
+                os.remove(entry)
+            os.rename(tmpname, entry)
+        except OSError, e:
+            log.warning('Unable to write build cache entry for %s: %s' %
+                        (filename, e))
+            if os.path.exists(tmpname): os.remove(tmpname)
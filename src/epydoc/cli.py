@@ -153,7 +153,9 @@ def option_defaults():
         external_api=[], external_api_file=[], external_api_root=[],
         redundant_details=False, src_code_tab_width=8, verbosity=0,
         include_timestamp=True, target={}, default_target=None,
-        pdfdriver='auto', show_submodule_list=True, inherit_from_object=False)
+        pdfdriver='auto', show_submodule_list=True, inherit_from_object=False,
+        build_cache=None, incremental=False, jobs=1, graph_cache=None,
+        parse_cache=None, isolate_introspection=False, build_profile=None)
 
 # append_const is not defined in py2.3 or py2.4, so use a callback
 # instead, with the following function:
@@ -235,7 +237,8 @@ def parse_arguments():
 
     action_group.add_option("--pickle",
         action='callback', callback=add_action, 
-        help="Write the documentation to a pickle file.")
+        help="Write the documentation to a snapshot file, which can be "
+        "used as the input of a later run.")
 
     # Provide our own --help and --version options.
     action_group.add_option("--version",
@@ -340,6 +343,36 @@ def parse_arguments():
         help="Do not include methods & properties that are inherited "
         "from \"object\".  (default)")
 
+    generation_group.add_option('--build-cache',
+        dest='build_cache', metavar='DIR',
+        help="Cache the documentation that is built for each module in "
+        "DIR, and reuse it for modules that have not changed since the "
+        "last run.")
+
+    generation_group.add_option('--parse-cache',
+        dest='parse_cache', metavar='FILE',
+        help="Save the parsed docstrings in FILE, and reuse them for "
+        "docstrings that have not changed since the last run.")
+
+    generation_group.add_option('--jobs', '-j',
+        action='store', type='int', dest='jobs', metavar='N',
+        help="Use N processes to parse module files and to write "
+        "HTML pages.  (default: 1)")
+
+    generation_group.add_option('--isolate-introspection',
+        action='store_true', dest='isolate_introspection',
+        help="Import and introspect each module in its own process "
+        "(running up to N processes at once; see --jobs), so modules "
+        "can not affect each other, or crash epydoc.  (The build "
+        "cache can not be used with this option.)")
+
+    generation_group.add_option('--build-profile',
+        dest='build_profile', metavar='FILE',
+        help="Write a report of how long each module spent being "
+        "imported, introspected, parsed, and merged to FILE.  The "
+        "report is written as CSV if FILE ends with \".csv\", and "
+        "as JSON otherwise.")
+
     output_group = OptionGroup(optparser, 'Output Options')
     optparser.add_option_group(output_group)
 
@@ -407,6 +440,12 @@ def parse_arguments():
     output_group.add_option('--suppress-timestamp',
         action='store_false', dest='include_timestamp',
         help=("Do not include a timestamp in the generated output."))
+
+    output_group.add_option('--incremental',
+        action='store_true', dest='incremental',
+        help=("When generating HTML output, only rewrite the pages "
+              "whose contents changed since the last run that wrote "
+              "to the same output directory."))
     
     # The group of external API options.
     # Skip if the module couldn't be imported (usually missing docutils)
@@ -436,6 +475,11 @@ def parse_arguments():
         dest="dotpath", metavar='PATH',
         help="The path to the Graphviz 'dot' executable.")
 
+    graph_group.add_option('--graph-cache',
+        dest='graph_cache', metavar='DIR',
+        help="Cache the images that are rendered for graphs in DIR, and "
+        "reuse them for graphs that have not changed since the last run.")
+
     graph_group.add_option('--graph-font',
         dest='graph_font', metavar='FONT',
         help=("Specify the font used to generate Graphviz graphs.  (e.g., "
@@ -671,6 +715,16 @@ def parse_configfiles(configfiles, options, names):
             options.show_submodule_list = _str_to_bool(val, optname)
         elif optname in ('inherit-from-object', 'inherit_from_object'):
             options.inherit_from_object = _str_to_bool(val, optname)
+        elif optname in ('build-cache', 'build_cache'):
+            options.build_cache = val
+        elif optname in ('parse-cache', 'parse_cache'):
+            options.parse_cache = val
+        elif optname == 'jobs':
+            options.jobs = _str_to_int(val, optname)
+        elif optname in ('isolate-introspection', 'isolate_introspection'):
+            options.isolate_introspection = _str_to_bool(val, optname)
+        elif optname in ('build-profile', 'build_profile'):
+            options.build_profile = val
 
         # Output options
         elif optname == 'name':
@@ -697,6 +751,8 @@ def parse_configfiles(configfiles, options, names):
             options.src_code_tab_width = _str_to_int(val, optname)
         elif optname == 'timestamp':
             options.include_timestamp = _str_to_bool(val, optname)
+        elif optname == 'incremental':
+            options.incremental = _str_to_bool(val, optname)
 
         # External API
         elif optname in ('external-api', 'external_api'):
@@ -716,6 +772,8 @@ def parse_configfiles(configfiles, options, names):
             options.graphs.extend(graphtypes)
         elif optname == 'dotpath':
             options.dotpath = val
+        elif optname in ('graph-cache', 'graph_cache'):
+            options.graph_cache = val
         elif optname in ('graph-font', 'graph_font'):
             options.graph_font = val
         elif optname in ('graph-font-size', 'graph_font_size'):
@@ -881,6 +939,18 @@ def main(options):
         from epydoc.docwriter import dotgraph
         dotgraph.DOT_COMMAND = options.dotpath
 
+    # Set up the docstring parse cache
+    from epydoc import markup
+    if options.parse_cache:
+        markup.parse_cache = markup.ParseCache(filename=options.parse_cache)
+
+    # Set up the graph cache
+    graph_cache = None
+    if options.graph_cache:
+        from epydoc.docwriter import dotgraph
+        graph_cache = dotgraph.DotGraphCache(options.graph_cache)
+        dotgraph.DotGraph.cache = graph_cache
+
     # Set the default graph font & size
     if options.graph_font:
         from epydoc.docwriter import dotgraph
@@ -895,29 +965,53 @@ def main(options):
 
     # If the input name is a pickle file, then read the docindex that
     # it contains.  Otherwise, build the docs for the input names.
+    build_profile = None
     if options.load_pickle:
         assert len(options.names) == 1
         log.start_progress('Deserializing')
         log.progress(0.1, 'Loading %r' % options.names[0])
         t0 = time.time()
-        unpickler = pickle.Unpickler(open(options.names[0], 'rb'))
-        unpickler.persistent_load = pickle_persistent_load
-        docindex = unpickler.load()
+        from epydoc.snapshot import is_snapshot, read_snapshot
+        if is_snapshot(options.names[0]):
+            docindex = read_snapshot(options.names[0])
+        else:
+            # Pickle files written by older versions of epydoc.
+            unpickler = pickle.Unpickler(open(options.names[0], 'rb'))
+            unpickler.persistent_load = pickle_persistent_load
+            docindex = unpickler.load()
         log.debug('deserialization time: %.1f sec' % (time.time()-t0))
         log.end_progress()
     else:
         # Build docs for the named values.
-        from epydoc.docbuilder import build_doc_index
+        from epydoc.docbuilder import build_doc_index, BuildProfile
         exclude_parse = '|'.join(options.exclude_parse+options.exclude)
         exclude_introspect = '|'.join(options.exclude_introspect+
                                       options.exclude)
         inherit_from_object = options.inherit_from_object
+        # Keep the parser's tokens for the source code pages.
+        if 'html' in options.actions and options.include_source_code:
+            from epydoc import docparser
+            docparser.source_tokens = {}
+        # Profile the modules for the report & the timing summary.
+        if options.build_profile or options.verbosity >= 2:
+            build_profile = BuildProfile()
         docindex = build_doc_index(options.names,
                                    options.introspect, options.parse,
                                    add_submodules=(options.actions!=['text']),
                                    exclude_introspect=exclude_introspect,
                                    exclude_parse=exclude_parse,
-                                   inherit_from_object=inherit_from_object)
+                                   inherit_from_object=inherit_from_object,
+                                   cache_dir=options.build_cache,
+                                   jobs=options.jobs,
+                                   isolate_introspection=
+                                       options.isolate_introspection,
+                                   profile=build_profile)
+        if build_profile is not None and options.build_profile:
+            try:
+                build_profile.write(options.build_profile)
+            except IOError, e:
+                log.error('Unable to write the build profile %r: %s' %
+                          (options.build_profile, e))
 
     if docindex is None:
         for logger in loggers:
@@ -959,6 +1053,16 @@ def main(options):
         write_latex(docindex, options)
     if 'text' in options.actions:
         write_text(docindex, options)
+    if graph_cache is not None:
+        log.info('Graph cache: %d graphs reused, %d graphs rendered' %
+                 (graph_cache.hits, graph_cache.misses))
+    parse_cache = markup.parse_cache
+    if parse_cache is not None:
+        log.info('Parse cache: %d docstrings reused, %d docstrings parsed '
+                 '(%.0f%% hit rate)' % (parse_cache.hits, parse_cache.misses,
+                                        100*parse_cache.hit_rate()))
+        if parse_cache.filename is not None:
+            parse_cache.save()
 
     # If we suppressed docstring warnings, then let the user know.
     for logger in loggers:
@@ -976,7 +1080,7 @@ def main(options):
     if options.verbosity >= 2:
         for logger in loggers:
             if isinstance(logger, ConsoleLogger):
-                logger.print_times()
+                logger.print_times(build_profile)
                 break
 
     # If we encountered any message types that we were requested to
@@ -1003,28 +1107,19 @@ def write_html(docindex, options):
     log.end_progress()
 
 def write_pickle(docindex, options):
-    """Helper for writing output to a pickle file, which can then be
-    read in at a later time.  But loading the pickle is only marginally
-    faster than building the docs from scratch, so this has pretty
-    limited application."""
+    """Helper for writing output to a snapshot file (see
+    L{epydoc.snapshot}), which can then be read in at a later time, to
+    write the docs in other formats without building them again."""
+    from epydoc.snapshot import write_snapshot
     log.start_progress('Serializing output')
     log.progress(0.2, 'Writing %r' % options.target['pickle'])
-    outfile = open(options.target['pickle'], 'wb')
-    pickler = pickle.Pickler(outfile, protocol=0)
-    pickler.persistent_id = pickle_persistent_id
-    pickler.dump(docindex)
-    outfile.close()
+    write_snapshot(docindex, options.target['pickle'])
     log.end_progress()
 
-def pickle_persistent_id(obj):
-    """Helper for pickling, which allows us to save and restore UNKNOWN,
-    which is required to be identical to apidoc.UNKNOWN."""
-    if obj is UNKNOWN: return 'UNKNOWN'
-    else: return None
-
 def pickle_persistent_load(identifier):
-    """Helper for pickling, which allows us to save and restore UNKNOWN,
-    which is required to be identical to apidoc.UNKNOWN."""
+    """Helper for loading pickle files written by older versions of
+    epydoc, which allows us to restore UNKNOWN, which is required to
+    be identical to apidoc.UNKNOWN."""
     if identifier == 'UNKNOWN': return UNKNOWN
     else: raise pickle.UnpicklingError, 'Invalid persistent id'
 
@@ -1510,7 +1605,7 @@ class ConsoleLogger(log.Logger):
         self._task_times.append( (time.time()-self._progress_start_time,
                                   self._progress_header) )
 
-    def print_times(self):
+    def print_times(self, profile=None, top=10):
         print
         print 'Timing summary:'
         total = sum([time for (time, task) in self._task_times])
@@ -1523,6 +1618,15 @@ class ConsoleLogger(log.Logger):
             else:
                 print
         print
+        # The slowest modules, from the docbuilder's BuildProfile:
+        if profile is not None and profile.times:
+            print '%-39s%s' % ('Slowest modules:', ''.join(
+                ['%11s' % phase for phase in profile.PHASES]))
+            for (time, module, phase_times) in profile.top(top):
+                module = module[:34]
+                print '  %s%s%s' % (module, '.'*(37-len(module)), ''.join(
+                    ['%10.2fs' % t for t in phase_times]))
+            print
 
 class UnifiedProgressConsoleLogger(ConsoleLogger):
     def __init__(self, verbosity, stages, progress_mode=None):
@@ -1553,7 +1657,7 @@ class UnifiedProgressConsoleLogger(ConsoleLogger):
         if self.stage == len(self.stages):
             ConsoleLogger.end_progress(self)
 
-    def print_times(self):
+    def print_times(self, profile=None, top=10):
         pass
 
 class HTMLLogger(log.Logger):
@@ -67,11 +67,20 @@ __docformat__ = 'epytext en'
 ## Imports
 ######################################################################
 
-import sys, os, os.path, __builtin__, imp, re, inspect
+import sys, os, os.path, __builtin__, exceptions, imp, re, inspect, time
+from cStringIO import StringIO
+try: import multiprocessing
+except ImportError: multiprocessing = None # Python < 2.6
+try: import resource
+except ImportError: resource = None # Not available on Windows
 from epydoc.apidoc import *
 from epydoc.docintrospecter import introspect_docs
 from epydoc.docintrospecter import get_value_from_filename, get_value_from_name
 from epydoc.docparser import parse_docs, ParseError
+import epydoc.docparser, epydoc.docintrospecter, epydoc.buildcache
+from epydoc.buildcache import BuildCache, UncacheableError
+from epydoc.buildcache import dump_module_docs, load_module_docs
+from epydoc.buildcache import ModuleDocUnpickler
 from epydoc.docstringparser import parse_docstring
 from epydoc import log
 from epydoc.util import *
@@ -87,12 +96,35 @@ class BuildOptions:
     """
     def __init__(self, introspect=True, parse=True,
                  exclude_introspect=None, exclude_parse=None,
-                 add_submodules=True):
+                 add_submodules=True, cache_dir=None, jobs=1,
+                 isolate_introspection=False, profile=None):
         self.introspect = introspect
         self.parse = parse
         self.exclude_introspect = exclude_introspect
         self.exclude_parse = exclude_parse
         self.add_submodules = add_submodules
+        self.cache_dir = cache_dir
+        self.jobs = jobs
+        self.isolate_introspection = isolate_introspection
+        self.profile = profile
+
+        # The pool of parsing processes, while docs are being built.
+        self.parallel_parser = None
+
+        # The introspection worker processes, while docs are being built.
+        self.isolated_introspecter = None
+
+        # The persistent build cache, if one was requested.  (Cache
+        # entries can only be loaded into a process that has imported
+        # their modules.)
+        if cache_dir is not None and isolate_introspection and introspect:
+            log.warning('The build cache is not used when introspection '
+                        'is isolated.')
+            self.build_cache = None
+        elif cache_dir is not None:
+            self.build_cache = BuildCache(cache_dir)
+        else:
+            self.build_cache = None
 
         # Test for pattern syntax and compile them into pattern objects.
         try:
@@ -148,7 +180,8 @@ class BuildOptions:
 
 def build_doc(item, introspect=True, parse=True, add_submodules=True,
               exclude_introspect=None, exclude_parse=None,
-              inherit_from_object=False):
+              inherit_from_object=False, cache_dir=None, jobs=1,
+              isolate_introspection=False, profile=None):
     """
     Build API documentation for a given item, and return it as
     an L{APIDoc} object.
@@ -168,16 +201,28 @@ def build_doc(item, introspect=True, parse=True, add_submodules=True,
         specified items.  Otherwise, just use parsing.
     @param parse: If true, then use parsing to examine the specified
         items.  Otherwise, just use introspection.
+    @param cache_dir: The directory of a persistent build cache; see
+        L{build_doc_index()}.
+    @param jobs: The number of processes to use for parsing; see
+        L{build_doc_index()}.
+    @param isolate_introspection: If true, then introspect module
+        files in worker processes; see L{build_doc_index()}.
+    @param profile: A L{BuildProfile} that records the time spent on
+        each module; see L{build_doc_index()}.
     """
     docindex = build_doc_index([item], introspect, parse, add_submodules,
                                exclude_introspect=exclude_introspect,
                                exclude_parse=exclude_parse,
-                               inherit_from_object=inherit_from_object)
+                               inherit_from_object=inherit_from_object,
+                               cache_dir=cache_dir, jobs=jobs,
+                               isolate_introspection=isolate_introspection,
+                               profile=profile)
     return docindex.root[0]
 
 def build_doc_index(items, introspect=True, parse=True, add_submodules=True,
                     exclude_introspect=None, exclude_parse=None,
-                    inherit_from_object=False):
+                    inherit_from_object=False, cache_dir=None, jobs=1,
+                    isolate_introspection=False, profile=None):
     """
     Build API documentation for the given list of items, and
     return it in the form of a L{DocIndex}.
@@ -197,22 +242,62 @@ def build_doc_index(items, introspect=True, parse=True, add_submodules=True,
         specified items.  Otherwise, just use parsing.
     @param parse: If true, then use parsing to examine the specified
         items.  Otherwise, just use introspection.
+    @param cache_dir: If specified, then use a persistent build cache,
+        stored in the given directory, to avoid re-parsing and
+        re-introspecting module files that have not changed since
+        the last run.  See L{epydoc.buildcache}.
+    @param jobs: The number of processes to use for parsing module
+        files.  If C{jobs} is greater than one, then the module files
+        are parsed by a pool of worker processes; the results are
+        merged and linked by the main process.
+    @param isolate_introspection: If true, then each module file is
+        imported and introspected by its own worker process (running
+        up to C{jobs} at once), and never imported by the main
+        process.  This protects the main process from modules that
+        crash or modify global state when they are imported.  The
+        introspected docs have no C{pyval}s; instead, the worker
+        processes record how each value should be displayed (see
+        L{ValueDoc.pyval_record}).
+    @param profile: If specified, then record how long each module
+        spends being imported, introspected, parsed, and merged in
+        the given L{BuildProfile}.
     """
     try:
         options = BuildOptions(parse=parse, introspect=introspect,
             exclude_introspect=exclude_introspect, exclude_parse=exclude_parse,
-            add_submodules=add_submodules)
+            add_submodules=add_submodules, cache_dir=cache_dir, jobs=jobs,
+            isolate_introspection=isolate_introspection, profile=profile)
     except Exception, e:
         # log.error already reported by constructor.
         return None
 
     # Get the basic docs for each item.
     log.start_progress('Building documentation')
-    if introspect:
+    options.isolated_introspecter = _start_isolated_introspecter(items,
+                                                                 options)
+    if introspect and options.isolated_introspecter is None:
         # Import everything before we introspect anything.
         _import_docs_from_items(items, options)
-    doc_pairs = _get_docs_from_items(items, options)
+    options.parallel_parser = _start_parallel_parser(items, options)
+    try:
+        doc_pairs = _get_docs_from_items(items, options)
+        if options.isolated_introspecter is not None:
+            options.isolated_introspecter.link()
+    finally:
+        if options.parallel_parser is not None:
+            options.parallel_parser.close()
+        if options.isolated_introspecter is not None:
+            options.isolated_introspecter.close()
     log.end_progress()
+    if options.parallel_parser is not None:
+        log.info('Parallel parsing: %d modules parsed by %d processes' %
+                 (options.parallel_parser.loaded, options.jobs))
+    if options.isolated_introspecter is not None:
+        log.info('Isolated introspection: %d modules introspected by '
+                 'worker processes' % options.isolated_introspecter.loaded)
+    if options.build_cache is not None:
+        log.info('Build cache: %d modules loaded, %d modules built' %
+                 (options.build_cache.hits, options.build_cache.misses))
 
     # Merge the introspection & parse docs.
     if options.parse and options.introspect:
@@ -225,7 +310,9 @@ def build_doc_index(items, introspect=True, parse=True, add_submodules=True,
                 else:
                     name = parse_doc.canonical_name
                 log.progress(float(i)/len(doc_pairs), name)
+                if profile is not None: snapshot = profile.start()
                 docs.append(merge_docs(introspect_doc, parse_doc))
+                if profile is not None: profile.stop(name, 'merge', snapshot)
             elif introspect_doc is not None:
                 docs.append(introspect_doc)
             elif parse_doc is not None:
@@ -302,6 +389,7 @@ def build_doc_index(items, introspect=True, parse=True, add_submodules=True,
             percent = float(i)/len(valdocs)
             log.progress(percent, val_doc.canonical_name)
             inherit_docs(val_doc, inherit_from_object)
+            docindex.invalidate_links(val_doc)
     log.end_progress()
 
     # Initialize the groups & sortedvars attributes.
@@ -325,6 +413,163 @@ def _report_valdoc_progress(i, val_doc, val_docs):
         not val_doc.canonical_name[0].startswith('??')):
         log.progress(float(i)/len(val_docs), val_doc.canonical_name)
 
+#/////////////////////////////////////////////////////////////////
+# Build Profiling
+#/////////////////////////////////////////////////////////////////
+
+class BuildProfile:
+    """
+    Records how long each module spends in each phase of building its
+    documentation, and how much the process's memory use changes
+    during each phase.  The phases are:
+
+      - C{'import'}: importing the module before it is introspected.
+      - C{'introspect'}: L{introspect_docs()}.
+      - C{'parse'}: L{parse_docs()}.
+      - C{'merge'}: L{merge_docs()}.
+
+    When the module files are parsed or introspected by worker
+    processes, the C{'parse'} and C{'introspect'} phases record how
+    long the main process waited for, and loaded, each module's docs.
+
+    To profile a build, pass a C{BuildProfile} to L{build_doc_index()};
+    then use L{top()} to find the modules that dominate the build
+    time, or L{write()} to save a report.
+    """
+    PHASES = ('import', 'introspect', 'parse', 'merge')
+    """The phases that are profiled, in the order they run."""
+
+    def __init__(self):
+        self.times = {}
+        """The number of seconds spent in each phase, for each module.
+           @type: C{dict} from C{(module_name, phase)} to C{float}"""
+
+        self.memory = {}
+        """The change in the process's memory use (its resident set
+           size, in kilobytes) during each phase, for each module.
+           This is negative if the phase freed more memory than it
+           used.  Memory use is only recorded on platforms that provide
+           C{/proc/self/statm} (such as Linux); elsewhere, it is 0.
+           @type: C{dict} from C{(module_name, phase)} to C{int}"""
+
+    def start(self):
+        """
+        Return a snapshot of the current time and memory use, to
+        be passed to L{stop()} when the profiled phase ends.
+        """
+        return (time.time(), _current_memory())
+
+    def stop(self, module_name, phase, snapshot):
+        """
+        Record the time and memory used by C{module_name} since
+        C{snapshot} was taken by L{start()}.  If the module has
+        already been profiled in C{phase}, then the new numbers are
+        added to the old ones.
+        """
+        key = (str(module_name), phase)
+        self.times[key] = (self.times.get(key, 0) +
+                           time.time() - snapshot[0])
+        self.memory[key] = (self.memory.get(key, 0) +
+                            _current_memory() - snapshot[1])
+
+    def rename(self, old_name, new_name):
+        """
+        Move the times and memory use recorded for C{old_name} to
+        C{new_name}.
+        """
+        old_name, new_name = str(old_name), str(new_name)
+        for (module_name, phase) in self.times.keys():
+            if module_name == old_name:
+                for table in (self.times, self.memory):
+                    value = table.pop((old_name, phase))
+                    table[new_name, phase] = (table.get((new_name, phase), 0)
+                                              + value)
+
+    def modules(self):
+        """
+        Return a list of C{(total_time, module_name)} tuples, one for
+        each profiled module, ordered from the slowest module to the
+        fastest.
+        """
+        totals = {}
+        for (module_name, phase), t in self.times.items():
+            totals[module_name] = totals.get(module_name, 0) + t
+        modules = sorted([(-t, module_name)
+                          for (module_name, t) in totals.items()])
+        return [(-t, module_name) for (t, module_name) in modules]
+
+    def top(self, n=10):
+        """
+        Return a list of C{(total_time, module_name, phase_times)}
+        tuples for the C{n} slowest modules, where C{phase_times} is a
+        list containing the number of seconds the module spent in each
+        of the L{PHASES}.
+        """
+        return [(t, module_name, [self.times.get((module_name, phase), 0)
+                                  for phase in self.PHASES])
+                for (t, module_name) in self.modules()[:n]]
+
+    def write(self, filename):
+        """
+        Write a report of the profiled times and memory use to the
+        given file.  If C{filename} ends with C{'.csv'}, then the
+        report is written as a CSV file with one row for each module
+        and phase; otherwise, it is written as a JSON object.  In
+        both cases, the modules are listed from the slowest to the
+        fastest.
+        """
+        out = open(filename, 'wb')
+        try:
+            if filename.lower().endswith('.csv'):
+                self._write_csv(out)
+            else:
+                self._write_json(out)
+        finally:
+            out.close()
+
+    def _write_csv(self, out):
+        import csv
+        writer = csv.writer(out)
+        writer.writerow(['module', 'phase', 'seconds', 'memory_kb'])
+        for (t, module_name) in self.modules():
+            for phase in self.PHASES:
+                key = (module_name, phase)
+                if key in self.times:
+                    writer.writerow([module_name, phase,
+                                     '%.6f' % self.times[key],
+                                     self.memory[key]])
+
+    def _write_json(self, out):
+        import json
+        modules = []
+        for (t, module_name) in self.modules():
+            phases = {}
+            for phase in self.PHASES:
+                key = (module_name, phase)
+                if key in self.times:
+                    phases[phase] = {'seconds': self.times[key],
+                                     'memory_kb': self.memory[key]}
+            modules.append({'module': module_name, 'seconds': t,
+                            'phases': phases})
+        json.dump({'phases': list(self.PHASES), 'modules': modules},
+                  out, indent=1, sort_keys=True)
+
+def _current_memory():
+    """
+    Return the process's current memory use (its resident set size),
+    in kilobytes; or 0 if it is not available.  (Unlike the peak
+    memory use, this goes down when memory is freed; so it shows
+    which phases actually hold on to memory.)
+    """
+    if resource is None: return 0
+    try:
+        f = open('/proc/self/statm')
+        try: resident_pages = int(f.read().split()[1])
+        finally: f.close()
+    except (IOError, OSError, ValueError, IndexError):
+        return 0
+    return resident_pages * resource.getpagesize() // 1024
+
 #/////////////////////////////////////////////////////////////////
 # Pre-Import
 #/////////////////////////////////////////////////////////////////
@@ -343,7 +588,7 @@ def _import_docs_from_items(items, options):
             elif is_pyname(item):
                 if options.must_introspect(item):
                     try:
-                        val = get_value_from_name(item)
+                        val = _import_name(item, options)
                         if options.add_submodules and inspect.ismodule(val):
                             _import_docs_from_package(val, options)
                     except ImportError, e: pass
@@ -381,8 +626,561 @@ def _do_import(filename, options, parent=None):
     if options.must_introspect(modulename):
         log.progress(0, 'Importing %s' % modulename)
         #log.debug('importing %r (%s)' % (filename, modulename))
-        try: return get_value_from_filename(filename)
-        except ImportError, e: return None
+        if options.profile is not None: snapshot = options.profile.start()
+        try:
+            try: return get_value_from_filename(filename)
+            except ImportError, e: return None
+        finally:
+            if options.profile is not None:
+                options.profile.stop(modulename, 'import', snapshot)
+
+def _import_name(name, options):
+    if options.profile is not None: snapshot = options.profile.start()
+    try:
+        return get_value_from_name(name)
+    finally:
+        if options.profile is not None:
+            options.profile.stop(name, 'import', snapshot)
+
+#/////////////////////////////////////////////////////////////////
+# Parallel Parsing
+#/////////////////////////////////////////////////////////////////
+
+def _start_parallel_parser(items, options):
+    """
+    If C{options.jobs} is greater than one, then start parsing the
+    module files that are named by C{items} (including submodules of
+    packages) in a pool of worker processes, and return a
+    L{_ParallelParser} that can be used to collect the results.
+    Otherwise, return C{None}.
+    """
+    if options.jobs <= 1 or not options.parse:
+        return None
+    if multiprocessing is None:
+        log.warning('The multiprocessing module is not available; '
+                    'parsing module files serially.')
+        return None
+    filenames = _module_files_from_items(items, options,
+                                         options.must_parse)
+    if len(filenames) < 2:
+        return None
+    # The parser always introspects the builtins; do it before forking,
+    # so the workers don't each have to do it.
+    introspect_docs(__builtin__)
+    introspect_docs(exceptions)
+    return _ParallelParser(filenames, options.jobs)
+
+def _module_files_from_items(items, options, must_examine):
+    """
+    Return a list of the normalized filenames of the module files
+    that are named by C{items} (including submodules of packages),
+    whose modules' names satisfy C{must_examine}.
+    """
+    filenames = []
+    for item in items:
+        if not isinstance(item, basestring): continue
+        if is_module_file(item):
+            _collect_module_files(item, None, must_examine, filenames)
+        elif is_package_dir(item):
+            pkgfile = os.path.join(item, '__init__')
+            _collect_module_files(pkgfile, None, must_examine, filenames)
+            if options.add_submodules:
+                _collect_package_files(item, must_examine, filenames)
+    return filenames
+
+def _collect_package_files(package_dir, must_examine, filenames):
+    # Use the default __path__, since the package's own code isn't run.
+    parent = _module_name_from_path(os.path.join(package_dir, '__init__'))
+    module_files = []
+    subpackage_dirs = []
+    for name in sorted(os.listdir(package_dir)):
+        filename = os.path.join(package_dir, name)
+        if is_module_file(filename):
+            if os.path.splitext(name)[0] != '__init__':
+                module_files.append(filename)
+        elif is_package_dir(filename):
+            subpackage_dirs.append(filename)
+    for filename in module_files:
+        _collect_module_files(filename, parent, must_examine, filenames)
+    for subpackage_dir in subpackage_dirs:
+        _collect_module_files(os.path.join(subpackage_dir, '__init__'),
+                              parent, must_examine, filenames)
+        _collect_package_files(subpackage_dir, must_examine, filenames)
+
+def _collect_module_files(filename, parent, must_examine, filenames):
+    modulename = os.path.splitext(os.path.split(filename)[1])[0]
+    if modulename == '__init__':
+        modulename = os.path.split(os.path.split(filename)[0])[1]
+    if parent:
+        modulename = DottedName(parent, modulename)
+    if not must_examine(modulename):
+        return
+    filename = os.path.normpath(os.path.abspath(filename))
+    try: filename = py_src_filename(filename)
+    except ValueError: return
+    if filename not in filenames:
+        filenames.append(filename)
+
+def _module_name_from_path(filename):
+    """
+    Return the dotted name of the module with the given filename,
+    assuming that each package uses its default C{__path__}.
+    """
+    basedir, name = os.path.split(os.path.splitext(filename)[0])
+    if name == '__init__':
+        basedir, name = os.path.split(basedir)
+    name = DottedName(name)
+    while is_package_dir(basedir):
+        basedir, pkgname = os.path.split(basedir)
+        name = DottedName(pkgname, name)
+    return name
+
+class _ParallelParser:
+    """
+    Parses a list of module files in a pool of worker processes.  Each
+    worker parses its module with L{parse_docs()}, and sends back the
+    resulting C{ModuleDoc}, serialized with
+    L{dump_module_docs()<epydoc.buildcache.dump_module_docs>}; and the
+    messages that were logged while parsing it.
+
+    The results are collected on demand, by L{load()}, in the order
+    that the modules are visited by the main process.  This ensures
+    that packages are loaded before their submodules, and that the
+    logged messages are reported at the same point that they would
+    have been reported if the module had been parsed serially.  If a
+    result can not be loaded, then the module is parsed by the main
+    process instead.
+    """
+    def __init__(self, filenames, jobs):
+        self._pool = multiprocessing.Pool(jobs, _init_parse_worker)
+        self._pending = {}
+        for filename in filenames:
+            self._pending[filename] = self._pool.apply_async(
+                _parse_in_worker, (filename,))
+        self._loading = set()
+        self.loaded = 0
+        """The number of modules that were parsed by worker processes."""
+
+    def load(self, filename):
+        """
+        Return the C{ModuleDoc} that a worker process built for the
+        given module file, and register it with the parser's cache.
+        If the module was not parsed by a worker, or if its
+        C{ModuleDoc} can not be loaded, then return C{None}.
+
+        @raise ParseError: If the worker was unable to parse the module.
+        """
+        result = self._pending.pop(filename, None)
+        if result is None or filename in epydoc.docparser._moduledoc_cache:
+            return None
+        try:
+            data, error, records = result.get()
+        except (KeyboardInterrupt, SystemExit): raise
+        except Exception, e:
+            log.debug('Parsing %s in a worker process failed: %s' %
+                      (filename, e))
+            return None
+        if error is not None:
+            log.replay_records(records)
+            raise ParseError(error)
+        if data is None:
+            return None
+
+        self._loading.add(filename)
+        try:
+            try:
+                parse_doc = load_module_docs(StringIO(data),
+                                             self._resolve_parsed)[1]
+            except UncacheableError, e:
+                log.debug('Unable to load %s from a worker process: %s' %
+                          (filename, e))
+                return None
+        finally:
+            self._loading.discard(filename)
+        log.replay_records(records)
+        self.loaded += 1
+        return parse_doc
+
+    def _resolve_parsed(self, filename, relname):
+        # Load any other modules that the worker parsed before using
+        # the main process's parser.
+        if filename in self._loading:
+            raise UncacheableError('Cyclic reference to %s' % filename)
+        if filename in self._pending:
+            try:
+                parse_doc = self.load(filename)
+            except ParseError, e:
+                raise UncacheableError(str(e))
+            if parse_doc is None:
+                raise UncacheableError('Unable to load %s' % filename)
+        return epydoc.buildcache._resolve_parsed(filename, relname)
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        self._pool.terminate()
+        self._pool.join()
+        self._pending.clear()
+
+class _ParseRecordingLogger(log.RecordingLogger):
+    """
+    A logger used by worker processes to record the messages and
+    blocks that are logged while parsing a module, so that they can
+    be replayed by the main process.  If L{filename} is set, then
+    only messages that are logged while parsing L{filename} are
+    recorded, since any other modules that get parsed along the way
+    will report their own messages when they are parsed by the main
+    process (or loaded from their own worker).
+    """
+    def __init__(self):
+        log.RecordingLogger.__init__(self)
+        self.filename = None
+    def _record(self, method, args):
+        if self.filename is not None:
+            parsing = epydoc.docparser._files_being_parsed
+            if not (parsing and parsing[-1] == self.filename): return
+        log.RecordingLogger._record(self, method, args)
+
+_worker_logger = None
+"""The L{_ParseRecordingLogger} that is used by a parsing worker process."""
+
+def _init_parse_worker():
+    global _worker_logger
+    _worker_logger = _ParseRecordingLogger()
+    del log._loggers[:]
+    log.register_logger(_worker_logger)
+
+def _parse_in_worker(filename):
+    """
+    Parse the given module file, and return a tuple C{(data, error,
+    records)}, where C{data} is the serialized C{ModuleDoc} (or
+    C{None} if it could not be parsed or serialized); C{error} is the
+    error message if it could not be parsed; and C{records} are the
+    messages that were logged while parsing it.
+    """
+    _worker_logger.filename = filename
+    records = _worker_logger.records = []
+    try:
+        parse_doc = parse_docs(filename=filename)
+    except (ParseError, ImportError, IOError, OSError), e:
+        return (None, str(e), records)
+    out = StringIO()
+    try:
+        dump_module_docs((None, parse_doc), out)
+    except UncacheableError, e:
+        return (None, None, records)
+    return (out.getvalue(), None, records)
+
+#/////////////////////////////////////////////////////////////////
+# Isolated Introspection
+#/////////////////////////////////////////////////////////////////
+
+def _start_isolated_introspecter(items, options):
+    """
+    If C{options.isolate_introspection} is true, then start
+    introspecting the module files that are named by C{items}
+    (including submodules of packages) in worker processes, and
+    return an L{_IsolatedIntrospecter} that can be used to collect
+    the results.  Otherwise, return C{None}.
+    """
+    if not (options.isolate_introspection and options.introspect):
+        return None
+    if multiprocessing is None:
+        log.warning('The multiprocessing module is not available; '
+                    'introspecting modules in the main process.')
+        return None
+    filenames = _module_files_from_items(items, options,
+                                         options.must_introspect)
+    if not filenames:
+        return None
+    # Foreign values are resolved in the main process; and builtins
+    # are always needed.
+    introspect_docs(__builtin__)
+    introspect_docs(exceptions)
+    return _IsolatedIntrospecter(filenames, max(options.jobs, 1))
+
+class _ForeignValue:
+    """
+    A placeholder for a value that belongs to another module that was
+    introspected by an L{_IsolatedIntrospecter}.  Placeholders are
+    replaced by the C{APIDoc}s they name, by
+    L{_IsolatedIntrospecter.link()}.
+    """
+    def __init__(self, name):
+        self.name = name
+
+class _IsolatedIntrospecter:
+    """
+    Introspects a list of module files, each in its own worker
+    process.  At most C{jobs} workers run at once.  Each worker
+    imports and introspects its module (without saving & restoring
+    the interpreter's global state, since the worker is discarded
+    afterwards), and sends back the resulting C{ModuleDoc}, serialized
+    with L{dump_module_docs()<epydoc.buildcache.dump_module_docs>};
+    and the messages that were logged while introspecting it.  If a
+    worker dies, then its module is reported as failing to import.
+    Since each package is imported without its submodules, the
+    variables that would have been created by importing them are
+    added by L{link()}.
+
+    The introspected modules are never imported by the main process,
+    so the loaded docs have no C{pyval}s.  When a module is loaded by
+    L{load()}, any reference to a value from another introspected
+    module is replaced by a L{_ForeignValue} placeholder; once every
+    module has been loaded, L{link()} replaces the placeholders by
+    looking up their names in the loaded docs.  References to any
+    other values (such as builtins, or values from library modules
+    that the introspected modules import) are resolved in the main
+    process, importing their modules if necessary.
+    """
+    def __init__(self, filenames, jobs):
+        self._jobs = jobs
+        self._queue = list(filenames)
+        self._running = {}
+        self._results = {}
+        self._docs = {}
+        self._public_names = {}
+        self._loaded = []
+        self._unresolved = {}
+        self._module_files = {}
+        for filename in filenames:
+            name = str(_module_name_from_path(filename))
+            self._module_files[name] = filename
+        self._start_workers()
+        self.loaded = 0
+        """The number of modules that were introspected by worker
+        processes."""
+
+    def load(self, filename):
+        """
+        Return the C{ModuleDoc} that a worker process built for the
+        given module file.  If the module was not assigned to a
+        worker, then return C{None}.  The returned docs may contain
+        L{_ForeignValue} placeholders until L{link()} is called.
+
+        @raise ImportError: If the worker was unable to import or
+            introspect the module, or if its C{ModuleDoc} can not be
+            loaded.
+        """
+        if filename in self._docs:
+            return self._docs[filename]
+        if filename not in self._module_files.values():
+            return None
+        data, public_names, error, records = self._wait(filename)
+        log.replay_records(records)
+        if error is not None:
+            raise ImportError(error)
+        unpickler = ModuleDocUnpickler(
+            StringIO(data), resolve_introspected=self._resolve_introspected)
+        try:
+            module_doc = unpickler.load()[0]
+        except UncacheableError, e:
+            raise ImportError('Unable to load the documentation built by '
+                              'a worker process: %s' % e)
+        self._docs[filename] = module_doc
+        self._public_names[filename] = public_names
+        self._loaded.append( (module_doc, unpickler.foreign_ids) )
+        self.loaded += 1
+        return module_doc
+
+    def link(self):
+        """
+        Replace the L{_ForeignValue} placeholders in all loaded docs
+        with the C{APIDoc}s they name; add the loaded modules and
+        classes to their packages' C{submodules} and their bases'
+        C{subclasses} lists; and add a variable for each loaded module
+        to its package.
+        """
+        for (module_doc, foreign_ids) in self._loaded:
+            local_docs = epydoc.buildcache._local_docs([module_doc],
+                                                       foreign_ids)
+            for api_doc in local_docs:
+                self._link_doc(api_doc)
+            epydoc.buildcache._relink_docs(local_docs)
+        for (module_doc, foreign_ids) in self._loaded:
+            self._add_submodule_var(module_doc)
+        self._loaded = []
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        for (process, conn) in self._running.values():
+            process.terminate()
+            process.join()
+            conn.close()
+        self._running.clear()
+        self._results.clear()
+        del self._queue[:]
+
+    def _start_workers(self):
+        while self._queue and len(self._running) < self._jobs:
+            filename = self._queue.pop(0)
+            conn, worker_conn = multiprocessing.Pipe(False)
+            process = multiprocessing.Process(target=_introspect_in_worker,
+                                              args=(filename, worker_conn))
+            process.daemon = True
+            process.start()
+            worker_conn.close()
+            self._running[filename] = (process, conn)
+
+    def _wait(self, filename):
+        # Start the requested module's worker next, if it's waiting.
+        if filename in self._queue:
+            self._queue.remove(filename)
+            self._queue.insert(0, filename)
+        while filename not in self._results:
+            if not self._collect_results():
+                if filename in self._running:
+                    self._running[filename][1].poll(0.1)
+                else:
+                    time.sleep(0.01)
+        return self._results.pop(filename)
+
+    def _collect_results(self):
+        # Collect the results of any workers that have finished, and
+        # start new workers to replace them.  Return true if any
+        # worker has finished.
+        finished = False
+        for (filename, (process, conn)) in self._running.items():
+            if not conn.poll() and process.is_alive():
+                continue
+            result = None
+            if conn.poll():
+                try: result = conn.recv()
+                except EOFError: pass
+            conn.close()
+            process.join()
+            if result is None:
+                result = (None, None, 'The worker process that imported '
+                          'this module exited unexpectedly (exit code %s)' %
+                          process.exitcode, [])
+            self._results[filename] = result
+            del self._running[filename]
+            finished = True
+        self._start_workers()
+        return finished
+
+    def _resolve_introspected(self, name, introspected):
+        if self._find_module(name)[0] is not None:
+            return _ForeignValue(name)
+        try:
+            return epydoc.buildcache._resolve_introspected(name, introspected)
+        except KeyError:
+            # The value's module hasn't been imported by this process.
+            get_value_from_name(name)
+            return epydoc.buildcache._resolve_introspected(name, introspected)
+
+    def _find_module(self, name):
+        # Return the filename of the introspected module that contains
+        # the named value, and the value's name relative to it.
+        identifiers = [identifier.rstrip("'") for identifier in name]
+        for i in range(len(identifiers), 0, -1):
+            filename = self._module_files.get('.'.join(identifiers[:i]))
+            if filename is not None:
+                return filename, identifiers[i:]
+        return None, None
+
+    def _link_doc(self, api_doc):
+        # Placeholders can be attribute values, or elements of lists,
+        # tuples, or dictionaries that are attribute values.
+        for (attr, val) in api_doc.__dict__.items():
+            if isinstance(val, _ForeignValue):
+                setattr(api_doc, attr, self._lookup(val.name))
+            elif isinstance(val, list):
+                val[:] = [self._link_value(elt) for elt in val]
+            elif isinstance(val, tuple):
+                setattr(api_doc, attr,
+                        tuple([self._link_value(elt) for elt in val]))
+            elif isinstance(val, dict):
+                for (key, elt) in val.items():
+                    if isinstance(elt, _ForeignValue):
+                        val[key] = self._lookup(elt.name)
+
+    def _add_submodule_var(self, module_doc):
+        # Importing a submodule sets a variable in its package; so add
+        # the variable that the package would have had, if it had been
+        # introspected after its submodules were imported.
+        package = module_doc.package
+        if (not isinstance(package, ModuleDoc) or
+            package.variables is UNKNOWN or
+            package.filename not in self._docs):
+            return
+        name = module_doc.canonical_name[-1]
+        if name in package.variables: return
+        var_doc = VariableDoc(name=name, value=module_doc,
+                              is_imported=True, container=package,
+                              docs_extracted_by='introspecter')
+        # (Its public & imported status are set from the package's
+        # __all__ attribute, the same way introspect_module() does.)
+        public_names = self._public_names.get(package.filename)
+        if public_names is not None and name in public_names:
+            var_doc.is_public = True
+            var_doc.is_imported = False
+        elif public_names is not None:
+            var_doc.is_public = False
+        package.variables[name] = var_doc
+
+    def _link_value(self, val):
+        if isinstance(val, _ForeignValue):
+            return self._lookup(val.name)
+        return val
+
+    def _lookup(self, name):
+        filename, identifiers = self._find_module(name)
+        val_doc = self._docs.get(filename)
+        for identifier in identifiers:
+            if (val_doc is None or not isinstance(val_doc, NamespaceDoc) or
+                val_doc.variables is UNKNOWN or
+                identifier not in val_doc.variables):
+                val_doc = None
+                break
+            val_doc = self._link_value(val_doc.variables[identifier].value)
+        if val_doc in (None, UNKNOWN):
+            # The value's module could not be introspected; so use a
+            # proxy, which will be linked if the value is parsed.
+            val_doc = self._unresolved.get(name)
+            if val_doc is None:
+                val_doc = self._unresolved[name] = ValueDoc(
+                    canonical_name=name, proxy_for=name,
+                    docs_extracted_by='introspecter')
+        return val_doc
+
+def _introspect_in_worker(filename, conn):
+    """
+    Import and introspect the given module file, and send a tuple
+    C{(data, public_names, error, records)} to the connection C{conn},
+    where C{data} is the serialized C{ModuleDoc} (or C{None} if it
+    could not be built or serialized); C{public_names} is the list of
+    names in the module's C{__all__} attribute (or C{None}); C{error}
+    is the error message if the C{ModuleDoc} could not be built or
+    serialized; and C{records} are the messages that were logged.
+    """
+    logger = log.RecordingLogger()
+    del log._loggers[:]
+    log.register_logger(logger)
+    epydoc.docintrospecter._restore_import_state = False
+    try:
+        module_doc = introspect_docs(filename=filename)
+        public_names = getattr(module_doc.pyval, '__all__', None)
+        if public_names is not None:
+            try: public_names = [str(name) for name in public_names]
+            except KeyboardInterrupt: raise
+            except: public_names = None
+        out = StringIO()
+        dump_module_docs((module_doc, None), out, detached=True)
+        result = (out.getvalue(), public_names, None, logger.records)
+    except ImportError, e:
+        result = (None, None, str(e), logger.records)
+    except UncacheableError, e:
+        result = (None, None, 'Unable to send the documentation to the '
+                  'main process: %s' % e, logger.records)
+    except Exception, e:
+        result = (None, None, '%s: %s' % (e.__class__.__name__, e),
+                  logger.records)
+    conn.send(result)
+    conn.close()
 
 #/////////////////////////////////////////////////////////////////
 # Documentation Generation
@@ -509,12 +1307,16 @@ def _get_docs_from_pyname(name, options, progress_estimator,
     
     introspect_doc = parse_doc = None
     introspect_error = parse_error = None
+    profile = options.profile
     if options.must_introspect(name):
+        if profile is not None: snapshot = profile.start()
         try:
             introspect_doc = introspect_docs(name=name)
         except ImportError, e:
             introspect_error = str(e)
+        if profile is not None: profile.stop(name, 'introspect', snapshot)
     if options.must_parse(name):
+        if profile is not None: snapshot = profile.start()
         try:
             parse_doc = parse_docs(name=name)
         except ParseError, e:
@@ -523,6 +1325,7 @@ def _get_docs_from_pyname(name, options, progress_estimator,
             # If we get here, then there' probably no python source
             # available; don't bother to generate a warnining.
             pass
+        if profile is not None: profile.stop(name, 'parse', snapshot)
         
     # Report any errors we encountered.
     if not suppress_warnings:
@@ -597,28 +1400,68 @@ def _get_docs_from_module_file(filename, options, progress_estimator,
     except ValueError:
         src_file_available = False
 
+    # Check if the docs are available from the build cache.
+    introspect = options.must_introspect(modulename)
+    parse = src_file_available and options.must_parse(modulename)
+    build_cache = options.build_cache
+    if (build_cache is not None and src_file_available and
+        (introspect or parse) and
+        filename not in epydoc.docparser._moduledoc_cache):
+        doc_pair = build_cache.load(filename, modulename, introspect, parse)
+        if doc_pair is not None:
+            return doc_pair
+    else:
+        build_cache = None
+
     # Get the introspected & parsed docs (as appropriate)
     introspect_doc = parse_doc = None
     introspect_error = parse_error = None
+    profile = options.profile
     if options.must_introspect(modulename):
+        if profile is not None: snapshot = profile.start()
         try:
-            introspect_doc = introspect_docs(
-                filename=filename, context=parent_docs[0])
+            if options.isolated_introspecter is not None:
+                introspect_doc = options.isolated_introspecter.load(filename)
+            if introspect_doc is None:
+                introspect_doc = introspect_docs(
+                    filename=filename, context=parent_docs[0])
             if introspect_doc.canonical_name is UNKNOWN:
                 introspect_doc.canonical_name = modulename
         except ImportError, e:
             introspect_error = str(e)
+        if profile is not None:
+            profile.stop(modulename, 'introspect', snapshot)
     if src_file_available and options.must_parse(modulename):
+        if profile is not None: snapshot = profile.start()
         try:
-            parse_doc = parse_docs(
-                filename=filename, context=parent_docs[1])
+            if options.parallel_parser is not None:
+                parse_doc = options.parallel_parser.load(filename)
+            if parse_doc is None:
+                parse_doc = parse_docs(
+                    filename=filename, context=parent_docs[1])
         except (ParseError, ImportError, IOError, OSError), e:
             parse_error = str(e)
+        if profile is not None: profile.stop(modulename, 'parse', snapshot)
+
+    # A package that was given by its directory may turn out to have
+    # a longer canonical name; profile it under that name.
+    if profile is not None:
+        for doc in (introspect_doc, parse_doc):
+            if (doc is not None and doc.canonical_name not in (None, UNKNOWN)
+                and doc.canonical_name != modulename):
+                profile.rename(modulename, doc.canonical_name)
+                break
 
     # Report any errors we encountered.
     _report_errors(filename, introspect_doc, parse_doc,
                    introspect_error, parse_error)
 
+    # Add the docs to the build cache.
+    if (build_cache is not None and introspect_error is None and
+        parse_error is None):
+        build_cache.store(filename, modulename, introspect, parse,
+                          (introspect_doc, parse_doc))
+
     # Return the docs we found.
     return (introspect_doc, parse_doc)
 
@@ -1141,6 +1984,7 @@ def link_imports(val_doc, docindex):
                         src_doc.subclasses.append(subclass)
             # Then overwrite val_doc with the contents of src_doc.
             src_doc.merge_and_overwrite(val_doc, ignore_hash_conflict=True)
+            docindex.invalidate_links(src_doc)
 
         # If the proxy_for link points back at src_doc
         # itself, then we most likely have a variable that's
@@ -1152,6 +1996,7 @@ def link_imports(val_doc, docindex):
             parent = docindex.get_valdoc(parent_name)
             if parent is not None and var_name in parent.variables:
                 del parent.variables[var_name]
+                docindex.invalidate_links(parent)
             src_doc.proxy_for = None
 
 ######################################################################
@@ -1211,7 +2056,7 @@ def assign_canonical_names(val_doc, name, docindex, score=0):
 
     # Recurse to any contained values.
     if isinstance(val_doc, NamespaceDoc):
-        for var_doc in val_doc.variables.values():
+        for var_doc in _variables_by_precedence(val_doc):
             # Set the variable's canonical name.
             varname = DottedName(name, var_doc.name)
             var_doc.canonical_name = varname
@@ -1239,11 +2084,36 @@ def assign_canonical_names(val_doc, name, docindex, score=0):
             assign_canonical_names(var_doc.value, varname,
                                    docindex, vardoc_score)
 
+            # If this variable gave the value its name, then record it
+            # in the docindex's reverse index.
+            if var_doc.value.canonical_name == varname:
+                docindex.set_defining_variable(var_doc.value, val_doc,
+                                               var_doc)
+
     # Recurse to any directly reachable values.
     for val_doc_2 in val_doc.apidoc_links(variables=False):
         val_name, val_score = _unreachable_name_for(val_doc_2, docindex)
         assign_canonical_names(val_doc_2, val_name, docindex, val_score)
 
+def _variables_by_precedence(val_doc):
+    """
+    Return the variables of the namespace C{val_doc}, in the order
+    that L{assign_canonical_names()} should visit them.  When two
+    variables give a value the same score, the first one visited
+    names it; so a variable whose name is its value's own
+    C{__name__} comes first, and aliases come last.  (Otherwise, the
+    variables keep their order.)
+    """
+    def precedence(var_doc):
+        own_name = None
+        if (isinstance(var_doc.value, ValueDoc) and
+            var_doc.value.pyval is not UNKNOWN):
+            try: own_name = getattr(var_doc.value.pyval, '__name__', None)
+            except KeyboardInterrupt: raise
+            except: pass
+        return (own_name != var_doc.name, var_doc.is_alias is True)
+    return sorted(val_doc.variables.values(), key=precedence)
+
 def _var_shadows_self(var_doc, varname):
     return (var_doc.value not in (None, UNKNOWN) and
             var_doc.value.canonical_name not in (None, UNKNOWN) and
@@ -1260,6 +2130,7 @@ def _fix_self_shadowing_var(var_doc, varname, docindex):
             log.warning("%s shadows its own value -- using %s instead" %
                      (varname, new_name))
             var_doc.value = val_doc
+            docindex.invalidate_links()
             return
 
     # If we couldn't find the actual value, use an unreachable name.
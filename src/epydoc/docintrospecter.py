@@ -894,6 +894,13 @@ def _lookup(module, name):
             raise ImportError(exc_msg)
     return val
             
+_restore_import_state = True
+"""If true, then L{_import()} restores the contents of sys and
+__builtins__ after each import.  Worker processes that are discarded
+after introspecting a single module (see
+L{epydoc.docbuilder.build_doc_index()}) set this to false, since they
+never use the restored state."""
+
 def _import(name, filename=None):
     """
     Run the given callable in a 'sandboxed' environment.
@@ -903,9 +910,11 @@ def _import(name, filename=None):
     # Note that we just do a shallow copy of sys.  In particular,
     # any changes made to sys.modules will be kept.  But we do
     # explicitly store sys.path.
-    old_sys = sys.__dict__.copy()
-    old_sys_path = sys.path[:]
-    old_builtins = __builtin__.__dict__.copy()
+    restore = _restore_import_state
+    if restore:
+        old_sys = sys.__dict__.copy()
+        old_sys_path = sys.path[:]
+        old_builtins = __builtin__.__dict__.copy()
 
     # Add the current directory to sys.path, in case they're trying to
     # import a module by name that resides in the current directory.
@@ -940,11 +949,12 @@ def _import(name, filename=None):
             raise ImportError(estr)
     finally:
         # Restore the important values that we saved.
-        __builtin__.__dict__.clear()
-        __builtin__.__dict__.update(old_builtins)
-        sys.__dict__.clear()
-        sys.__dict__.update(old_sys)
-        sys.path = old_sys_path
+        if restore:
+            __builtin__.__dict__.clear()
+            __builtin__.__dict__.update(old_builtins)
+            sys.__dict__.clear()
+            sys.__dict__.update(old_sys)
+            sys.path = old_sys_path
         
 def introspect_docstring_lineno(api_doc):
     """
@@ -61,6 +61,8 @@ import imp
 import os, os.path, sys
 # Unicode:
 import codecs
+# Token records:
+import array, itertools
 # API documentation encoding:
 from epydoc.apidoc import *
 # For looking up the docs of builtins:
@@ -88,6 +90,48 @@ C{_moduledoc_cache} is a dictionary mapping from filenames to
 C{ValueDoc} objects.
 @type: C{dict}"""
 
+_files_being_parsed = []
+"""The filenames of the modules that are currently being parsed.  The
+last element is the innermost module (modules may be parsed while
+another module is being parsed, e.g., to find a base class).
+@type: C{list}"""
+
+source_tokens = None
+"""If not C{None}, then L{process_file()} records the tokens of each
+module file that it parses in this dictionary, which maps absolute
+filenames to L{SourceTokens}.  The source code colorizer uses these
+records, so it doesn't need to tokenize each module a second time.
+@type: C{dict} or C{None}"""
+
+class SourceTokens:
+    """
+    A compact record of the tokens in a module's source file.  Each
+    token is stored as its type and the character offsets of its start
+    and end in the file's text, in three parallel arrays; the token's
+    text can be recovered by slicing the file's text.
+    """
+    def __init__(self):
+        self.types = array.array('B')
+        """The type of each token."""
+        self.starts = array.array('l')
+        """The offset of the first character of each token."""
+        self.ends = array.array('l')
+        """The offset just past the last character of each token."""
+        self.length = None
+        """The length of the text that was tokenized."""
+
+    def add(self, toktype, start, end):
+        self.types.append(toktype)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        """Iterate over the C{(toktype, start, end)} of each token."""
+        return itertools.izip(self.types, self.starts, self.ends)
+
 #////////////////////////////////////////////////////////////
 # Configuration Constants
 #////////////////////////////////////////////////////////////
@@ -237,67 +281,78 @@ def parse_docs(filename=None, name=None, context=None, is_script=False):
         if filename in _moduledoc_cache:
             return _moduledoc_cache[filename]
         
-        log.info("Parsing %s" % filename)
-
-        # If the context wasn't provided, then check if the file is in
-        # a package directory.  If so, then update basedir & name to
-        # contain the topmost package's directory and the fully
-        # qualified name for this file.  (This update assume the
-        # default value of __path__ for the parent packages; if the
-        # parent packages override their __path__s, then this can
-        # cause us not to find the value.)
-        if context is None and not is_script:
-            basedir = os.path.split(filename)[0]
-            name = os.path.splitext(os.path.split(filename)[1])[0]
-            if name == '__init__':
-                basedir, name = os.path.split(basedir)
-            context = _parse_package(basedir)
-
-        # Figure out the canonical name of the module we're parsing.
-        if not is_script:
-            module_name, is_pkg = _get_module_name(filename, context)
-        else:
-            module_name = DottedName(munge_script_name(filename))
-            is_pkg = False
-
-        # Create a new ModuleDoc for the module, & add it to the cache.
-        module_doc = ModuleDoc(canonical_name=module_name, variables={},
-                               sort_spec=[], imports=[],
-                               filename=filename, package=context,
-                               is_package=is_pkg, submodules=[],
-                               docs_extracted_by='parser')
-        module_doc.defining_module = module_doc
-        _moduledoc_cache[filename] = module_doc
-
-        # Set the module's __path__ to its default value.
-        if is_pkg:
-            module_doc.path = [os.path.split(module_doc.filename)[0]]
-        
-        # Add this module to the parent package's list of submodules.
-        if context is not None:
-            context.submodules.append(module_doc)
-
-        # Tokenize & process the contents of the module's source file.
+        _files_being_parsed.append(filename)
         try:
-            process_file(module_doc)
-        except tokenize.TokenError, e:
-            msg, (srow, scol) = e.args
-            raise ParseError('Error during parsing: %s '
-                             '(%s, line %d, char %d)' %
-                             (msg, module_doc.filename, srow, scol))
-        except (IndentationError, UnicodeDecodeError), e:
-            raise ParseError('Error during parsing: %s (%s)' %
-                             (e, module_doc.filename))
-
-        # Handle any special variables (__path__, __docformat__, etc.)
-        handle_special_module_vars(module_doc)
-
-        # Return the completed ModuleDoc
-        return module_doc
+            log.info("Parsing %s" % filename)
+            return _parse_module_file(filename, context, is_script)
+        finally:
+            _files_being_parsed.pop()
     else:
         raise ValueError("Expected exactly one of the following "
                          "arguments: name, filename")
 
+def _parse_module_file(filename, context, is_script):
+    """
+    Create a new C{ModuleDoc} for the given (normalized) filename, add
+    it to the cache, and use L{process_file()} to populate its
+    attributes.  This is a helper for L{parse_docs()}.
+    """
+    # If the context wasn't provided, then check if the file is in
+    # a package directory.  If so, then update basedir & name to
+    # contain the topmost package's directory and the fully
+    # qualified name for this file.  (This update assume the
+    # default value of __path__ for the parent packages; if the
+    # parent packages override their __path__s, then this can
+    # cause us not to find the value.)
+    if context is None and not is_script:
+        basedir = os.path.split(filename)[0]
+        name = os.path.splitext(os.path.split(filename)[1])[0]
+        if name == '__init__':
+            basedir, name = os.path.split(basedir)
+        context = _parse_package(basedir)
+
+    # Figure out the canonical name of the module we're parsing.
+    if not is_script:
+        module_name, is_pkg = _get_module_name(filename, context)
+    else:
+        module_name = DottedName(munge_script_name(filename))
+        is_pkg = False
+
+    # Create a new ModuleDoc for the module, & add it to the cache.
+    module_doc = ModuleDoc(canonical_name=module_name, variables={},
+                           sort_spec=[], imports=[],
+                           filename=filename, package=context,
+                           is_package=is_pkg, submodules=[],
+                           docs_extracted_by='parser')
+    module_doc.defining_module = module_doc
+    _moduledoc_cache[filename] = module_doc
+
+    # Set the module's __path__ to its default value.
+    if is_pkg:
+        module_doc.path = [os.path.split(module_doc.filename)[0]]
+    
+    # Add this module to the parent package's list of submodules.
+    if context is not None:
+        context.submodules.append(module_doc)
+
+    # Tokenize & process the contents of the module's source file.
+    try:
+        process_file(module_doc)
+    except tokenize.TokenError, e:
+        msg, (srow, scol) = e.args
+        raise ParseError('Error during parsing: %s '
+                         '(%s, line %d, char %d)' %
+                         (msg, module_doc.filename, srow, scol))
+    except (IndentationError, UnicodeDecodeError), e:
+        raise ParseError('Error during parsing: %s (%s)' %
+                         (e, module_doc.filename))
+
+    # Handle any special variables (__path__, __docformat__, etc.)
+    handle_special_module_vars(module_doc)
+
+    # Return the completed ModuleDoc
+    return module_doc
+
 def _parse_package(package_dir):
     """
     If the given directory is a package directory, then parse its
@@ -536,8 +591,26 @@ def process_file(module_doc):
                     (encoding, module_doc.filename))
         encoding = 'iso-8859-1'
         module_file = codecs.open(module_doc.filename, 'rU', encoding)
-    tok_iter = tokenize.generate_tokens(module_file.readline)
+    # If requested, record the tokens (see source_tokens).  Token
+    # positions are converted to offsets using the offsets of the
+    # lines that have been read so far.
+    if source_tokens is None:
+        tokens = None
+        readline = module_file.readline
+    else:
+        tokens = SourceTokens()
+        line_offsets = [0]
+        def readline():
+            line = module_file.readline()
+            line_offsets.append(line_offsets[-1]+len(line))
+            return line
+    
+    tok_iter = tokenize.generate_tokens(readline)
     for toktype, toktext, (srow,scol), (erow,ecol), line_str in tok_iter:
+        if tokens is not None:
+            tokens.add(toktype, line_offsets[srow-1]+scol,
+                       line_offsets[erow-1]+ecol)
+            
         # BOM encoding marker: ignore.
         if (toktype == token.ERRORTOKEN and
             (toktext == u'\ufeff' or
@@ -669,6 +742,10 @@ def process_file(module_doc):
             lineno = None
             comments = []
             decorators = []
+
+    if tokens is not None:
+        tokens.length = line_offsets[-1]
+        source_tokens[os.path.abspath(module_doc.filename)] = tokens
             
 def add_to_group(container, api_doc, group_name):
     if container.group_specs is UNKNOWN:
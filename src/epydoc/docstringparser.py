@@ -194,6 +194,7 @@ def parse_docstring(api_doc, docindex, suppress_warnings=[]):
         if isinstance(api_doc, NamespaceDoc):
             for field in STANDARD_FIELDS + user_docfields(api_doc, docindex):
                 add_metadata_from_var(api_doc, field)
+            docindex.invalidate_links(api_doc)
         return
 
     # Remove leading indentation from the docstring.
@@ -259,6 +260,7 @@ def parse_docstring(api_doc, docindex, suppress_warnings=[]):
     if isinstance(api_doc, NamespaceDoc):
         for field in STANDARD_FIELDS + user_docfields(api_doc, docindex):
             add_metadata_from_var(api_doc, field)
+        docindex.invalidate_links(api_doc)
 
     # Extract a summary
     if api_doc.summary is None and api_doc.descr is not None:
@@ -535,11 +537,10 @@ def report_errors(api_doc, docindex, parse_errors, field_warnings):
     # End the message block.
     log.end_block()
 
-RETURN_PDS = markup.parse('Returns:', markup='epytext')
+RETURN_PDS = markup.parse('Returns:', markup='epytext', inline=True)
 """A ParsedDocstring containing the text 'Returns'.  This is used to
 construct summary descriptions for routines that have empty C{descr},
 but non-empty C{return_descr}."""
-RETURN_PDS._tree.children[0].attribs['inline'] = True
 
 ######################################################################
 #{ Field Processing Error Messages
@@ -671,6 +672,7 @@ def process_undocumented_field(api_doc, docindex, tag, arg, descr):
             if var_name_re.match(var_name):
                 # Remove the variable from `variables`.
                 api_doc.variables.pop(var_name, None)
+                docindex.invalidate_links(api_doc)
                 if api_doc.sort_spec is not UNKNOWN:
                     try: api_doc.sort_spec.remove(var_name)
                     except ValueError: pass
@@ -682,6 +684,7 @@ def process_undocumented_field(api_doc, docindex, tag, arg, descr):
                 # Remove the indicated submodules from this module.
                 api_doc.submodules = [m for m in api_doc.submodules
                                       if m not in removed]
+                docindex.invalidate_links(api_doc)
                 # Remove all ancestors of the indicated submodules
                 # from the docindex root.  E.g., if module x
                 # declares y to be undocumented, then x.y.z should
@@ -690,6 +693,7 @@ def process_undocumented_field(api_doc, docindex, tag, arg, descr):
                     for m in removed:
                         if m.canonical_name.dominates(elt.canonical_name):
                             docindex.root.remove(elt)
+                            docindex.invalidate_links()
 
 def process_group_field(api_doc, docindex, tag, arg, descr):
     """Define a group named C{arg} containing the variables whose
@@ -22,7 +22,10 @@ __docformat__ = 'restructuredtext'
 
 import re
 import sys
+import shutil
 import tempfile
+try: from hashlib import sha1
+except ImportError: from sha import new as sha1
 from epydoc import log
 from epydoc.apidoc import *
 from epydoc.util import *
@@ -95,6 +98,14 @@ class DotGraph(object):
     
     DEFAULT_HTML_IMAGE_FORMAT = 'gif'
     """The default format used to generate images by `to_html()`"""
+
+    batch = None
+    """If not ``None``, then a `DotGraphBatch` that `to_html()` should
+    add graphs to, instead of rendering them immediately."""
+
+    cache = None
+    """If not ``None``, then a `DotGraphCache` that is used to reuse
+    the images that were rendered for unchanged graphs."""
     
     def __init__(self, title, body='', node_defaults=None,
                  edge_defaults=None, caption=None):
@@ -172,8 +183,16 @@ class DotGraph(object):
                 raise
                 log.warning('dot2tex failed; using dot instead')
 
-        # Render the graph in postscript.
-        ps = self._run_dot('-Tps', size=size)
+        # Render the graph in postscript (or reuse a cached rendering).
+        ps = None
+        if self.cache is not None:
+            dotfile = self.to_dotfile(size=size)
+            paths = self.cache.load(dotfile, ['ps'])
+            if paths: ps = open(paths[0], 'rb').read()
+        if ps is None:
+            ps = self._run_dot('-Tps', size=size)
+            if ps is not None and self.cache is not None:
+                self.cache.store(dotfile, 'ps', data=ps)
         # Write the postscript output.
         psfile = open(eps_file, 'wb')
         psfile.write('%!PS-Adobe-2.0 EPSF-1.2\n')
@@ -223,9 +242,38 @@ class DotGraph(object):
             Defaults to `DEFAULT_HTML_SIZE`.
         :type size: ``str``
         """
+        if self.cache is not None:
+            s = self._cached_html(directory, center, size)
+            if s is not None: return s
+        if self.batch is not None:
+            return self.batch.add(self, directory, center, size)
+        return self._render_html(directory, center, size)
+
+    def _cached_html(self, directory, center=True, size=None):
+        """
+        Helper for `to_html()`: if `cache` contains a rendering of this
+        graph, then link its image into `directory`, and return the
+        graph's HTML.  Otherwise, return ``None``.
+        """
         image_url = '%s.%s' % (self.uid, self.DEFAULT_HTML_IMAGE_FORMAT)
         image_file = os.path.join(directory, image_url)
         size = size or self.DEFAULT_HTML_SIZE
+        language = self._pick_language(image_file)
+        paths = self.cache.load(self.to_dotfile(size=size),
+                                [language, 'cmapx'])
+        if paths is None: return None
+        self.cache.link(paths[0], image_file)
+        cmapx = open(paths[1], 'rb').read()
+        return self._cmapx_to_html(cmapx, image_url, image_file, center)
+
+    def _render_html(self, directory, center=True, size=None):
+        """Helper for `to_html()`: render the graph immediately."""
+        image_url = '%s.%s' % (self.uid, self.DEFAULT_HTML_IMAGE_FORMAT)
+        image_file = os.path.join(directory, image_url)
+        size = size or self.DEFAULT_HTML_SIZE
+        if self.cache is not None and os.path.exists(image_file):
+            # Don't overwrite an image that is linked to the cache.
+            os.remove(image_file)
         # If dotversion >1.8.10, then we can generate the image and
         # the cmapx with a single call to dot.  Otherwise, we need to
         # run dot twice.
@@ -239,6 +287,19 @@ class DotGraph(object):
                 return '' # failed to render
             cmapx = self.render('cmapx') or ''
 
+        if self.cache is not None:
+            dotfile = self.to_dotfile(size=size)
+            language = self._pick_language(image_file)
+            self.cache.store(dotfile, language, filename=image_file)
+            self.cache.store(dotfile, 'cmapx', data=cmapx)
+        return self._cmapx_to_html(cmapx, image_url, image_file, center)
+
+    def _cmapx_to_html(self, cmapx, image_url, image_file, center):
+        """
+        Return the HTML code that displays the rendered image
+        `image_url`, along with the client-side image map `cmapx`
+        that was generated by ``dot`` (and is encoded in utf-8).
+        """
         # Decode the cmapx (dot uses utf-8)
         try:
             cmapx = cmapx.decode('utf-8')
@@ -1508,7 +1569,7 @@ def get_dot_version():
             else:
                 _dot_version = (0,)
         except OSError, e:
-            log.error('dot executable not found; graphs will not be '
+            log.error('dot executable %r not found; graphs will not be '
                       'generated.  Adjust your shell\'s path, or use '
                       '--dotpath to specify the path to the dot '
                       'executable.' % DOT_COMMAND)
@@ -1516,6 +1577,280 @@ def get_dot_version():
         log.info('Detected dot version %s' % _dot_version)
     return _dot_version
 
+######################################################################
+#{ Batch Rendering
+######################################################################
+
+class DotGraphBatch(object):
+    """
+    A collection of graphs that are rendered to HTML together, using
+    a small number of ``dot`` processes, rather than one or two
+    processes per graph.
+
+    While `DotGraph.batch` is set to a `DotGraphBatch`,
+    `DotGraph.to_html()` writes each graph's dot file to a temporary
+    directory, and returns a placeholder string in place of its HTML.
+    Once all of the graphs have been added, `render()` runs ``dot``
+    on up to `MAX_BATCH_SIZE` dot files at a time, with up to `jobs`
+    ``dot`` processes running concurrently.  Each ``dot`` process
+    writes both the image and the client-side image map for each of
+    its graphs.  Finally, `fill_placeholders()` replaces the
+    placeholders in the generated HTML with the graphs' HTML.
+
+    Any graph that can't be rendered this way (e.g., because the
+    installed version of ``dot`` is too old to support the ``-O``
+    option) is rendered on its own, as if it had not been batched.
+    """
+    MAX_BATCH_SIZE = 100
+    """The maximum number of graphs that are rendered by a single
+    ``dot`` process."""
+
+    PLACEHOLDER_RE = re.compile(r'<!--epydoc-graph:\w+:\d+-->')
+    """A regular expression matching the placeholder strings returned
+    by `add()`."""
+
+    def __init__(self, jobs=1):
+        self.jobs = max(1, jobs)
+        """The maximum number of ``dot`` processes to run at once."""
+
+        self.graphs = []
+        """The graphs that have been added to this batch, encoded as
+        ``(graph, directory, center, size)`` tuples."""
+
+        self._token = '%x%x' % (os.getpid(), id(self))
+        """A string that makes this batch's placeholders unique."""
+
+        self._tmpdir = None
+        """The temporary directory containing the dot files."""
+
+    def add(self, graph, directory, center=True, size=None):
+        """
+        Add `graph` to this batch, and return a placeholder string for
+        the HTML that ``graph.to_html(directory, center, size)`` would
+        return.
+        """
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix='epydoc-graphs-')
+        size = size or graph.DEFAULT_HTML_SIZE
+        out = open(self._dotfile(len(self.graphs)), 'wb')
+        out.write(graph.to_dotfile(size=size))
+        out.close()
+        self.graphs.append( (graph, directory, center, size) )
+        return '<!--epydoc-graph:%s:%d-->' % (self._token, len(self.graphs)-1)
+
+    def render(self):
+        """
+        Render all of the graphs that have been added to this batch,
+        and return a dictionary mapping each placeholder string to the
+        HTML for its graph.  The batch is then emptied.
+        """
+        if not self.graphs: return {}
+        try:
+            html = {}
+            if get_dot_version() != (0,):
+                html = self._render_batches()
+            # Render any graphs that were not rendered in a batch.
+            for n, (graph, directory, center, size) in enumerate(self.graphs):
+                if n not in html:
+                    html[n] = graph._render_html(directory, center, size)
+            return dict([('<!--epydoc-graph:%s:%d-->' % (self._token, n),
+                          graph_html or '')
+                         for (n, graph_html) in html.items()])
+        finally:
+            self.clear()
+
+    def clear(self):
+        """
+        Remove all of the graphs from this batch, without rendering
+        them.
+        """
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+        self._tmpdir = None
+        self.graphs = []
+
+    def fill_placeholders(self, s, html):
+        """
+        Return a copy of the string `s`, with each placeholder replaced
+        by its HTML from `html`, a dictionary returned by `render()`.
+        """
+        return self.PLACEHOLDER_RE.sub(
+            lambda m: html.get(m.group(), m.group()), s)
+
+    def _dotfile(self, n):
+        return os.path.join(self._tmpdir, '%d.dot' % n)
+
+    def _render_batches(self):
+        """
+        Run ``dot`` on the batch's dot files, and return a dictionary
+        mapping the index of each graph that was rendered successfully
+        to its HTML.
+        """
+        try: from subprocess import Popen, PIPE
+        except ImportError: return {}
+
+        # Group the graphs by image format, and divide each group into
+        # commands, making sure there are enough to keep all of the
+        # processes busy.
+        by_language = {}
+        for n, (graph, directory, center, size) in enumerate(self.graphs):
+            image_url = '%s.%s' % (graph.uid, graph.DEFAULT_HTML_IMAGE_FORMAT)
+            language = graph._pick_language(image_url)
+            by_language.setdefault(language, []).append(n)
+        batch_size = min(self.MAX_BATCH_SIZE,
+                         (len(self.graphs)+self.jobs-1) // self.jobs)
+        commands = []
+        for language, indices in sorted(by_language.items()):
+            for i in range(0, len(indices), batch_size):
+                chunk = indices[i:i+batch_size]
+                cmd = [DOT_COMMAND, '-T%s' % language, '-Tcmapx', '-O']
+                cmd += [self._dotfile(n) for n in chunk]
+                commands.append( (cmd, language, chunk) )
+
+        # Run the commands, keeping up to self.jobs of them running.
+        html = {}
+        running = []
+        while commands or running:
+            while commands and len(running) < self.jobs:
+                cmd, language, chunk = commands.pop(0)
+                try:
+                    pipe = Popen(cmd, stdout=PIPE, stderr=PIPE)
+                except OSError, e:
+                    log.warning("Unable to run Graphviz dot: %s" % e)
+                    continue
+                running.append( (pipe, language, chunk) )
+            if not running: break
+            pipe, language, chunk = running.pop(0)
+            out, err = pipe.communicate()
+            if pipe.returncode != 0:
+                # Any graphs that weren't rendered will be rendered
+                # individually, which will report the error.
+                log.debug("Graphviz dot failed to render a batch of "
+                          "graphs:\n%s" % err)
+            elif err:
+                log.warning("Graphviz dot warning(s):\n%s" % err)
+            for n in chunk:
+                graph_html = self._collect_output(n, language)
+                if graph_html is not None:
+                    html[n] = graph_html
+        return html
+
+    def _collect_output(self, n, language):
+        """
+        Move the image that ``dot -O`` wrote for the `n`th graph into
+        its output directory, and return the graph's HTML; or return
+        ``None`` if ``dot`` did not write both the image and the
+        image map.
+        """
+        graph, directory, center, size = self.graphs[n]
+        dotfile = self._dotfile(n)
+        tmp_image = '%s.%s' % (dotfile, language)
+        tmp_cmapx = '%s.cmapx' % dotfile
+        if not (os.path.exists(tmp_image) and os.path.exists(tmp_cmapx)):
+            return None
+        image_url = '%s.%s' % (graph.uid, graph.DEFAULT_HTML_IMAGE_FORMAT)
+        image_file = os.path.join(directory, image_url)
+        if graph.cache is not None:
+            dotfile = open(self._dotfile(n), 'rb').read()
+            graph.cache.store(dotfile, language, filename=tmp_image)
+            graph.cache.store(dotfile, 'cmapx', filename=tmp_cmapx)
+        shutil.move(tmp_image, image_file)
+        cmapx = open(tmp_cmapx, 'rb').read()
+        return graph._cmapx_to_html(cmapx, image_url, image_file, center)
+
+######################################################################
+#{ Graph Cache
+######################################################################
+
+class DotGraphCache(object):
+    """
+    A content-addressed, on-disk cache of rendered graphs.  Most graphs
+    don't change from one run to the next; so rather than running
+    ``dot`` again, their images can be hard-linked (or copied) from the
+    cache into the output directory.
+
+    Each rendering is stored in its own file in the cache directory.
+    Its name is derived from the SHA-1 hash of the graph's dot file
+    (as returned by `DotGraph.to_dotfile()`, which includes the graph's
+    size), the output format, and the version of ``dot`` (as returned
+    by `get_dot_version()`).  Renderings are never invalidated; a graph
+    that changes just gets a new entry.
+
+    To use a cache, set `DotGraph.cache` to a `DotGraphCache`.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        """The directory where renderings are stored."""
+
+        self.hits = 0
+        """The number of graphs that were found in the cache."""
+
+        self.misses = 0
+        """The number of graphs that were not found in the cache."""
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _entry_filename(self, dotfile, language):
+        key = sha1('\0'.join([repr(get_dot_version()), language, dotfile]))
+        return os.path.join(self.directory,
+                            '%s.%s' % (key.hexdigest(), language))
+
+    def load(self, dotfile, languages):
+        """
+        Return a list containing the name of the cached file for the
+        rendering of `dotfile` in each of the given output formats; or
+        ``None`` if any of them are missing from the cache.
+        """
+        paths = [self._entry_filename(dotfile, language)
+                 for language in languages]
+        for path in paths:
+            if not os.path.exists(path):
+                self.misses += 1
+                return None
+        self.hits += 1
+        return paths
+
+    def store(self, dotfile, language, data=None, filename=None):
+        """
+        Add the rendering of `dotfile` in the given output format to
+        the cache.  The rendering is either the string `data`, or the
+        contents of the file `filename`.
+        """
+        if data is None:
+            f = open(filename, 'rb')
+            try: data = f.read()
+            finally: f.close()
+        # Write the entry atomically, so that concurrent builds sharing
+        # a cache directory never see a partial entry.
+        entry = self._entry_filename(dotfile, language)
+        fd, tmpname = tempfile.mkstemp('.tmp', '', self.directory)
+        try:
+            os.write(fd, data)
+            os.close(fd)
+            if os.path.exists(entry) and sys.platform == 'win32':
+                os.remove(entry)
+            os.rename(tmpname, entry)
+        except OSError, e:
+            log.warning('Unable to write graph cache entry %s: %s' %
+                        (entry, e))
+            if os.path.exists(tmpname): os.remove(tmpname)
+
+    def link(self, path, filename):
+        """
+        Make `filename` a copy of the cached file `path`, using a hard
+        link if possible.
+        """
+        if os.path.exists(filename):
+            os.remove(filename)
+        if hasattr(os, 'link'):
+            try:
+                os.link(path, filename)
+                return
+            except OSError:
+                pass # e.g., if they're on different devices.
+        shutil.copyfile(path, filename)
+
 ######################################################################
 #{ Helper Functions
 ######################################################################
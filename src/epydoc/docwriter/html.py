@@ -14,12 +14,16 @@ this module is the L{HTMLWriter} class.
 """
 __docformat__ = 'epytext en'
 
-import re, os, sys, codecs, sre_constants, pprint, base64
-import urllib
+import re, os, sys, codecs, sre_constants, pprint, base64, pickle
+import urllib, marshal, heapq, itertools, tempfile, shutil, imp
+try: from hashlib import sha1
+except ImportError: from sha import new as sha1
 import __builtin__
 from epydoc.apidoc import *
 import epydoc.docstringparser
 import time, epydoc, epydoc.markup, epydoc.markup.epytext
+try: import multiprocessing
+except ImportError: multiprocessing = None
 from epydoc.docwriter.html_colorize import PythonSourceColorizer
 from epydoc.docwriter import html_colorize
 from epydoc.docwriter.html_css import STYLESHEETS
@@ -41,9 +45,15 @@ def compile_template(docstring, template_string,
     Given a template string containing inline python source code,
     return a python function that will fill in the template, and
     output the result.  The signature for this function is taken from
-    the first line of C{docstring}.  Output is generated by making
-    repeated calls to the output function with the given name (which
-    is typically one of the function's parameters).
+    the first line of C{docstring}.  Output is generated by calling
+    the output function with the given name (which is typically one
+    of the function's parameters) once for each run of text between
+    python statements.
+
+    If C{epydoc.TEMPLATE_CACHE} is set, then the compiled code for the
+    template is cached in that directory, and reused by later runs
+    (unless C{debug} is true).  Cache entries are keyed by a hash of
+    the template, so they never need to be invalidated.
 
     The templating language used by this function passes through all
     text as-is, with three exceptions:
@@ -84,6 +94,19 @@ def compile_template(docstring, template_string,
     signature = docstring.lstrip().split('\n',1)[0].strip()
     func_name = signature.split('(',1)[0].strip()
 
+    # Use the cached code for the template, if there is any.
+    cache_file = None
+    if epydoc.TEMPLATE_CACHE and not debug:
+        cache_file = _template_cache_file(signature, template_string,
+                                          output_function)
+        code = _load_template_code(cache_file)
+        if code is not None:
+            localdict = {}
+            exec code in globals(), localdict
+            template_func = localdict[func_name]
+            template_func.__doc__ = docstring
+            return template_func
+
     # Regexp to search for inline substitutions:
     INLINE = re.compile(r'\$([^\$]+)\$')
     # Regexp to search for python statements in the template:
@@ -109,18 +132,23 @@ def compile_template(docstring, template_string,
     for i, command in enumerate(commands):
         if command == '': continue
 
-        # String literal segment:
+        # String literal segment: output it with a single call.
         if i%2 == 0:
             pieces = INLINE.split(command)
-            for j, piece in enumerate(pieces):
-                if j%2 == 0:
-                    # String piece
-                    pysrc_lines.append('    '*len(indents)+
-                                 '%s(%r)' % (output_function, piece))
-                else:
-                    # Variable piece
-                    pysrc_lines.append('    '*len(indents)+
-                                 '%s(unicode(%s))' % (output_function, piece))
+            if len(pieces) == 1:
+                expr = repr(pieces[0])
+            else:
+                exprs = []
+                for j, piece in enumerate(pieces):
+                    if j%2 == 0:
+                        # String piece
+                        if piece: exprs.append(repr(piece))
+                    else:
+                        # Variable piece
+                        exprs.append('unicode(%s)' % piece)
+                expr = "u''.join([%s])" % ', '.join(exprs)
+            pysrc_lines.append('    '*len(indents)+
+                               '%s(%s)' % (output_function, expr))
 
         # Python command:
         else:
@@ -147,13 +175,65 @@ def compile_template(docstring, template_string,
     #log.debug(pysrc)
     if debug: localdict = {'__debug': (pysrc_lines, func_name)}
     else: localdict = {}
-    try: exec pysrc in globals(), localdict
+    try: code = compile(pysrc, '<string>', 'exec')
     except SyntaxError:
         log.error('Error in script:\n' + pysrc + '\n')
         raise
+    if cache_file is not None:
+        _store_template_code(cache_file, code)
+    exec code in globals(), localdict
     template_func = localdict[func_name]
     template_func.__doc__ = docstring
     return template_func
+
+_TEMPLATE_COMPILER_VERSION = 2
+"""The version of the code generated by L{compile_template()}.  This
+is part of the key for each template cache entry; so it must be
+incremented whenever the generated code changes."""
+
+def _template_cache_file(signature, template_string, output_function):
+    """
+    Return the name of the file in C{epydoc.TEMPLATE_CACHE} where the
+    compiled code for the given template is cached.
+    """
+    key = sha1('\0'.join([str(_TEMPLATE_COMPILER_VERSION), imp.get_magic(),
+                          signature, template_string, output_function]))
+    return os.path.join(epydoc.TEMPLATE_CACHE, key.hexdigest()+'.pyc')
+
+def _load_template_code(cache_file):
+    """
+    Return the code object cached in C{cache_file}, or C{None} if
+    there is no (readable) cache entry.
+    """
+    try:
+        f = open(cache_file, 'rb')
+        try: return marshal.load(f)
+        finally: f.close()
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        return None
+
+def _store_template_code(cache_file, code):
+    """
+    Save the code object C{code} in C{cache_file}.  The file is
+    written atomically, so concurrent runs sharing a cache directory
+    never see a partial entry.  Errors are ignored, since the cache is
+    just an optimization.
+    """
+    directory = os.path.dirname(cache_file)
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, tmpname = tempfile.mkstemp('.tmp', '', directory)
+    except (IOError, OSError):
+        return
+    try:
+        os.write(fd, marshal.dumps(code))
+        os.close(fd)
+        if os.path.exists(cache_file) and sys.platform == 'win32':
+            os.remove(cache_file)
+        os.rename(tmpname, cache_file)
+    except (IOError, OSError):
+        if os.path.exists(tmpname): os.remove(tmpname)
     
 def strip_indent(s):
     """
@@ -170,6 +250,77 @@ def strip_indent(s):
             minindent = min(minindent, len(line)-len(stripline))
     return '\n'.join([l[minindent:] for l in lines])
 
+def write_page_file(path, data):
+    """
+    Write the string C{data} (the encoded contents of a page) to the
+    file C{path}.  This is the default page sink for L{HTMLWriter}.
+    """
+    f = open(path, 'wb')
+    try: f.write(data)
+    finally: f.close()
+
+class PageFileWriter:
+    """
+    A file-like object used to write a page to the file C{path},
+    when L{write_page_file} is the page sink.  The page's fragments
+    are collected, and encoded and written to the file a block at a
+    time; so large pages (such as the source code listings of large
+    modules) never need to be held in memory all at once.
+
+    The blocks are written to a temporary file, which replaces
+    C{path} when the writer is L{closed<close>}; so if the page can't
+    be written, then L{discard} leaves any existing page untouched,
+    rather than truncated.  Each writer has its own uniquely named
+    temporary file, so several processes can write the same page at
+    once.
+    """
+    BLOCK_SIZE = 65536
+    
+    def __init__(self, path):
+        self._path = path
+        fd, self._tmp_path = tempfile.mkstemp(
+            '.tmp', os.path.basename(path)+'.', os.path.dirname(path))
+        self._file = os.fdopen(fd, 'wb')
+        self._pieces = []
+        self._size = 0
+
+    def write(self, s):
+        self._pieces.append(s)
+        self._size += len(s)
+        if self._size >= self.BLOCK_SIZE:
+            self.flush()
+
+    def flush(self):
+        data = u''.join(self._pieces).encode('ascii', 'xmlcharrefreplace')
+        self._file.write(data)
+        self._pieces = []
+        self._size = 0
+
+    def close(self):
+        """Finish writing the page, and move it into place."""
+        self.flush()
+        self._file.close()
+        # mkstemp() makes the file private; give it the permissions
+        # that open() would have.
+        os.chmod(self._tmp_path, 0666 & ~_get_umask())
+        if os.path.exists(self._path) and sys.platform == 'win32':
+            os.remove(self._path)
+        os.rename(self._tmp_path, self._path)
+
+    def discard(self):
+        """Stop writing the page, and remove its temporary file."""
+        self._file.close()
+        os.remove(self._tmp_path)
+
+def _get_umask():
+    """
+    Return the process's umask.  (The umask can only be read by
+    setting it; so set it, and then restore it.)
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
 ######################################################################
 ## HTML Writer
 ######################################################################
@@ -297,6 +448,27 @@ class HTMLWriter:
         @type src_code_tab_width: C{int}
         @keyword src_code_tab_width: Number of spaces to replace each tab
             with in source code listings.
+        @type incremental: C{boolean}
+        @keyword incremental: If true, then only rewrite the pages
+            whose inputs changed since the last time documentation was
+            written to the same directory.  See L{MANIFEST_FILENAME}.
+        @type jobs: C{int}
+        @keyword jobs: The number of worker processes that should be
+            used to write the module, class, and source code pages.
+            If C{jobs} is greater than 1 (and the platform supports
+            C{fork}), then the pages are divided among a pool of
+            forked processes.  See L{_write_pages}.
+        @type page_sink: C{callable}
+        @keyword page_sink: A function C{page_sink(path, data)} that
+            saves the contents of each generated page.  C{data} is the
+            page's ascii-encoded contents, and C{path} is the name of
+            the file it would be written to.  This can be used to keep
+            the pages in memory (e.g., C{page_sink=pages.__setitem__})
+            or to write them to an archive.  Other output files (such
+            as the CSS stylesheet and images) are always written to
+            disk.  Defaults to L{write_page_file}.  A non-default sink
+            disables the C{jobs} worker pool, and shouldn't be used
+            with C{incremental}.
         """
         self.docindex = docindex
 
@@ -372,6 +544,21 @@ class HTMLWriter:
         """Map the callgraph L{uid<DotGraph.uid>} to their HTML
         representation."""
 
+        self._graph_batch = None
+        """The L{DotGraphBatch} that collects the graphs used by the
+        pages, so they can all be rendered at once by L{write}."""
+
+        self._graph_pages = []
+        """The pages that contain placeholders for graphs in
+        L{_graph_batch}, encoded as C{(path, data)} tuples.  C{data}
+        is C{None} if the page can be read back from C{path}."""
+
+        self._top_page_data = None
+        """The contents of the page that C{index.html} is copied from,
+        if that page was saved by a page sink other than
+        L{write_page_file} (and so can't be read back from its file).
+        See L{write_homepage}."""
+
         self._redundant_details = kwargs.get('redundant_details', False)
         """If true, then include objects in the details list even if all
         info about them is already provided by the summary table."""
@@ -379,6 +566,17 @@ class HTMLWriter:
         self._show_submodule_list = kwargs.get('show_submodule_list', True)
         """If true, the include a list of submodules on the package
         documentation page."""
+
+        self._incremental = kwargs.get('incremental', False)
+        """If true, then skip writing pages whose fingerprint matches
+        the one recorded in the output directory's manifest."""
+
+        self._jobs = kwargs.get('jobs', 1) or 1
+        """The number of processes used to write the documentation
+        pages."""
+
+        self._page_sink = kwargs.get('page_sink') or write_page_file
+        """The function used to save the contents of each page."""
         
         # For use with select_variables():
         if self._show_private:
@@ -550,6 +748,30 @@ class HTMLWriter:
             r'<span class="variable-linewrap">'
             r'<img src="crarr.png" alt="\" /></span>')
 
+        # Collect graphs as the pages are written, and render them
+        # all at once at the end.
+        orig_dotgraph_batch = DotGraph.batch
+        DotGraph.batch = self._graph_batch = DotGraphBatch(self._jobs)
+        self._graph_pages = []
+
+        try:
+            self._write_output(directory)
+        finally:
+            # Restore defaults that we changed, and remove any graphs
+            # that were not rendered (along with their dot files).
+            (ValueDoc.SUMMARY_REPR_LINELEN, ValueDoc.REPR_LINELEN,
+             ValueDoc.REPR_MAXLINES) = orig_valdoc_defaults
+            ParsedEpytextDocstring.SYMBOL_TO_HTML['crarr'] = orig_crarr_html
+            DotGraph.batch = orig_dotgraph_batch
+            self._graph_batch.clear()
+            self._graph_pages = []
+            self._top_page_data = None
+
+    def _write_output(self, directory):
+        """
+        Write the documentation to the given directory.  This is
+        called by L{write}, once it has set up the writer's state.
+        """
         # Keep track of failed xrefs, and report them at the end.
         self._failed_xrefs = {}
 
@@ -558,6 +780,10 @@ class HTMLWriter:
         self._mkdir(directory)
         self._directory = directory
 
+        # Fingerprint the page inputs, if we're writing incrementally.
+        if self._incremental:
+            self._init_incremental(directory)
+
         # Write the CSS file.
         self._files_written += 1
         log.progress(self._files_written/self._num_files, 'epydoc.css')
@@ -577,40 +803,11 @@ class HTMLWriter:
         for (name, label, label2) in self.METADATA_INDICES:
             indices[name] = self.build_metadata_index(name)
 
-        # Write the identifier index.  If requested, split it into
-        # separate pages for each letter.
-        ident_by_letter = self._group_by_letter(indices['ident'])
-        if not self._split_ident_index:
-            self._write(self.write_link_index, directory,
-                        'identifier-index.html', indices,
-                        'Identifier Index', 'identifier-index.html',
-                        ident_by_letter)
-        else:
-            # Write a page for each section.
-            for letter in self.LETTERS:
-                filename = 'identifier-index-%s.html' % letter
-                self._write(self.write_link_index, directory, filename,
-                            indices, 'Identifier Index', filename,
-                            ident_by_letter, [letter],
-                            'identifier-index-%s.html')
-            # Use the first non-empty section as the main index page.
-            for letter in self.LETTERS:
-                if letter in ident_by_letter:
-                    filename = 'identifier-index.html'
-                    self._write(self.write_link_index, directory, filename,
-                                indices, 'Identifier Index', filename,
-                                ident_by_letter, [letter], 
-                                'identifier-index-%s.html')
-                    break
-
-        # Write the term index.
-        if indices['term']:
-            term_by_letter = self._group_by_letter(indices['term'])
-            self._write(self.write_link_index, directory, 'term-index.html',
-                        indices, 'Term Definition Index',
-                        'term-index.html', term_by_letter)
-        else:
-            self._files_written += 1 # (skipped)
+        try:
+            self._write_link_indices(directory, indices)
+        finally:
+            indices['ident'].close()
+            indices['term'].close()
 
         # Write the metadata indices.
         for (name, label, label2) in self.METADATA_INDICES:
@@ -634,6 +831,12 @@ class HTMLWriter:
         # Write the help file.
         self._write(self.write_help, directory,'help.html')
         
+        # The pages that describe individual modules & classes are
+        # independent of one another, so collect them in a list of
+        # (write_func, filename, args) tuples, and write them all
+        # at once with _write_pages().
+        doc_pages = []
+
         # Write the frames-based table of contents.
         if self._frames_index:
             self._write(self.write_frames_index, directory, 'frames.html')
@@ -641,34 +844,30 @@ class HTMLWriter:
             self._write(self.write_project_toc, directory, 'toc-everything.html')
             for doc in self.module_list:
                 filename = 'toc-%s' % urllib.unquote(self.url(doc))
-                self._write(self.write_module_toc, directory, filename, doc)
+                doc_pages.append((self.write_module_toc, filename, (doc,)))
 
         # Write the object documentation.
         for doc in self.module_list:
             filename = urllib.unquote(self.url(doc))
-            self._write(self.write_module, directory, filename, doc)
+            doc_pages.append((self.write_module, filename, (doc,)))
         for doc in self.class_list:
             filename = urllib.unquote(self.url(doc))
-            self._write(self.write_class, directory, filename, doc)
+            doc_pages.append((self.write_class, filename, (doc,)))
 
         # Write source code files.
         if self._incl_sourcecode:
             # Build a map from short names to APIDocs, used when
-            # linking names in the source code.
-            name_to_docs = {}
-            for api_doc in self.indexed_docs:
-                if (api_doc.canonical_name is not None and
-                    self.url(api_doc) is not None):
-                    name = api_doc.canonical_name[-1]
-                    name_to_docs.setdefault(name, []).append(api_doc)
-            # Sort each entry of the name_to_docs list.
-            for doc_list in name_to_docs.values():
-                doc_list.sort()
+            # linking names in the source code.  It's shared by all
+            # of the modules, along with the links for each name.
+            name_to_docs = html_colorize.DocLinkIndex(self.indexed_docs,
+                                                      self.url)
             # Write the source code for each module.
             for doc in self.modules_with_sourcecode:
                 filename = urllib.unquote(self.pysrc_url(doc))
-                self._write(self.write_sourcecode, directory, filename, doc,
-                            name_to_docs)
+                doc_pages.append((self.write_sourcecode, filename,
+                                  (doc, name_to_docs)))
+
+        self._write_pages(directory, doc_pages)
 
         # Write the auto-redirect page.
         self._write(self.write_redirect_page, directory, 'redirect.html')
@@ -676,12 +875,20 @@ class HTMLWriter:
         # Write the mapping object name -> URL
         self._write(self.write_api_list, directory, 'api-objects.txt')
         
+        # Render the graphs, and fill them in to the pages that use
+        # them.  (This must be done before index.html is written.)
+        self._write_graphs()
+
         # Write the index.html files.
         # (this must be done last, since it might copy another file)
         self._files_written += 1
         log.progress(self._files_written/self._num_files, 'index.html')
         self.write_homepage(directory)
 
+        # Record the page fingerprints for the next incremental run.
+        if self._incremental:
+            self._write_manifest(directory)
+
         # Don't report references to builtins as missing
         for k in self._failed_xrefs.keys(): # have a copy of keys
             if hasattr(__builtin__, k):
@@ -707,20 +914,138 @@ class HTMLWriter:
                       "wrote %d files" %
                       (self._num_files, int(self._files_written)))
 
-        # Restore defaults that we changed.
-        (ValueDoc.SUMMARY_REPR_LINELEN, ValueDoc.REPR_LINELEN,
-         ValueDoc.REPR_MAXLINES) = orig_valdoc_defaults
-        ParsedEpytextDocstring.SYMBOL_TO_HTML['crarr'] = orig_crarr_html
-
     def _write(self, write_func, directory, filename, *args):
         # Display our progress.
         self._files_written += 1
         log.progress(self._files_written/self._num_files, filename)
         
         path = os.path.join(directory, filename)
-        f = codecs.open(path, 'w', 'ascii', errors='xmlcharrefreplace')
-        write_func(f.write, *args)
-        f.close()
+        if self._incremental:
+            fingerprint = self._page_fingerprint(write_func, filename, args)
+            old_entry = self._old_manifest.get(filename)
+            if (old_entry is not None and old_entry[0] == fingerprint and
+                os.path.exists(path)):
+                # The page is unchanged: keep it, but still report the
+                # crossreferences that failed when it was written.
+                self._pages_skipped += 1
+                self._new_manifest[filename] = old_entry
+                for identifier, contexts in old_entry[1].items():
+                    self._failed_xrefs.setdefault(identifier, {}).update(
+                        contexts)
+                return
+            # Collect this page's failed xrefs separately, so we can
+            # record them in the manifest.
+            failed_xrefs, self._failed_xrefs = self._failed_xrefs, {}
+        if self._graph_batch is not None:
+            num_graphs = len(self._graph_batch.graphs)
+        try:
+            if self._page_sink is write_page_file:
+                # Write the page's fragments straight to its file, a
+                # block at a time.
+                page_file = PageFileWriter(path)
+                try: write_func(page_file.write, *args)
+                except:
+                    page_file.discard()
+                    raise
+                page_file.close()
+                data = None
+            else:
+                # Collect the page's fragments, and save them all at once.
+                pieces = []
+                write_func(pieces.append, *args)
+                data = u''.join(pieces).encode('ascii', 'xmlcharrefreplace')
+                del pieces
+                self._page_sink(path, data)
+                if filename == self._homepage_source():
+                    self._top_page_data = data
+        finally:
+            if self._incremental:
+                page_xrefs, self._failed_xrefs = self._failed_xrefs, failed_xrefs
+                for identifier, contexts in page_xrefs.items():
+                    self._failed_xrefs.setdefault(identifier, {}).update(
+                        contexts)
+        if self._incremental:
+            self._new_manifest[filename] = (fingerprint, page_xrefs)
+        # If the page added any graphs, then their placeholders must be
+        # filled in once the graphs are rendered.
+        if (self._graph_batch is not None and
+            len(self._graph_batch.graphs) > num_graphs):
+            self._graph_pages.append((path, data))
+
+    def _write_pages(self, directory, pages):
+        """
+        Write each page in C{pages}, which is a list of
+        C{(write_func, filename, args)} tuples, using L{_write}.
+
+        If L{_jobs} is greater than 1, then the pages are divided
+        among a pool of worker processes.  The workers are forked
+        after the C{DocIndex} has been built, so they share it
+        (read-only) with this process.  Each worker reports the
+        failed crossreferences, manifest entry, and log messages for
+        every page it writes, and these are merged back here, so the
+        output is the same as if the pages had been written serially.
+
+        Graph filenames are assigned from a per-process counter (see
+        L{DotGraph.uid}), so pages that contain graphs are always
+        written by this process: if graphs are requested, then no
+        workers are used; and any page that contains a graph from its
+        docstrings is rewritten by this process.
+
+        Several docs can share a page filename (e.g., two copies of a
+        module that are both named C{json'}).  Written serially, the
+        last page simply overwrites the others; so only the last page
+        for each filename is given to the workers, which would
+        otherwise race to write the same file.
+        """
+        if (self._jobs <= 1 or len(pages) < 2 or self._graph_types or
+            self._page_sink is not write_page_file or
+            multiprocessing is None or not hasattr(os, 'fork')):
+            for (write_func, filename, args) in pages:
+                self._write(write_func, directory, filename, *args)
+            return
+
+        last_page = dict([(filename, i) for (i, (write_func, filename, args))
+                          in enumerate(pages)])
+        if len(last_page) < len(pages):
+            self._files_written += len(pages) - len(last_page)
+            pages = [page for (i, page) in enumerate(pages)
+                     if last_page[page[1]] == i]
+
+        global _page_writer_state
+        _page_writer_state = (self, directory, pages)
+        pool = multiprocessing.Pool(min(self._jobs, len(pages)),
+                                    _init_page_worker)
+        try:
+            chunksize = max(1, len(pages) // (self._jobs * 8))
+            results = pool.imap(_write_page_in_worker, range(len(pages)),
+                                chunksize)
+            for index, result in enumerate(results):
+                (filename, page_xrefs, manifest_entry, records,
+                 uses_graphs) = result
+                if uses_graphs:
+                    # Graph filenames must be assigned by this process.
+                    write_func, filename, args = pages[index]
+                    self._write(write_func, directory, filename, *args)
+                    continue
+                self._files_written += 1
+                log.progress(self._files_written/self._num_files, filename)
+                log.replay_records(records)
+                for identifier, contexts in page_xrefs.items():
+                    self._failed_xrefs.setdefault(identifier, {}).update(
+                        contexts)
+                if self._incremental:
+                    if manifest_entry is None:
+                        self._pages_skipped += 1
+                        manifest_entry = self._old_manifest[filename]
+                    self._new_manifest[filename] = manifest_entry
+            pool.close()
+        finally:
+            _page_writer_state = None
+            pool.terminate()
+            pool.join()
+
+        log.info('Parallel output: %d pages processed by %d processes' %
+                 (len(pages), min(self._jobs, len(pages))))
 
     def _mkdir(self, directory):
         """
@@ -814,9 +1139,9 @@ class HTMLWriter:
         out('<h1 class="epydoc">Source Code for %s</h1>\n' %
             self.href(doc, label='%s %s' % (self.doc_kind(doc), name)))
         out('<pre class="py-src">\n')
-        out(PythonSourceColorizer(filename, name, self.docindex,
-                                  self.url, name_to_docs,
-                                  self._src_code_tab_width).colorize())
+        PythonSourceColorizer(filename, name, self.docindex,
+                              self.url, name_to_docs,
+                              self._src_code_tab_width).colorize(out)
         out('</pre>\n<br />\n')
 
         # Footer
@@ -1008,7 +1333,8 @@ class HTMLWriter:
 
         
         out('<ul class="nomargin-top">\n')
-        for doc in sorted(class_set, key=lambda c:c.canonical_name[-1]):
+        for doc in sorted(class_set, key=lambda c:(c.canonical_name[-1],
+                                                   c.canonical_name)):
             # If doc is a subclass of anything that's documented, then
             # we don't need to list it separately; it will be listed
             # under that base.
@@ -1047,6 +1373,44 @@ class HTMLWriter:
     LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ_'
     """The alphabetical sections that are used for link index pages."""
     
+    def _write_link_indices(self, directory, indices):
+        """
+        Write the identifier index and the term index.
+        """
+        # Write the identifier index.  If requested, split it into
+        # separate pages for each letter.
+        ident_index = indices['ident']
+        if not self._split_ident_index:
+            self._write(self.write_link_index, directory,
+                        'identifier-index.html', indices,
+                        'Identifier Index', 'identifier-index.html',
+                        ident_index)
+        else:
+            # Write a page for each section.
+            for letter in self.LETTERS:
+                filename = 'identifier-index-%s.html' % letter
+                self._write(self.write_link_index, directory, filename,
+                            indices, 'Identifier Index', filename,
+                            ident_index, [letter],
+                            'identifier-index-%s.html')
+            # Use the first non-empty section as the main index page.
+            for letter in self.LETTERS:
+                if letter in ident_index:
+                    filename = 'identifier-index.html'
+                    self._write(self.write_link_index, directory, filename,
+                                indices, 'Identifier Index', filename,
+                                ident_index, [letter], 
+                                'identifier-index-%s.html')
+                    break
+
+        # Write the term index.
+        if indices['term']:
+            self._write(self.write_link_index, directory, 'term-index.html',
+                        indices, 'Term Definition Index',
+                        'term-index.html', indices['term'])
+        else:
+            self._files_written += 1 # (skipped)
+
     def write_link_index(self, out, indices, title, url, index_by_section,
                          sections=LETTERS, section_url='#%s'):
         
@@ -1154,26 +1518,30 @@ class HTMLWriter:
             out(']</b></center><br />\n')
 
     def write_index_section(self, out, items, add_blankline=False):
+        """
+        Write a table listing the given sequence of C{(name, url,
+        where)} index entries (see L{LinkIndex}) in three columns.
+        """
         out('<table class="link-index" width="100%" border="1">\n')
         num_rows = (len(items)+2)/3
+        # The items are listed down each column in turn, so read each
+        # column's items with a separate iterator.
+        columns = [itertools.islice(items, col*num_rows, (col+1)*num_rows)
+                   for col in range(3)]
         for row in range(num_rows):
             out('<tr>\n')
-            for col in range(3):
+            for column in columns:
                 out('<td width="33%" class="link-index">')
-                i = col*num_rows+row
-                if i < len(items):
-                    name, url, container = items[col*num_rows+row]
+                try:
+                    name, url, where = column.next()
+                except StopIteration:
+                    out('&nbsp;')
+                else:
                     out('<a href="%s">%s</a>' % (url, name))
-                    if container is not None:
+                    if where is not None:
                         out('<br />\n')
-                        if isinstance(container, ModuleDoc):
-                            label = container.canonical_name
-                        else:
-                            label = container.canonical_name[-1]
                         out('<span class="index-where">(in&nbsp;%s)'
-                            '</span>' % self.href(container, label))
-                else:
-                    out('&nbsp;')
+                            '</span>' % where)
                 out('</td>\n')
             out('</tr>\n')
             if add_blankline and num_rows == 1:
@@ -1374,20 +1742,24 @@ class HTMLWriter:
               copied.
             - Otherwise, the page specified by L{_top_page} is
               copied.
+
+        The file is saved with the L{page sink<_page_sink>}, like
+        every other page.
         """
         filename = os.path.join(directory, 'index.html')
-        if self._frames_index: top = 'frames.html'
-        else: top = self._top_page_url
+        top = self._homepage_source()
 
         # Copy the non-frames index file from top, if it's internal.
         if top[:5] != 'http:' and '/' not in top:
             try:
-                # Read top into `s`.
-                topfile = os.path.join(directory, top)
-                s = open(topfile, 'r').read()
+                # Read top into `s`.  If it was saved by a page sink,
+                # then it may not be in the directory.
+                s = self._top_page_data
+                if s is None:
+                    s = open(os.path.join(directory, top), 'rb').read()
 
                 # Write the output file.
-                open(filename, 'w').write(s)
+                self._page_sink(filename, s)
                 return
             except:
                 log.error('Warning: error copying index; '
@@ -1395,9 +1767,18 @@ class HTMLWriter:
 
         # Use a redirect if top is external, or if we faild to copy.
         name = self._prj_name or 'this project'
-        f = open(filename, 'w')
-        self.write_redirect_index(f.write, top, name)
-        f.close()
+        pieces = []
+        self.write_redirect_index(pieces.append, top, name)
+        self._page_sink(filename, u''.join(pieces).encode(
+            'ascii', 'xmlcharrefreplace'))
+
+    def _homepage_source(self):
+        """
+        Return the URL of the page that L{write_homepage} copies to
+        C{index.html}.
+        """
+        if self._frames_index: return 'frames.html'
+        else: return self._top_page_url
 
     write_redirect_index = compile_template(
         """
@@ -1644,6 +2025,25 @@ class HTMLWriter:
         if graph is None: return ''
         graph.caption = graph.title = None
         return graph.to_html(self._directory) or ''
+
+    def _write_graphs(self):
+        """
+        Render all of the graphs in L{_graph_batch}, and replace their
+        placeholders in each of the L{_graph_pages}.
+        """
+        if not self._graph_batch.graphs: return
+        log.info('Rendering %d graphs' % len(self._graph_batch.graphs))
+        graph_html = self._graph_batch.render()
+        for (path, data) in self._graph_pages:
+            if data is None: data = open(path, 'rb').read()
+            data = self._graph_batch.fill_placeholders(data, graph_html)
+            data = unicode(data).encode('ascii', 'xmlcharrefreplace')
+            self._page_sink(path, data)
+            if (self._top_page_data is not None and
+                path == os.path.join(self._directory,
+                                     self._homepage_source())):
+                self._top_page_data = data
+        self._graph_pages = []
     
     RE_CALLGRAPH_ID = re.compile(r"""["'](.+-div)['"]""")
     
@@ -1734,6 +2134,170 @@ class HTMLWriter:
             f.write(base64.decodestring(data))
             f.close()
 
+    #////////////////////////////////////////////////////////////
+    #{ 2.12. Incremental Output
+    #////////////////////////////////////////////////////////////
+
+    MANIFEST_FILENAME = '.epydoc-manifest'
+    """The name of the file, in the output directory, that records the
+    fingerprint of each page that was written.  When
+    L{incremental<_incremental>} output is requested, any page whose
+    fingerprint matches the manifest is left as-is, rather than being
+    regenerated.  The manifest also records the failed
+    crossreferences for each page, so they can be reported even when
+    the page is not rewritten."""
+
+    MANIFEST_VERSION = 1
+    """The version of the manifest format.  Manifests written with a
+    different version are ignored."""
+
+    _DOC_PAGE_WRITERS = ('write_module', 'write_class', 'write_module_toc',
+                         'write_sourcecode')
+    """The names of the page writers whose first argument is the
+    C{APIDoc} that the page describes.  All other pages depend on the
+    project as a whole."""
+
+    def _init_incremental(self, directory):
+        """
+        Read the manifest from C{directory}, and compute the
+        fingerprints that will be compared against it:
+
+          - The I{global} fingerprint covers the writer's options, and
+            the name, URL, and privacy of every object that a page
+            might link to.  Every page fingerprint includes it.
+          - Each module and class has its own fingerprint, which
+            covers its own documentation, its variables (including
+            inherited variables), and any related objects that its
+            page displays.
+          - The I{project} fingerprint combines all of the above, and
+            is used by pages that summarize the whole project (such as
+            the indices and trees).
+        """
+        self._old_manifest = self._read_manifest(directory)
+        self._new_manifest = {}
+        self._pages_skipped = 0
+
+        fingerprinter = _PageFingerprinter(self)
+
+        # Options & the link catalog.
+        options = [epydoc.__version__, self.MANIFEST_VERSION]
+        options += [getattr(self, attr) for attr in (
+            '_show_private', '_prj_name', '_prj_url', '_prj_link',
+            '_top_page', '_top_page_url', '_trees_url', '_frames_index',
+            '_show_imports', '_variable_maxlines', '_variable_linelen',
+            '_variable_summary_linelen', '_variable_tooltip_linelen',
+            '_inheritance', '_incl_sourcecode', '_mark_docstrings',
+            '_graph_types', '_include_log', '_include_timestamp',
+            '_src_code_tab_width', '_redundant_details',
+            '_show_submodule_list', '_split_ident_index')]
+        if self._helpfile and os.path.exists(self._helpfile):
+            options.append(open(self._helpfile).read())
+        catalog = []
+        for doc in self.indexed_docs:
+            if doc.canonical_name in (None, UNKNOWN): continue
+            catalog.append((doc.canonical_name, self.url(doc),
+                            self._doc_or_ancestor_is_private(doc)))
+        for doc in self.module_list + self.class_list:
+            variables = [(var_doc.name, var_doc.is_public,
+                          var_doc.is_imported,
+                          getattr(var_doc.value, 'canonical_name', None),
+                          var_doc.value.__class__.__name__)
+                         for var_doc in doc.variables.values()]
+            catalog.append((doc.canonical_name, variables))
+            if isinstance(doc, ClassDoc) and doc.bases not in (None, UNKNOWN):
+                catalog.append([base.canonical_name for base in doc.bases])
+        self._global_fingerprint = fingerprinter.fingerprint(options, catalog)
+
+        # Per-document fingerprints.
+        self._doc_fingerprints = {}
+        for doc in self.module_list + self.class_list:
+            related = []
+            if isinstance(doc, ModuleDoc):
+                # The submodule list is displayed recursively.
+                queue = list(doc.submodules or ())
+                for submodule in queue:
+                    related.append((submodule.canonical_name,
+                                    submodule.summary))
+                    queue.extend(submodule.submodules or ())
+            elif doc.bases not in (None, UNKNOWN):
+                # The base tree is displayed recursively.
+                for base in doc.mro():
+                    if isinstance(base, ClassDoc) and base.bases != UNKNOWN:
+                        related.append((base.canonical_name, base.bases))
+            self._doc_fingerprints[doc] = fingerprinter.fingerprint(
+                doc, related)
+
+        fingerprints = sorted(self._doc_fingerprints.values())
+        self._project_fingerprint = fingerprinter.fingerprint(
+            self._global_fingerprint, fingerprints)
+
+    def _page_fingerprint(self, write_func, filename, args):
+        """
+        Return the fingerprint for the page that would be written to
+        C{filename} by calling C{write_func} with C{args}.
+        """
+        name = write_func.__name__
+        key = [self._global_fingerprint, name, filename]
+        if (name in self._DOC_PAGE_WRITERS and args and
+            args[0] in self._doc_fingerprints):
+            doc = args[0]
+            # Graphs (e.g., call graphs and UML diagrams) can display
+            # any related object, so be conservative.
+            if self._graph_types and name in ('write_module', 'write_class'):
+                key.append(self._project_fingerprint)
+            else:
+                key.append(self._doc_fingerprints[doc])
+            if name == 'write_sourcecode':
+                key.append(sha1(open(doc.filename, 'rb').read()).hexdigest())
+        else:
+            key.append(self._project_fingerprint)
+        return sha1('\0'.join(key)).hexdigest()
+
+    def _read_manifest(self, directory):
+        """
+        Return the page manifest from the given output directory, as a
+        dictionary mapping filenames to C{(fingerprint, failed_xrefs)}
+        tuples.  If there is no (usable) manifest, return an empty
+        dictionary.
+        """
+        path = os.path.join(directory, self.MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return {}
+        try:
+            f = open(path, 'rb')
+            try:
+                version, pages = pickle.load(f)
+            finally:
+                f.close()
+        except Exception, e:
+            log.warning('Ignoring unreadable manifest %s: %s' % (path, e))
+            return {}
+        if version != self.MANIFEST_VERSION:
+            return {}
+        return pages
+
+    def _write_manifest(self, directory):
+        """
+        Write the manifest for the pages that were written (or kept) by
+        this run, and remove any pages that were written by the
+        previous run but no longer exist.
+        """
+        for filename in self._old_manifest:
+            if filename not in self._new_manifest:
+                path = os.path.join(directory, filename)
+                if os.path.exists(path):
+                    log.debug('Removing obsolete page %s' % filename)
+                    os.remove(path)
+
+        path = os.path.join(directory, self.MANIFEST_FILENAME)
+        f = open(path, 'wb')
+        pickle.dump((self.MANIFEST_VERSION, self._new_manifest), f,
+                    pickle.HIGHEST_PROTOCOL)
+        f.close()
+
+        log.info('Incremental output: %d of %d pages were unchanged' %
+                 (self._pages_skipped, len(self._new_manifest)))
+
     #////////////////////////////////////////////////////////////
     #{ 3.1. Page Header
     #////////////////////////////////////////////////////////////
@@ -2826,7 +3390,7 @@ class HTMLWriter:
         >>> # endif
         >>> if doc.subclasses:
             <ul>
-        >>>   for subclass in sorted(set(doc.subclasses), key=lambda c:c.canonical_name[-1]):
+        >>>   for subclass in sorted(set(doc.subclasses), key=lambda c:(c.canonical_name[-1], c.canonical_name)):
         >>>     if subclass in class_set:
         >>>       self.write_class_tree_item(out, subclass, class_set)
         >>>     #endif
@@ -2929,31 +3493,30 @@ class HTMLWriter:
                         ]
     
     def build_identifier_index(self):
-        items = []
+        """
+        @return: A L{LinkIndex} for the identifier index.
+        """
+        return LinkIndex(self._identifier_index_entries())
+
+    def _identifier_index_entries(self):
         for doc in self.indexed_docs:
             name = plaintext_to_html(doc.canonical_name[-1])
             if isinstance(doc, RoutineDoc): name += '()'
             url = self.url(doc)
             if not url: continue
             container = self.docindex.container(doc)
-            items.append( (name, url, container) )
-        return sorted(items, key=lambda v:v[0].lower())
+            yield self._index_entry(name, url, container)
 
-    def _group_by_letter(self, items):
-        """Preserves sort order of the input."""
-        index = {}
-        for item in items:
-            first_letter = item[0][0].upper()
-            if not ("A" <= first_letter <= "Z"):
-                first_letter = '_'
-            index.setdefault(first_letter, []).append(item)
-        return index
-    
     def build_term_index(self):
-        items = []
+        """
+        @return: A L{LinkIndex} for the term definition index.
+        """
+        return LinkIndex(self._term_index_entries())
+
+    def _term_index_entries(self):
         for doc in self.indexed_docs:
             url = self.url(doc)
-            items += self._terms_from_docstring(url, doc, doc.descr)
+            items = self._terms_from_docstring(url, doc, doc.descr)
             for (field, arg, descr) in doc.metadata:
                 items += self._terms_from_docstring(url, doc, descr)
                 if hasattr(doc, 'type_descr'):
@@ -2965,7 +3528,22 @@ class HTMLWriter:
                 if hasattr(doc, 'return_type'):
                     items += self._terms_from_docstring(url, doc,
                                                         doc.return_type)
-        return sorted(items, key=lambda v:v[0].lower())
+            for (name, url, container) in items:
+                yield self._index_entry(name, url, container)
+
+    def _index_entry(self, name, url, container):
+        """
+        @return: The L{LinkIndex} entry for a link to C{url} labeled
+            C{name}, found in C{container}.
+        """
+        if container is None:
+            return (name, url, None)
+        if isinstance(container, ModuleDoc):
+            label = container.canonical_name
+        else:
+            label = container.canonical_name[-1]
+        # (href() returns the label itself if container has no url.)
+        return (name, url, '%s' % self.href(container, label))
 
     def _terms_from_docstring(self, base_url, container, parsed_docstring):
         if parsed_docstring in (None, UNKNOWN): return []
@@ -3096,13 +3674,13 @@ class HTMLWriter:
         skip = (ModuleDoc, ClassDoc, type(UNKNOWN))
         for val_doc in self.module_list:
             self.write_url_record(out, val_doc)
-            for var in val_doc.variables.itervalues():
+            for (name, var) in sorted(val_doc.variables.items()):
                 if not isinstance(var.value, skip):
                     self.write_url_record(out, var)
 
         for val_doc in self.class_list:
             self.write_url_record(out, val_doc)
-            for var in val_doc.variables.itervalues():
+            for (name, var) in sorted(val_doc.variables.items()):
                 self.write_url_record(out, var)
 
     def write_url_record(self, out, obj):
@@ -3115,13 +3693,19 @@ class HTMLWriter:
     #////////////////////////////////////////////////////////////
 
     def _val_is_public(self, valdoc):
-        """Make a best-guess as to whether the given class is public."""
-        container = self.docindex.container(valdoc)
-        if isinstance(container, NamespaceDoc):
-            for vardoc in container.variables.values():
-                if vardoc in (UNKNOWN, None): continue
-                if vardoc.value is valdoc:
-                    return vardoc.is_public
+        """
+        Make a best-guess as to whether the given class is public.
+        The answer comes from the variable in the value's
+        L{container()<DocIndex.container>} that gives the value its
+        name (see L{DocIndex.defining_variable}).  So a public class
+        with a private alias in the same namespace is still public:
+        e.g., C{logging.Logger} (aliased by C{_loggerClass}), and
+        C{json.scanner.make_scanner} (aliased by C{c_make_scanner}
+        when the C extension is available).
+        """
+        vardoc = self.docindex.defining_variable(valdoc)
+        if vardoc is not None:
+            return vardoc.is_public
         return True
 
     # [XX] Is it worth-while to pull the anchor tricks that I do here?
@@ -3452,11 +4036,351 @@ class HTMLWriter:
                                 not self._val_is_public(c)])
         return private
                 
+######################################################################
+## Parallel Page Writing
+######################################################################
+# These functions are used by HTMLWriter._write_pages() to write pages
+# in forked worker processes.
+
+_page_writer_state = None
+"""A tuple C{(writer, directory, pages)} describing the pages that
+are being written by L{HTMLWriter._write_pages}.  It is set before
+the worker processes are forked, so they inherit it."""
+
+_worker_logger = None
+"""The L{log.RecordingLogger} that is used by a page writing worker."""
+
+def _init_page_worker():
+    global _worker_logger
+    _worker_logger = log.RecordingLogger()
+    del log._loggers[:]
+    log.register_logger(_worker_logger)
+    # Use a separate batch, so we can tell which pages contain graphs
+    # (and so we don't touch the main process's batch).
+    # Graphs are not read from the cache, since that would hide them.
+    writer = _page_writer_state[0]
+    DotGraph.batch = writer._graph_batch = DotGraphBatch()
+    DotGraph.cache = None
+
+def _write_page_in_worker(index):
+    """
+    Write the page at the given index of the pages in
+    L{_page_writer_state}, and return a tuple C{(filename,
+    failed_xrefs, manifest_entry, records, uses_graphs)}, where
+    C{failed_xrefs} are the crossreferences that failed while writing
+    the page; C{manifest_entry} is its new manifest entry (or C{None}
+    if it was unchanged, or the output is not incremental);
+    C{records} are the messages that were logged while writing it;
+    and C{uses_graphs} is true if the page contains any graphs, in
+    which case it must be written again by the main process.
+    """
+    writer, directory, pages = _page_writer_state
+    write_func, filename, args = pages[index]
+    records = _worker_logger.records = []
+    writer._failed_xrefs = {}
+    manifest_entry = None
+    if writer._incremental:
+        pages_skipped = writer._pages_skipped
+        writer._write(write_func, directory, filename, *args)
+        if writer._pages_skipped == pages_skipped:
+            manifest_entry = writer._new_manifest[filename]
+    else:
+        writer._write(write_func, directory, filename, *args)
+    uses_graphs = bool(writer._graph_batch.graphs)
+    writer._graph_batch.clear()
+    return (filename, writer._failed_xrefs, manifest_entry, records,
+            uses_graphs)
+
+class _PageFingerprinter:
+    """
+    A helper for L{HTMLWriter}'s incremental output mode, which
+    computes a fingerprint for the inputs of a page.  The page's own
+    C{APIDoc}, its variables, and any routines or values they contain
+    are fingerprinted in full; other C{APIDoc}s that it refers to
+    (such as its container, or the classes it links to) contribute
+    only their name, URL, and summary, since that is all that the
+    page displays about them.
+    """
+    _ADDRESS_RE = re.compile(r'0x[0-9a-fA-F]+')
+    
+    def __init__(self, htmlwriter):
+        self.htmlwriter = htmlwriter
+
+    def fingerprint(self, *objs):
+        """
+        @return: A hex digest that changes whenever any of the given
+            objects change in a way that could affect the page.
+        """
+        self._path = set()
+        tokens = [self._tokens(obj, deep=True) for obj in objs]
+        return sha1('\0'.join(tokens)).hexdigest()
+
+    def _tokens(self, obj, deep=False):
+        """
+        @return: A string that encodes C{obj}.  Dictionaries and sets
+            are encoded in sorted order, so the result does not depend
+            on hash order.
+        """
+        if obj is UNKNOWN:
+            return '?'
+        elif obj is None or isinstance(obj, (bool, int, long, float)):
+            return repr(obj)
+        elif isinstance(obj, unicode):
+            return repr(obj.encode('utf-8'))
+        elif isinstance(obj, str):
+            return repr(obj)
+        elif isinstance(obj, DottedName):
+            return 'N' + str(obj)
+        elif isinstance(obj, APIDoc):
+            return self._apidoc_tokens(obj, deep)
+        elif isinstance(obj, epydoc.markup.ParsedDocstring):
+            return self._docstring_tokens(obj)
+        elif isinstance(obj, epydoc.markup.epytext.Element):
+            # (Elements have no __dict__.)
+            return '<%s %s %s>' % (obj.tag, self._tokens(obj.attribs),
+                                   self._tokens(obj.children))
+        elif isinstance(obj, (list, tuple)):
+            return '(%s)' % ','.join([self._tokens(v) for v in obj])
+        elif isinstance(obj, (set, frozenset)):
+            return '{%s}' % ','.join(sorted([self._tokens(v) for v in obj]))
+        elif isinstance(obj, dict):
+            return '{%s}' % ','.join(sorted(
+                ['%s:%s' % (self._tokens(k), self._tokens(v))
+                 for (k, v) in obj.items()]))
+        elif hasattr(obj, '__dict__'):
+            return '%s%s' % (obj.__class__.__name__, self._tokens(vars(obj)))
+        else:
+            return type(obj).__name__
+
+    def _apidoc_tokens(self, api_doc, deep):
+        deep = (deep or isinstance(api_doc, VariableDoc) or
+                (isinstance(api_doc, ValueDoc) and
+                 not isinstance(api_doc, NamespaceDoc)))
+        # Referenced docs (and cycles): name, URL, and summary.
+        if not deep or id(api_doc) in self._path:
+            return '<%s %s %s %s>' % (
+                api_doc.__class__.__name__,
+                self._tokens(api_doc.canonical_name),
+                self._tokens(self.htmlwriter.url(api_doc)),
+                self._tokens(api_doc.summary))
+        # Documented objects: all public attributes.
+        self._path.add(id(api_doc))
+        items = ['%s=%s' % (key, self._tokens(val))
+                 for (key, val) in sorted(api_doc.__dict__.items())
+                 if not key.startswith('_') and key != 'pyval']
+        if type(api_doc) in (ValueDoc, GenericValueDoc):
+            value_repr = api_doc.pyval_repr().to_plaintext(None)
+            items.append(self._tokens(self._ADDRESS_RE.sub('0x', value_repr)))
+        self._path.remove(id(api_doc))
+        return '<%s %s>' % (api_doc.__class__.__name__, ' '.join(items))
+
+    def _docstring_tokens(self, parsed_docstring):
+        # Use the parse tree where there is one, since links and
+        # markup don't show up in the plaintext.
+        if hasattr(parsed_docstring, '_tree'):
+            contents = self._tokens(parsed_docstring._tree)
+        elif hasattr(parsed_docstring, '_parsed_docstrings'):
+            contents = self._tokens(parsed_docstring._parsed_docstrings)
+        elif hasattr(parsed_docstring, '_document'):
+            contents = self._tokens(parsed_docstring._document.pformat())
+        else:
+            contents = self._tokens(parsed_docstring.to_plaintext(None))
+        return '%s%s' % (parsed_docstring.__class__.__name__, contents)
+
+class LinkIndex:
+    """
+    The entries of a link index page (such as the identifier index or
+    the term definition index), sorted by name and divided into
+    alphabetical sections.  Each entry is a tuple C{(name, url,
+    where)}, where C{where} is the HTML for a link to the container of
+    the entry's object, or C{None}.  Entries are sorted by their
+    lowercase names; and entries with the same name are kept in the
+    order they were given.
+
+    At most L{RUN_SIZE} entries are kept in memory at once.  Larger
+    indices are sorted in runs, which are written to temporary files
+    and merged into a temporary file for each section.  L{close()}
+    should be called to remove these files when the index is no
+    longer needed.
+    """
+    RUN_SIZE = 20000
+    """The maximum number of entries that are sorted in memory."""
+
+    SECTIONS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ_'
+    """The names of the alphabetical sections.  Entries whose names
+    do not start with a letter are listed in the C{'_'} section."""
+
+    def __init__(self, entries, run_size=None):
+        """
+        @param entries: An iterable of C{(name, url, where)} entries.
+        @param run_size: The maximum number of entries to sort in
+            memory (by default, L{RUN_SIZE}).
+        """
+        if run_size is None: run_size = self.RUN_SIZE
+        self._sections = {}
+        """A mapping from section names to lists of entries, or (for
+        spooled indices) to L{_SpooledSection}s."""
+        self._tmpdir = None
+        self._num_tmpfiles = 0
+        self._len = 0
+
+        # Sort the entries in runs; and write each full run to a file.
+        runs = []
+        run = []
+        for entry in entries:
+            run.append( (entry[0].lower(), self._len, entry) )
+            self._len += 1
+            if len(run) >= run_size:
+                runs.append(self._write_run(run))
+                run = []
+
+        # If everything fit in one run, then keep it in memory.
+        if not runs:
+            run.sort()
+            for (key, seq, entry) in run:
+                self._sections.setdefault(self._section(entry[0]),
+                                          []).append(entry)
+            return
+
+        # Otherwise, merge the runs into the section files.
+        if run: runs.append(self._write_run(run))
+        del run
+        for (key, seq, entry) in _merge([_SpoolReader(path)
+                                         for path in runs]):
+            section_name = self._section(entry[0])
+            section = self._sections.get(section_name)
+            if section is None:
+                section = self._sections[section_name] = (
+                    _SpooledSection(self._tempfile()))
+            section.append(entry)
+        for section in self._sections.values():
+            section.close()
+        for path in runs:
+            os.remove(path)
+
+    def _section(self, name):
+        letter = name[:1].upper()
+        if not ('A' <= letter <= 'Z'): return '_'
+        return letter
+
+    def _tempfile(self):
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix='epydoc-index-')
+        self._num_tmpfiles += 1
+        return os.path.join(self._tmpdir, '%d' % self._num_tmpfiles)
+
+    def _write_run(self, run):
+        run.sort()
+        path = self._tempfile()
+        out = open(path, 'wb')
+        for record in run:
+            marshal.dump(record, out)
+        out.close()
+        return path
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, section_name):
+        return section_name in self._sections
+
+    def __getitem__(self, section_name):
+        """
+        @return: The entries in the given section, as a sequence that
+            supports C{len()} and iteration.
+        """
+        return self._sections[section_name]
+
+    def close(self):
+        """
+        Remove any temporary files used by this index.
+        """
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+        self._sections = {}
+
+class _SpooledSection:
+    """
+    A section of a L{LinkIndex}, whose entries are stored in a file.
+    Each iteration over the section reads the file again.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._out = open(path, 'wb')
+        self._len = 0
+
+    def append(self, entry):
+        marshal.dump(entry, self._out)
+        self._len += 1
+
+    def close(self):
+        self._out.close()
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return _SpoolReader(self._path)
+
+class _SpoolReader:
+    """
+    An iterator over the values that were written to a file with
+    C{marshal.dump()}.
+    """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        try:
+            return marshal.load(self._file)
+        except EOFError:
+            self._file.close()
+            raise StopIteration
+
+def _merge(iterators):
+    """
+    Merge the given iterators over sorted values into a single sorted
+    iterator.  (Values must not compare equal.)
+    """
+    heap = []
+    for iterator in iterators:
+        for value in iterator:
+            heap.append( (value, iterator) )
+            break
+    heapq.heapify(heap)
+    while heap:
+        value, iterator = heap[0]
+        yield value
+        for value in iterator:
+            heapq.heapreplace(heap, (value, iterator))
+            break
+        else:
+            heapq.heappop(heap)
+
 class _HTMLDocstringLinker(epydoc.markup.DocstringLinker):
     def __init__(self, htmlwriter, container):
         self.htmlwriter = htmlwriter
         self.docindex = htmlwriter.docindex
         self.container = container
+
+    # Linkers with the same writer & container translate xrefs the
+    # same way, so docstrings can reuse html generated by either.
+    # (Containers that were merged share their instance dictionary.)
+    def __eq__(self, other):
+        return (isinstance(other, _HTMLDocstringLinker) and
+                self.htmlwriter is other.htmlwriter and
+                self._container_id() == other._container_id())
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    def __hash__(self):
+        return hash((id(self.htmlwriter), self._container_id()))
+    def _container_id(self):
+        if self.container is None: return None
+        return id(self.container.__dict__)
         
     def translate_indexterm(self, indexterm):
         key = self.htmlwriter._term_index_to_anchor(indexterm)
@@ -17,7 +17,8 @@ import re, codecs
 from epydoc import log
 from epydoc.util import py_src_filename
 from epydoc.apidoc import *
-import tokenize, token, cgi, keyword
+import tokenize, token, cgi, keyword, os.path
+import epydoc.docparser
 try: from cStringIO import StringIO
 except: from StringIO import StringIO
 
@@ -410,6 +411,10 @@ class PythonSourceColorizer:
         #: The number of spaces to replace each tab in source code with
         self.tab_width = tab_width
 
+        #: The index in C{text} of the end of the last logical line
+        #: that we've processed.
+        self.line_end = 0
+
         
     def find_line_offsets(self):
         """
@@ -432,11 +437,22 @@ class PythonSourceColorizer:
         return '<a name="L%s"></a><tt class="py-lineno">%s</tt>' \
             % (self.lineno, n)
 
-    def colorize(self):
+    def colorize(self, out=None):
         """
         Return an HTML string that renders the source code for the
         module that was specified in the constructor.
+
+        @param out: If specified, then the HTML is not returned;
+            instead, it is written to C{out} (a function that takes
+            a string) one line at a time, as it is generated.  This
+            way, the HTML for a very large module never needs to be
+            held in memory all at once.
         """
+        if out is None:
+            pieces = []
+            self.colorize(pieces.append)
+            return ''.join(pieces)
+        
         # Initialize all our state variables
         self.pos = 0
         self.cur_line = []
@@ -452,53 +468,61 @@ class PythonSourceColorizer:
         # for each variable.
         self.doclink_targets_cache = {}
 
+        # Cache of the tooltip & targets for each linked name.  If
+        # name_to_docs is a DocLinkIndex, then this is shared with
+        # every other module that uses the same index.
+        if isinstance(self.name_to_docs, DocLinkIndex):
+            self.doclink_info_cache = self.name_to_docs.doclink_info
+        else:
+            self.doclink_info_cache = {}
+
         # Load the module's text.
-        self.text = open(self.module_filename).read()
-        self.text = self.text.expandtabs(self.tab_width).rstrip()+'\n'
+        source = open(self.module_filename).read()
+        self.text = source.expandtabs(self.tab_width).rstrip()+'\n'
+        tokens = self._source_tokens(source)
+        del source
 
         # Construct the line_offsets table.
         self.find_line_offsets()
 
         num_lines = self.text.count('\n')+1
         self.linenum_size = len(`num_lines+1`)
-        
-        # Call the tokenizer, and send tokens to our `tokeneater()`
-        # method.  If anything goes wrong, then fall-back to using
-        # the input text as-is (with no colorization).
-        try:
-            output = StringIO()
-            self.out = output.write
-            tokenize.tokenize(StringIO(self.text).readline, self.tokeneater)
-            html = output.getvalue()
-            if self.has_decorators:
-                html = self._FIX_DECORATOR_RE.sub(r'\2\1', html)
-        except tokenize.TokenError, ex:
-            html = self.text
 
         # Check for a unicode encoding declaration.
         m = self.UNICODE_CODING_RE.match(self.text)
         if m: coding = m.group(1)
         else: coding = 'iso-8859-1'
-
-        # Decode the html string into unicode, and then encode it back
-        # into ascii, replacing any non-ascii characters with xml
-        # character references.
+        try: codecs.lookup(coding)
+        except LookupError: coding = 'iso-8859-1'
+
+        # Send the generated html through write_html(), which
+        # re-encodes it and writes it to `out`.
+        self._html_out = out
+        self._html_coding = coding
+        self._html_errors = 'strict'
+        self._partial_line = ''
+        self._held_lines = []
+        self._fix_decorators = self._has_decorator_tokens(tokens)
+        self.out = self.write_html
+        
+        # Call the tokenizer, and send tokens to our `tokeneater()`
+        # method.  If anything goes wrong, then fall-back to using
+        # the rest of the input text as-is (with no colorization).
+        self.line_end = 0
         try:
-            html = html.decode(coding).encode('ascii', 'xmlcharrefreplace')
-        except LookupError:
-            coding = 'iso-8859-1'
-            html = html.decode(coding).encode('ascii', 'xmlcharrefreplace')
-        except UnicodeDecodeError, e:
-            log.warning("Unicode error while generating syntax-highlighted "
-                        "source code: %s (%s)" % (e, self.module_filename))
-            html = html.decode(coding, 'ignore').encode(
-                'ascii', 'xmlcharrefreplace')
-            
+            if tokens is not None:
+                text = self.text
+                for (toktype, start, end) in tokens:
+                    self.add_token(toktype, text[start:end], start)
+            else:
+                tokenize.tokenize(StringIO(self.text).readline,
+                                  self.tokeneater)
+        except tokenize.TokenError, ex:
+            self.write_html(cgi.escape(self.text[self.line_end:]))
+        self.flush_html()
 
         # Call expandto.
-        html += PYSRC_EXPANDTO_JAVASCRIPT
-
-        return html
+        out(PYSRC_EXPANDTO_JAVASCRIPT)
 
     def tokeneater(self, toktype, toktext, (srow,scol), (erow,ecol), line):
         """
@@ -511,11 +535,18 @@ class PythonSourceColorizer:
         if toktype == token.ERRORTOKEN:
             raise tokenize.TokenError, toktype
 
+        self.add_token(toktype, toktext, self.line_offsets[srow] + scol)
+
+    def add_token(self, toktype, toktext, startpos):
+        """
+        Add the token C{toktext}, which starts at offset C{startpos}
+        in C{self.text}, to the current line; and process the line if
+        it is complete.
+        """
         # Did we skip anything whitespace?  If so, add a pseudotoken
         # for it, with toktype=None.  (Note -- this skipped string
         # might also contain continuation slashes; but I won't bother
         # to colorize them.)
-        startpos = self.line_offsets[srow] + scol
         if startpos > self.pos:
             skipped = self.text[self.pos:startpos]
             self.cur_line.append( (None, skipped) )
@@ -530,6 +561,49 @@ class PythonSourceColorizer:
         if toktype == token.NEWLINE or toktype == token.ENDMARKER:
             self.handle_line(self.cur_line)
             self.cur_line = []
+            self.line_end = self.pos
+
+    _NON_ASCII_RE = re.compile('[\x80-\xff]')
+
+    def _source_tokens(self, source):
+        """
+        Return the L{SourceTokens<epydoc.docparser.SourceTokens>} that
+        the parser recorded for this module, if they can be used to
+        colorize C{self.text}; or C{None} otherwise.  The parser's
+        token offsets are character offsets in its (decoded) text, so
+        they can only be used if the file is pure ascii, and if
+        C{self.text} is identical to C{source} (i.e., the source
+        contains no tabs, carriage returns, or trailing whitespace).
+        """
+        if epydoc.docparser.source_tokens is None: return None
+        tokens = epydoc.docparser.source_tokens.pop(
+            os.path.abspath(self.module_filename), None)
+        if (tokens is None or tokens.length != len(source) or
+            self.text != source or '\r' in source or
+            self._NON_ASCII_RE.search(source)):
+            return None
+        return tokens
+
+    def _has_decorator_tokens(self, tokens):
+        """
+        Return true if the module contains any decorators -- i.e., any
+        C{'@'} operator tokens.  (This is what L{has_decorators} will
+        be set to once the module has been colorized; but
+        L{write_html} needs to know it up front.)
+        """
+        if '@' not in self.text: return False
+        if tokens is not None:
+            text = self.text
+            for (toktype, start, end) in tokens:
+                if toktype == token.OP and text[start:end] == '@':
+                    return True
+            return False
+        try:
+            for tok in tokenize.generate_tokens(StringIO(self.text).readline):
+                if tok[0] == token.OP and tok[1] == '@': return True
+        except tokenize.TokenError:
+            pass
+        return False
 
     _next_uid = 0
 
@@ -693,8 +767,7 @@ class PythonSourceColorizer:
                     and self.url_func is not None):
                     docs = self.name_to_docs.get(toktext)
                     if docs:
-                        tooltip='\n'.join([str(d.canonical_name)
-                                           for d in docs])
+                        tooltip = self.doclink_info(toktext, docs)[0]
                         if len(docs) == 1 and self.GUESS_LINK_TARGETS:
                             url = self.url_func(docs[0])
                         else:
@@ -785,16 +858,27 @@ class PythonSourceColorizer:
         if extra is not None: pieces.append(extra)
         return '.'.join(pieces)
 
+    def doclink_info(self, name, docs):
+        """
+        Return a tuple C{(tooltip, targets)} for a name that may refer
+        to any of the given docs, where C{tooltip} lists their names,
+        and C{targets} lists their descriptions and urls.  These don't
+        depend on where the name is used, so they are computed once
+        for each name, and kept in L{doclink_info_cache}.
+        """
+        info = self.doclink_info_cache.get(name)
+        if info is None:
+            tooltip = '\n'.join([str(d.canonical_name) for d in docs])
+            targets = ','.join(['%s=%s' % (str(self.doc_descr(d, None)),
+                                           str(self.url_func(d)))
+                                for d in docs])
+            info = self.doclink_info_cache[name] = (tooltip, targets)
+        return info
+
     def doclink(self, name, docs):
         uid = 'link-%s' % self._next_uid
         self._next_uid += 1
-        context = [n for n in self.context if n is not None]
-        container = DottedName(self.module_name, *context)
-        #else:
-        #    container = None
-        targets = ','.join(['%s=%s' % (str(self.doc_descr(d,container)),
-                              str(self.url_func(d)))
-                            for d in docs])
+        targets = self.doclink_info(name, docs)[1]
 
         if targets in self.doclink_targets_cache:
             onclick = ("return doclink('%s', '%s', '%s');" %
@@ -882,14 +966,112 @@ class PythonSourceColorizer:
         else:
             return '%s-module.html#%s' % (self.module_name, func_name)
 
-    #: A regexp used to move the <div> that marks the beginning of a
-    #: function or method to just before the decorators.
-    _FIX_DECORATOR_RE = re.compile(
-        r'((?:^<a name="L\d+"></a><tt class="py-lineno">\s*\d+</tt>'
+    #: The maximum number of decorator, comment, and blank lines that
+    #: L{write_html} will hold back, waiting to see whether they are
+    #: followed by the beginning of a function or method.
+    MAX_HELD_LINES = 1000
+
+    def write_html(self, html):
+        """
+        Write the string C{html} to the output function that was given
+        to L{colorize}, one complete line at a time.  Each line is
+        decoded using the module's encoding, and re-encoded into
+        ascii, with any non-ascii characters replaced by xml character
+        references.
+
+        If the module contains any decorators, then runs of decorator,
+        comment, and blank lines are held back, until the next line
+        has been seen: if they are followed by the C{<div>} that marks
+        the beginning of a function or method, then that C{<div>} is
+        moved to just before them.
+        """
+        if '\n' not in html:
+            self._partial_line += html
+            return
+        lines = (self._partial_line + html).split('\n')
+        self._partial_line = lines.pop()
+        if not self._fix_decorators:
+            self._write_encoded('\n'.join(lines) + '\n')
+            return
+        for line in lines:
+            line += '\n'
+            m = self._DEF_START_RE.match(line)
+            if m and self._held_lines:
+                line = m.group() + ''.join(self._held_lines) + line[m.end():]
+                self._held_lines = []
+            elif self._HELD_LINE_RE.match(line):
+                self._held_lines.append(line)
+                if len(self._held_lines) < self.MAX_HELD_LINES:
+                    continue
+                self._write_held_lines()
+                continue
+            else:
+                self._write_held_lines()
+            self._write_encoded(line)
+
+    def flush_html(self):
+        """
+        Write any output that L{write_html} is still holding back.
+        """
+        self._write_held_lines()
+        self._write_encoded(self._partial_line)
+        self._partial_line = ''
+
+    def _write_held_lines(self):
+        if self._held_lines:
+            self._write_encoded(''.join(self._held_lines))
+            self._held_lines = []
+
+    def _write_encoded(self, html):
+        if not html: return
+        try:
+            html = html.decode(self._html_coding, self._html_errors)
+        except UnicodeDecodeError, e:
+            log.warning("Unicode error while generating syntax-highlighted "
+                        "source code: %s (%s)" % (e, self.module_filename))
+            self._html_errors = 'ignore'
+            html = html.decode(self._html_coding, self._html_errors)
+        self._html_out(html.encode('ascii', 'xmlcharrefreplace'))
+
+    #: A regexp matching a line that contains only a decorator, a
+    #: comment, or whitespace.
+    _HELD_LINE_RE = re.compile(
+        r'<a name="L\d+"></a><tt class="py-lineno">\s*\d+</tt>'
         r'\s*<tt class="py-line">(?:<tt class="py-decorator">.*|\s*</tt>|'
-        r'\s*<tt class="py-comment">.*)\n)+)'
-        r'(<a name="\w+"></a><div id="\w+-def">)', re.MULTILINE)
+        r'\s*<tt class="py-comment">.*)\n')
+
+    #: A regexp matching the <div> that marks the beginning of a
+    #: function or method.
+    _DEF_START_RE = re.compile(r'<a name="\w+"></a><div id="\w+-def">')
     
+class DocLinkIndex(dict):
+    """
+    A dictionary mapping short names to sorted lists of the C{APIDoc}s
+    they may refer to, used by L{PythonSourceColorizer} to link names
+    in the source code.  The index also keeps the tooltip and link
+    targets for each name (see L{PythonSourceColorizer.doclink_info}),
+    so that they are only computed once, no matter how many modules
+    use the name.
+    """
+    def __init__(self, api_docs, url_func):
+        """
+        Construct an index for the given C{APIDoc}s.  Docs without a
+        canonical name, or for which C{url_func} returns C{None}, are
+        not included.
+        """
+        dict.__init__(self)
+        for api_doc in api_docs:
+            if (api_doc.canonical_name is not None and
+                url_func(api_doc) is not None):
+                name = api_doc.canonical_name[-1]
+                self.setdefault(name, []).append(api_doc)
+        for doc_list in self.values():
+            doc_list.sort()
+
+        self.doclink_info = {}
+        """A dictionary mapping each name that has been linked to its
+        C{(tooltip, targets)} tuple."""
+
 _HDR = '''\
 <?xml version="1.0" encoding="ascii"?>
         <!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"
@@ -124,6 +124,27 @@ class SimpleLogger(Logger):
         self.threshold = threshold
     def log(self, level, message):
         if level >= self.threshold: print message
+
+class RecordingLogger(Logger):
+    """
+    A logger that records the messages and blocks that are logged, so
+    that they can be replayed later with L{replay_records()} -- e.g.,
+    by the main process, for messages logged by a worker process.
+    Progress is not recorded.
+
+    @ivar records: A list of C{(method, args)} tuples, one for each
+        call to L{log()}, L{start_block()} or L{end_block()}.
+    """
+    def __init__(self):
+        self.records = []
+    def _record(self, method, args):
+        self.records.append((method, args))
+    def log(self, level, message):
+        self._record('log', (level, message))
+    def start_block(self, header):
+        self._record('start_block', (header,))
+    def end_block(self):
+        self._record('end_block', ())
         
 ######################################################################
 # Logger Registry
@@ -204,3 +225,12 @@ progress.__doc__ = Logger.progress.__doc__
 
 def close():
     for logger in _loggers: logger.close()
+
+def replay_records(records):
+    """
+    Delegate each of the given records (made by a L{RecordingLogger})
+    to each registered logger.
+    """
+    for (method, args) in records:
+        for logger in _loggers:
+            getattr(logger, method)(*args)
@@ -45,9 +45,15 @@ Markup errors are represented using L{ParseError}s.  These exception
 classes record information about the cause, location, and severity of
 each error.
 
+Parsing the same docstring more than once gives the same result, so
+L{parse()} keeps the results that it returns in a L{ParseCache}.
+Docstrings that are repeated (e.g., for overridden methods or
+generated wrappers) are only parsed once.
+
 @sort: parse, ParsedDocstring, Field, DocstringLinker
 @group Errors and Warnings: ParseError
 @group Utility Functions: parse_type_of
+@group Parse Cache: ParseCache, parse_cache
 @var SCRWIDTH: The default width with which text will be wrapped
       when formatting the output of the parser.
 @type SCRWIDTH: C{int}
@@ -55,7 +61,9 @@ each error.
 """
 __docformat__ = 'epytext en'
 
-import re, types, sys
+import re, types, sys, os, copy, tempfile
+try: import cPickle as pickle
+except ImportError: import pickle
 from epydoc import log
 from epydoc.util import plaintext_to_html, plaintext_to_latex
 import epydoc
@@ -66,11 +74,12 @@ from epydoc.compat import *
 ##################################################
 #
 # 1. parse() dispatcher
-# 2. ParsedDocstring abstract base class
-# 3. Field class
-# 4. Docstring Linker
-# 5. ParseError exceptions
-# 6. Misc helpers
+# 2. Parse cache
+# 3. ParsedDocstring abstract base class
+# 4. Field class
+# 5. Docstring Linker
+# 6. ParseError exceptions
+# 7. Misc helpers
 #
 
 ##################################################
@@ -108,6 +117,8 @@ def register_markup_language(name, parse_function):
               list (as L{ParseError} objects).
     """
     _markup_language_registry[name.lower()] = parse_function
+    # Results from a previously registered parser are no longer valid.
+    if parse_cache is not None: parse_cache.clear()
 
 MARKUP_LANGUAGES_USED = set()
 
@@ -136,26 +147,53 @@ def parse(docstring, markup='plaintext', errors=None, **options):
     @raise ParseError: If C{errors} is C{None} and an error is
         encountered while parsing.
     """
-    # Initialize errors list.
-    raise_on_error = (errors is None)
-    if errors == None: errors = []
-
     # Normalize the markup language name.
     markup = markup.lower()
 
+    # Parse the docstring (or find it in the parse cache).
+    if parse_cache is None:
+        parsed_docstring, parse_errors = _parse(docstring, markup,
+                                                options)[:2]
+    else:
+        parsed_docstring, parse_errors = parse_cache.parse(docstring, markup,
+                                                           options)
+
+    # Report any errors.
+    if errors is not None:
+        errors.extend(parse_errors)
+    else:
+        for e in parse_errors:
+            if e.is_fatal(): raise e
+
+    return parsed_docstring
+
+def _parse(docstring, markup, options):
+    """
+    Parse the given docstring.  This is used by L{parse()} and
+    L{ParseCache.parse()}.
+
+    @return: A tuple C{(parsed_docstring, errors, cacheable)}, where
+        C{errors} is a list of the L{ParseError}s that were generated;
+        and C{cacheable} is false if an internal error occured while
+        parsing.
+    """
+    errors = []
+
     # Is the markup language valid?
     if not re.match(r'\w+', markup):
         _parse_warn('Bad markup language name %r.  Treating '
                     'docstrings as plaintext.' % markup)
         import epydoc.markup.plaintext as plaintext
-        return plaintext.parse_docstring(docstring, errors, **options)
+        return plaintext.parse_docstring(docstring, errors, **options), \
+               errors, True
 
     # Is the markup language supported?
     if markup not in _markup_language_registry:
         _parse_warn('Unsupported markup language %r.  Treating '
                     'docstrings as plaintext.' % markup)
         import epydoc.markup.plaintext as plaintext
-        return plaintext.parse_docstring(docstring, errors, **options)
+        return plaintext.parse_docstring(docstring, errors, **options), \
+               errors, True
 
     # Get the parse function.
     parse_docstring = _markup_language_registry[markup]
@@ -167,7 +205,8 @@ def parse(docstring, markup='plaintext', errors=None, **options):
             _parse_warn('Error importing %s for markup language %s: %s' %
                         (parse_docstring, markup, e))
             import epydoc.markup.plaintext as plaintext
-            return plaintext.parse_docstring(docstring, errors, **options)
+            return plaintext.parse_docstring(docstring, errors, **options), \
+                   errors, True
         _markup_language_registry[markup] = parse_docstring
 
     # Keep track of which markup languages have been used so far.
@@ -181,16 +220,17 @@ def parse(docstring, markup='plaintext', errors=None, **options):
         log.error('Internal error while parsing a docstring: %s; '
                   'treating docstring as plaintext' % e)
         import epydoc.markup.plaintext as plaintext
-        return plaintext.parse_docstring(docstring, errors, **options)
+        return plaintext.parse_docstring(docstring, errors, **options), \
+               errors, False
 
     # Check for fatal errors.
     fatal_errors = [e for e in errors if e.is_fatal()]
-    if fatal_errors and raise_on_error: raise fatal_errors[0]
     if fatal_errors:
         import epydoc.markup.plaintext as plaintext
-        return plaintext.parse_docstring(docstring, errors, **options)
+        return plaintext.parse_docstring(docstring, errors, **options), \
+               errors, True
 
-    return parsed_docstring
+    return parsed_docstring, errors, True
 
 # only issue each warning once:
 _parse_warnings = {}
@@ -204,6 +244,169 @@ def _parse_warn(estr):
     _parse_warnings[estr] = 1
     log.warning(estr)
 
+##################################################
+## Parse Cache
+##################################################
+
+class ParseCache:
+    """
+    A cache for the results of L{parse()}.  Cache entries are keyed by
+    the markup language, the parse options, and the docstring text;
+    and record the C{ParsedDocstring} and the list of L{ParseError}s
+    that were generated.  When a docstring is found in the cache, the
+    same C{ParsedDocstring} is returned again, and copies of its
+    errors are reported again.  C{ParsedDocstring}s must therefore
+    not be modified after they are parsed.
+
+    At most L{max_size} entries are kept; when the cache is full, the
+    entries that were used least recently are discarded.
+
+    If a filename is given, then the cache entries are loaded from
+    that file, and L{save()} writes them back to it; so they can be
+    reused by later runs.  Only entries that can be pickled are saved.
+
+    To use a cache, set L{parse_cache <epydoc.markup.parse_cache>} to
+    a C{ParseCache}; or set it to C{None} to disable caching.
+    """
+    def __init__(self, max_size=10000, filename=None):
+        self.max_size = max_size
+        """The maximum number of entries in the cache."""
+
+        self.filename = filename
+        """The file where the cache is saved, or C{None}."""
+
+        self.hits = 0
+        """The number of docstrings that were found in the cache."""
+
+        self.misses = 0
+        """The number of docstrings that were parsed."""
+
+        self._entries = {}
+        """A dictionary mapping from cache keys to lists C{[result,
+        pickled, last_use]}, where C{result} is a tuple
+        C{(parsed_docstring, errors)}; and C{pickled} is the pickled
+        result (if this cache is saved to a file).  Entries that were
+        loaded from the file have a C{result} of C{None} until they
+        are used."""
+
+        self._clock = 0
+        """A counter that is incremented on each use, used to find
+        the least recently used entries."""
+
+        if filename is not None and os.path.exists(filename):
+            self.load()
+
+    def parse(self, docstring, markup, options):
+        """
+        Parse the given docstring, or look it up in the cache.
+
+        @return: A tuple C{(parsed_docstring, errors)}.
+        """
+        key = (markup, tuple(sorted(options.items())), docstring)
+        try: entry = self._entries.get(key)
+        except TypeError: # unhashable options.
+            return _parse(docstring, markup, options)[:2]
+
+        self._clock += 1
+        if entry is not None and entry[0] is None:
+            try: entry[0] = pickle.loads(entry[1])
+            except KeyboardInterrupt: raise
+            except Exception: entry = None # e.g., a parser has changed.
+        if entry is not None:
+            entry[2] = self._clock
+            self.hits += 1
+            if markup in _markup_language_registry:
+                MARKUP_LANGUAGES_USED.add(markup)
+            parsed_docstring, errors = entry[0]
+            if parsed_docstring is not None: parsed_docstring.cached = True
+            return parsed_docstring, [copy.copy(e) for e in errors]
+
+        self.misses += 1
+        parsed_docstring, errors, cacheable = _parse(docstring, markup,
+                                                     options)
+        if cacheable:
+            if parsed_docstring is not None: parsed_docstring.cached = True
+            # Copy the errors, since their line numbers are changed
+            # by the caller.
+            result = (parsed_docstring, [copy.copy(e) for e in errors])
+            pickled = None
+            if self.filename is not None:
+                try: pickled = pickle.dumps(result, 2)
+                except KeyboardInterrupt: raise
+                except Exception: pass
+            self._entries[key] = [result, pickled, self._clock]
+            if len(self._entries) > self.max_size:
+                self._discard_old_entries()
+        return parsed_docstring, errors
+
+    def _discard_old_entries(self):
+        """
+        Discard the least recently used quarter of the cache entries.
+        """
+        uses = [(entry[2], key) for (key, entry) in self._entries.items()]
+        uses.sort()
+        for (last_use, key) in uses[:len(uses) - self.max_size*3/4]:
+            del self._entries[key]
+
+    def clear(self):
+        """
+        Discard all cache entries.
+        """
+        self._entries.clear()
+
+    def hit_rate(self):
+        """
+        @return: The fraction of docstrings that were found in the
+            cache.
+        """
+        if self.hits + self.misses == 0: return 0.0
+        return float(self.hits) / (self.hits + self.misses)
+
+    def load(self):
+        """
+        Load the cache entries from L{filename}.  If the file can't be
+        read, or was written by a different version of epydoc, then
+        it is ignored.
+        """
+        try:
+            f = open(self.filename, 'rb')
+            try: version, entries = pickle.load(f)
+            finally: f.close()
+        except KeyboardInterrupt: raise
+        except Exception, e:
+            log.warning('Unable to read parse cache %s: %s' %
+                        (self.filename, e))
+            return
+        if version != epydoc.__version__: return
+        for (key, pickled) in entries:
+            self._entries[key] = [None, pickled, 0]
+
+    def save(self):
+        """
+        Write the cache entries to L{filename}.
+        """
+        entries = [(key, entry[1]) for (key, entry) in self._entries.items()
+                   if entry[1] is not None]
+        # Write the file atomically, so that concurrent builds sharing
+        # a cache file never see a partial file.
+        dirname = os.path.dirname(os.path.abspath(self.filename))
+        fd, tmpname = tempfile.mkstemp('.tmp', '', dirname)
+        try:
+            out = os.fdopen(fd, 'wb')
+            try: pickle.dump((epydoc.__version__, entries), out, 2)
+            finally: out.close()
+            if os.path.exists(self.filename) and sys.platform == 'win32':
+                os.remove(self.filename)
+            os.rename(tmpname, self.filename)
+        except (IOError, OSError), e:
+            log.warning('Unable to write parse cache %s: %s' %
+                        (self.filename, e))
+            if os.path.exists(tmpname): os.remove(tmpname)
+
+parse_cache = None
+"""The L{ParseCache} that is used by L{parse()}, or C{None} (the
+default) if parse results should not be cached."""
+
 ##################################################
 ## ParsedDocstring
 ##################################################
@@ -239,6 +442,11 @@ class ParsedDocstring:
     methods will be added to this base class; but they will always
     be given a default implementation.
     """
+    cached = False
+    """True if this parsed docstring is kept in the L{parse_cache};
+    since a cached docstring is shared by every docstring with the
+    same text, methods that modify it must work on a copy."""
+
     def split_fields(self, errors=None):
         """
         Split this docstring into its body and its fields.
@@ -537,6 +745,12 @@ class ParseError(Exception):
         if self._linenum is None: return None
         else: return self._offset + self._linenum
 
+    def __reduce__(self):
+        # Exceptions are copied & pickled by calling their constructor
+        # with self.args; but ParseError's constructors take different
+        # arguments.  So just restore the instance variables.
+        return (_new_parse_error, (self.__class__,), self.__dict__)
+
     def set_linenum_offset(self, offset):
         """
         Set the line number offset for this error.  This offset is the
@@ -595,6 +809,11 @@ class ParseError(Exception):
         return cmp(self._linenum+self._offset,
                    other._linenum+other._offset)
 
+def _new_parse_error(cls):
+    """Create a new, uninitialized L{ParseError}.  This is used to
+    copy and unpickle C{ParseError}s."""
+    return cls.__new__(cls)
+
 ##################################################
 ## Misc helpers
 ##################################################
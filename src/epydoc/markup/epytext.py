@@ -115,14 +115,19 @@ from epydoc.markup.doctest import doctest_to_html, doctest_to_latex
 ## DOM-Like Encoding
 ##################################################
 
-class Element:
+class Element(object):
     """
     A very simple DOM-like representation for parsed epytext
     documents.  Each epytext document is encoded as a tree whose nodes
     are L{Element} objects, and whose leaves are C{string}s.  Each
     node is marked by a I{tag} and zero or more I{attributes}.  Each
     attribute is a mapping from a string key to a string value.
+
+    The trees of parsed docstrings are made read-only by
+    L{_compact()}, to reduce their size.
     """
+    __slots__ = ('tag', 'children', 'attribs')
+    
     def __init__(self, tag, *children, **attribs):
         self.tag = tag
         """A string tag indicating the type of this element.
@@ -137,6 +142,13 @@ class Element:
         for this element.
         @type: C{dict} from C{string} to C{string}"""
 
+    def __getstate__(self):
+        return (self.tag, self.children, self.attribs or None)
+
+    def __setstate__(self, state):
+        (self.tag, self.children, self.attribs) = state
+        if self.attribs is None: self.attribs = _EMPTY_ATTRIBS
+
     def __str__(self):
         """
         Return a string representation of this element, using XML
@@ -153,6 +165,24 @@ class Element:
         args = ''.join([', %r' % c for c in self.children])
         return 'Element(%s%s%s)' % (self.tag, args, attribs)
 
+_EMPTY_ATTRIBS = {}
+"""The attribute dictionary that is shared by all compacted
+L{Element}s that have no attributes.  It must not be modified."""
+
+def _compact(tree):
+    """
+    Convert the given tree, in place, to a more compact (read-only)
+    form: each element's children are stored in a tuple; elements
+    with no attributes share L{_EMPTY_ATTRIBS}; and tags are
+    interned.  This is used for the trees of parsed docstrings, which
+    are kept for the whole run.
+    """
+    if not isinstance(tree, Element): return
+    tree.tag = intern(tree.tag)
+    if not tree.attribs: tree.attribs = _EMPTY_ATTRIBS
+    for child in tree.children: _compact(child)
+    tree.children = tuple(tree.children)
+
 ##################################################
 ## Constants
 ##################################################
@@ -320,9 +350,11 @@ def parse(str, errors = None):
     # elements; so "raise" any graphs we generated.  This is a bit of
     # a hack, but the alternative is to define a new markup for
     # block-level elements, which I'd rather not do.  (See sourceforge
-    # bug #1673017.)
-    for child in doc.children:
-        _raise_graphs(child, doc)
+    # bug #1673017.)  Graphs can only come from "G{", so don't walk
+    # the tree if the string doesn't contain one.
+    if 'G{' in str:
+        for child in doc.children:
+            _raise_graphs(child, doc)
 
     # If there was an error, then signal it!
     if len([e for e in errors if e.is_fatal()]) > 0:
@@ -770,10 +802,15 @@ def _tokenize_literal(lines, start, block_indent, tokens, errors):
         # Go on to the next line.
         linenum += 1
 
-    # Add the token, and return the linenum after the token ends.
+    # Strip any blank lines from the start and end of the block
+    # (but keep the last line, even if it's blank).
     contents = [line[block_indent+1:] for line in lines[start:linenum]]
-    contents = '\n'.join(contents)
-    contents = re.sub('(\A[ \n]*\n)|(\n[ \n]*\Z)', '', contents)
+    first, last = 0, len(contents)
+    while last-first > 1 and not contents[first].strip(' '): first += 1
+    while last-first > 1 and not contents[last-1].strip(' '): last -= 1
+
+    # Add the token, and return the linenum after the token ends.
+    contents = '\n'.join(contents[first:last])
     tokens.append(Token(Token.LBLOCK, start, contents, block_indent))
     return linenum
 
@@ -1024,6 +1061,11 @@ def _colorize(doc, token, errors, tagName='para'):
     """
     str = token.contents
     linenum = 0
+
+    # Most paragraphs have no inline markup at all.
+    if '{' not in str and '}' not in str:
+        if str: return Element(tagName, str)
+        else: return Element(tagName)
     
     # Maintain a stack of DOM elements, containing the ancestors of
     # the text currently being analyzed.  New elements are pushed when 
@@ -1036,14 +1078,12 @@ def _colorize(doc, token, errors, tagName='para'):
     # open brace.
     openbrace_stack = [0]
 
-    # Process the string, scanning for '{' and '}'s.  start is the
-    # index of the first unprocessed character.  Each time through the
-    # loop, we process the text from the first unprocessed character
-    # to the next open or close brace.
+    # Process the string in a single pass over its '{' and '}'s.
+    # start is the index of the first unprocessed character.  Each
+    # time through the loop, we process the text from the first
+    # unprocessed character to the next open or close brace.
     start = 0
-    while 1:
-        match = _BRACE_RE.search(str, start)
-        if match == None: break
+    for match in _BRACE_RE.finditer(str):
         end = match.start()
         
         # Open braces start new colorizing elements.  When preceeded
@@ -1052,7 +1092,7 @@ def _colorize(doc, token, errors, tagName='para'):
         # use a special "literal braces" element (with tag "litbrace"),
         # and convert them to literal braces once we find the matching 
         # close-brace.
-        if match.group() == '{':
+        if str[end] == '{':
             if (end>0) and 'A' <= str[end-1] <= 'Z':
                 if (end-1) > start:
                     stack[-1].children.append(str[start:end-1])
@@ -1071,7 +1111,7 @@ def _colorize(doc, token, errors, tagName='para'):
             stack[-2].children.append(stack[-1])
             
         # Close braces end colorizing elements.
-        elif match.group() == '}':
+        else:
             # Check for (and ignore) unbalanced braces.
             if len(stack) <= 1:
                 estr = "Unbalanced '}'."
@@ -1084,7 +1124,8 @@ def _colorize(doc, token, errors, tagName='para'):
                 stack[-1].children.append(str[start:end])
 
             # Special handling for symbols:
-            if stack[-1].tag == 'symbol':
+            tag = stack[-1].tag
+            if tag == 'symbol':
                 if (len(stack[-1].children) != 1 or
                     not isinstance(stack[-1].children[0], basestring)):
                     estr = "Invalid symbol code."
@@ -1099,7 +1140,7 @@ def _colorize(doc, token, errors, tagName='para'):
                         errors.append(ColorizingError(estr, token, end))
                         
             # Special handling for escape elements:
-            if stack[-1].tag == 'escape':
+            elif tag == 'escape':
                 if (len(stack[-1].children) != 1 or
                     not isinstance(stack[-1].children[0], basestring)):
                     estr = "Invalid escape code."
@@ -1117,15 +1158,15 @@ def _colorize(doc, token, errors, tagName='para'):
                         errors.append(ColorizingError(estr, token, end))
 
             # Special handling for literal braces elements:
-            if stack[-1].tag == 'litbrace':
+            elif tag == 'litbrace':
                 stack[-2].children[-1:] = ['{'] + stack[-1].children + ['}']
 
             # Special handling for graphs:
-            if stack[-1].tag == 'graph':
+            elif tag == 'graph':
                 _colorize_graph(doc, stack[-1], token, end, errors)
 
             # Special handling for link-type elements:
-            if stack[-1].tag in _LINK_COLORIZING_TAGS:
+            elif tag in _LINK_COLORIZING_TAGS:
                 _colorize_link(doc, stack[-1], token, end, errors)
 
             # Pop the completed element.
@@ -1659,7 +1700,10 @@ def parse_docstring(docstring, errors, **options):
         Currently, no extra options are defined.
     @rtype: L{ParsedDocstring}
     """
-    return ParsedEpytextDocstring(parse(docstring, errors), **options)
+    parsed_docstring = ParsedEpytextDocstring(parse(docstring, errors),
+                                              **options)
+    _compact(parsed_docstring._tree)
+    return parsed_docstring
     
 class ParsedEpytextDocstring(ParsedDocstring):
     SYMBOL_TO_HTML = {
@@ -1766,20 +1810,32 @@ class ParsedEpytextDocstring(ParsedDocstring):
         self._tree = dom_tree
         # Caching:
         self._html = self._latex = self._plaintext = None
+        self._html_linker = None
         self._terms = None
         # inline option -- mark top-level children as inline.
         if options.get('inline') and self._tree is not None:
             for elt in self._tree.children:
-                elt.attribs['inline'] = True
+                elt.attribs = dict(elt.attribs, inline=True)
+
+    def __getstate__(self):
+        # Don't pickle the cached html: its linker refers to the
+        # writer that rendered it.
+        state = dict(self.__dict__)
+        state['_html'] = state['_html_linker'] = None
+        return state
 
     def __str__(self):
         return str(self._tree)
         
     def to_html(self, docstring_linker, directory=None, docindex=None,
                 context=None, **options):
-        if self._html is not None: return self._html
+        # The html depends on the linker's context (e.g., for an
+        # inherited docstring), so only reuse it for an equal linker.
+        if self._html is not None and self._html_linker == docstring_linker:
+            return self._html
         if self._tree is None: return ''
         indent = options.get('indent', 0)
+        self._html_linker = docstring_linker
         self._html = self._to_html(self._tree, docstring_linker, directory, 
                                    docindex, context, indent)
         return self._html
@@ -2088,18 +2144,19 @@ class ParsedEpytextDocstring(ParsedDocstring):
             for field in field_nodes:
                 # Get the tag
                 tag = field.children[0].children[0].lower()
-                del field.children[0]
+                body = field.children[1:]
 
                 # Get the argument.
-                if field.children and field.children[0].tag == 'arg':
-                    arg = field.children[0].children[0]
-                    del field.children[0]
+                if body and body[0].tag == 'arg':
+                    arg = body[0].children[0]
+                    body = body[1:]
                 else:
                     arg = None
 
-                # Process the field.
-                field.tag = 'epytext'
-                fields.append(Field(tag, arg, ParsedEpytextDocstring(field)))
+                # Process the field.  (The field node is left as-is,
+                # since parsed docstrings may be shared.)
+                body = Element('epytext', *body, **field.attribs)
+                fields.append(Field(tag, arg, ParsedEpytextDocstring(body)))
 
         # Save the remaining docstring as the description..
         if tree.children and tree.children[0].children:
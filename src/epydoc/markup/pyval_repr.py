@@ -98,6 +98,60 @@ def colorize_pyval(pyval, parse_repr=None, min_score=None,
     return PyvalColorizer(linelen, maxlines, linebreakok, sort).colorize(
         pyval, parse_repr, min_score)
 
+def record_pyval(pyval, sort=True):
+    """
+    Return a picklable stand-in for C{pyval}, which is colorized the
+    same way as C{pyval} (with any line length or maximum number of
+    lines).  Strings, numbers, C{None}, C{True} and C{False} are
+    returned as-is; any other value is returned as a
+    L{RecordedPyval}.
+    """
+    return _PyvalRecorder(sort).record(pyval)
+
+class RecordedPyval:
+    """
+    A record of how a Python value is colorized, which can be
+    colorized in place of the value when it is not available (e.g.,
+    because it was introspected by another process).  Use
+    L{record_pyval()} to create C{RecordedPyval}s.
+
+    The elements of lists, tuples, sets, frozensets and dicts are
+    recorded in the order in which they are colorized, so the
+    containers can be line-wrapped in the same way as the value
+    would be; but only the first L{MAX_ELEMENTS} elements of a value
+    (and elements up to L{MAX_DEPTH} containers deep) are recorded.
+    For any other value, the strings that were output when
+    colorizing it are recorded.
+
+    @ivar prefix: The string that opens a container, or C{None} if
+        the value is not a container.
+    @ivar suffix: The string that closes a container.
+    @ivar is_dict: True if the container's elements are
+        C{(key, value)} pairs.
+    @ivar elts: The recorded elements of a container.
+    @ivar is_complete: True if all of a container's elements were
+        recorded.
+    @ivar output: A list of the C{(string, tag)} pairs that were
+        output when colorizing a value that is not a container.  An
+        unknown representation is recorded as C{None}.
+    @ivar score: The score that was given to a value that is not a
+        container.
+    """
+    MAX_ELEMENTS = 1000
+    """The maximum number of container elements recorded for a
+    value."""
+
+    MAX_DEPTH = 20
+    """The maximum depth of nested containers that are recorded."""
+
+    def __init__(self):
+        self.prefix = self.suffix = None
+        self.is_dict = False
+        self.elts = []
+        self.is_complete = True
+        self.output = []
+        self.score = 0
+
 class PyvalColorizer:
     """
     Syntax highlighter for Python values.
@@ -205,6 +259,8 @@ class PyvalColorizer:
                             state, '{', '}')
         elif is_re_pattern(pyval):
             self._colorize_re(pyval, state)
+        elif isinstance(pyval, RecordedPyval):
+            self._colorize_record(pyval, state)
         else:
             try:
                 pyval_repr = repr(pyval)
@@ -297,6 +353,33 @@ class PyvalColorizer:
             self._colorize(val, state)
         self._output(suffix, self.GROUP_TAG, state)
 
+    def _colorize_record(self, record, state):
+        if record.prefix is not None:
+            self._multiline(self._colorize_recorded_elts, record, state,
+                            record.prefix, record.suffix)
+        else:
+            state.score += record.score
+            for item in record.output:
+                if item is None:
+                    state.result.append(self.UNKNOWN_REPR)
+                else:
+                    self._output(item[0], item[1], state)
+
+    def _colorize_recorded_elts(self, record, state, prefix, suffix):
+        elts = self._recorded_elts(record, state)
+        if record.is_dict:
+            self._colorize_dict(elts, state, prefix, suffix)
+        else:
+            self._colorize_iter(elts, state, prefix, suffix)
+
+    def _recorded_elts(self, record, state):
+        for elt in record.elts:
+            yield elt
+        # If the container was too big to record, then stop here.
+        if not record.is_complete:
+            if state.linebreakok: raise _Maxlines()
+            else: raise _Linebreak()
+
     def _colorize_str(self, pyval, state, prefix, encoding):
         # Decide which quote to use.
         if '\n' in pyval and state.linebreakok: quote = "'''"
@@ -530,3 +613,74 @@ class PyvalColorizer:
                     segment = Element('code', segment, style=tag)
                 state.result += [segment, self.LINEWRAP]
 
+#////////////////////////////////////////////////////////////
+# Value Recording
+#////////////////////////////////////////////////////////////
+
+_RECORDED_CONTAINERS = {list: ('[', ']'), tuple: ('(', ')'),
+                        set: ('set([', '])'),
+                        frozenset: ('frozenset([', '])'),
+                        dict: ('{', '}')}
+"""The containers whose elements are recorded by L{record_pyval()},
+and the strings that open and close them."""
+
+_UNRECORDED_TYPES = (types.NoneType, bool, int, long, float,
+                     types.ComplexType, str, unicode)
+"""The types of values that are their own records."""
+
+class _PyvalRecorder(PyvalColorizer):
+    """
+    Creates the L{RecordedPyval}s for L{record_pyval()}.  Values that
+    are not containers are colorized with an L{_output()} method that
+    records its arguments, rather than adding them to the result.
+    """
+    def __init__(self, sort):
+        PyvalColorizer.__init__(self, sort=sort)
+        self.num_elts = 0
+
+    def record(self, pyval, depth=0):
+        pyval_type = type(pyval)
+        if pyval_type in _UNRECORDED_TYPES:
+            return pyval
+        record = RecordedPyval()
+        if pyval_type in _RECORDED_CONTAINERS:
+            record.prefix, record.suffix = _RECORDED_CONTAINERS[pyval_type]
+            record.is_dict = (pyval_type is dict)
+            if depth >= RecordedPyval.MAX_DEPTH:
+                record.is_complete = False
+                return record
+            if pyval_type is dict:
+                elts = self._sort(pyval.items())
+            elif pyval_type in (set, frozenset):
+                elts = self._sort(pyval)
+            else:
+                elts = pyval
+            for elt in elts:
+                if self.num_elts >= RecordedPyval.MAX_ELEMENTS:
+                    record.is_complete = False
+                    break
+                self.num_elts += 1
+                if record.is_dict:
+                    elt = (self.record(elt[0], depth+1),
+                           self.record(elt[1], depth+1))
+                else:
+                    elt = self.record(elt, depth+1)
+                record.elts.append(elt)
+        else:
+            state = _ColorizerState()
+            try:
+                self._colorize(pyval, state)
+                # Don't count the point that colorizing the record adds.
+                record.score = state.score - 1
+            except KeyboardInterrupt:
+                raise
+            except:
+                state.result = [self.UNKNOWN_REPR]
+                record.score = -100
+            for item in state.result:
+                if isinstance(item, tuple): record.output.append(item)
+                else: record.output.append(None)
+        return record
+
+    def _output(self, s, tag, state):
+        state.result.append( (s, tag) )
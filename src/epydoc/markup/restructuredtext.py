@@ -30,6 +30,14 @@ helpers:
     further processing.  The settings for the writer are copied from
     C{docutils.writers.html4css1.Writer}, since those settings will
     be used when we actually write the docstring to html.
+  - An L{_EpydocParser} is used to parse the docstring.  Parsers are
+    reused for each docstring, along with the settings (see
+    L{_get_settings()}), since setting them up is a large part of the
+    cost of parsing a short docstring.
+
+Docstrings that do not contain any markup (just paragraphs of plain
+text) are not given to docutils at all; their documents are built
+directly by L{_parse_plaintext()}.
 
 Using C{ParsedRstDocstring}s
 ============================
@@ -66,7 +74,7 @@ the list.
 __docformat__ = 'epytext en'
 
 # Imports
-import re, os, os.path
+import re, os, os.path, copy
 from xml.dom.minidom import *
 
 from docutils.core import publish_string
@@ -78,8 +86,11 @@ from docutils.utils import new_document
 from docutils.nodes import NodeVisitor, Text, SkipChildren
 from docutils.nodes import SkipNode, TreeCopyVisitor
 from docutils.frontend import OptionParser
-from docutils.parsers.rst import directives, roles
+from docutils.parsers.rst import directives, roles, states
+import docutils.core
 import docutils.nodes
+import docutils.parsers.rst
+import docutils.statemachine
 import docutils.transforms.frontmatter
 import docutils.transforms
 import docutils.utils
@@ -129,14 +140,96 @@ def parse_docstring(docstring, errors, **options):
         Currently, no extra options are defined.
     @rtype: L{ParsedDocstring}
     """
+    # Docstrings with no markup are parsed without docutils.
+    document = _parse_plaintext(docstring)
+    if document is not None:
+        return ParsedRstDocstring(document)
+
     writer = _DocumentPseudoWriter()
     reader = _EpydocReader(errors) # Outputs errors to the list.
-    publish_string(docstring, writer=writer, reader=reader,
-                   settings_overrides={'report_level':10000,
-                                       'halt_level':10000,
-                                       'warning_stream':None})
+    # Use a parser from the pool (or a new one, if they're all busy
+    # parsing -- e.g., if a directive parses another docstring).
+    if _parsers: parser = _parsers.pop()
+    else: parser = _EpydocParser()
+    try:
+        publish_string(docstring, writer=writer, reader=reader,
+                       parser=parser, settings=_get_settings())
+    finally:
+        _parsers.append(parser)
     return ParsedRstDocstring(writer.document)
 
+_SETTINGS_OVERRIDES = {'report_level':10000, 'halt_level':10000,
+                       'warning_stream':None}
+"""The docutils settings that are used to parse docstrings, in addition
+to the defaults."""
+
+_settings = None
+"""The docutils settings that are used to parse docstrings.  These
+are computed once (by L{_get_settings()}), rather than once for each
+docstring."""
+
+_parsers = []
+"""A pool of L{_EpydocParser}s that are not currently in use."""
+
+def _get_settings():
+    """
+    @return: A copy of the docutils settings that are used to parse
+        docstrings.
+    """
+    global _settings
+    if _settings is None:
+        publisher = docutils.core.Publisher(
+            _EpydocReader([]), _EpydocParser(), _DocumentPseudoWriter())
+        publisher.process_programmatic_settings(None, _SETTINGS_OVERRIDES,
+                                                None)
+        _settings = publisher.settings
+    # Copy the settings, in case parsing modifies them.
+    return copy.copy(_settings)
+
+_PLAINTEXT_LINE = re.compile(r'[a-zA-Z0-9][a-zA-Z0-9 ,;.?!\'"()-]*$')
+"""A regexp matching lines that can't contain any markup.  Lines
+must start with a letter or a digit, and can only contain characters
+that are not used by inline markup, so they can't be list items,
+section titles, field lists, explicit markup, etc."""
+
+_ENUMERATOR = re.compile(r'\w+[.)]( |$)')
+"""A regexp matching lines that might start with an enumerated list
+item (e.g., C{'1.'} or C{'iv)'})."""
+
+def _parse_plaintext(docstring):
+    """
+    If the given docstring contains no markup, then return the
+    document that docutils would build for it (which consists of a
+    paragraph for each group of lines).  Otherwise, return C{None}.
+    """
+    if len(docstring) > 10000: return None
+    paragraphs = []
+    lines = docstring.split('\n')
+    start = None
+    for lineno in range(len(lines)+1):
+        if lineno < len(lines):
+            line = lines[lineno].rstrip()
+        else:
+            line = ''
+        if line:
+            if _PLAINTEXT_LINE.match(line) is None: return None
+            if _ENUMERATOR.match(line): return None
+            if start is None: start = lineno
+        elif start is not None:
+            paragraphs.append(
+                (start, u'\n'.join([l.rstrip() for l in lines[start:lineno]])))
+            start = None
+
+    document = new_document('<string>', _get_settings())
+    for (start, text) in paragraphs:
+        para = docutils.nodes.paragraph(text, text)
+        # Like docutils, give the (1-based) number of the paragraph's
+        # first line.
+        para.source = '<string>'
+        para.line = start + 1
+        document += para
+    return document
+
 class OptimizedReporter(docutils.utils.Reporter):
     """A reporter that ignores all debug messages.  This is used to
     shave a couple seconds off of epydoc's run time, since docutils
@@ -168,10 +261,14 @@ class ParsedRstDocstring(ParsedDocstring):
     def split_fields(self, errors=None):
         # Inherit docs
         if errors is None: errors = []
-        visitor = _SplitFieldsTranslator(self._document, errors)
-        self._document.walk(visitor)
-        if len(self._document.children) > 0:
-            return self, visitor.fields
+        # Splitting removes the fields from the document; so split a
+        # copy if this docstring is shared by the parse cache.
+        document = self._document
+        if self.cached: document = document.deepcopy()
+        visitor = _SplitFieldsTranslator(document, errors)
+        document.walk(visitor)
+        if len(document.children) > 0:
+            return ParsedRstDocstring(document), visitor.fields
         else:
             return None, visitor.fields
 
@@ -265,6 +362,54 @@ class _EpydocReader(ApiLinkReader):
 
         self._errors.append(ParseError(msg, linenum, is_fatal))
         
+class _EpydocParser(docutils.parsers.rst.Parser):
+    """
+    A reStructuredText parser that reuses the same state machine for
+    each document that it parses, rather than building a new one (and
+    all of its states) every time.
+    """
+    def __init__(self, *args, **kwargs):
+        docutils.parsers.rst.Parser.__init__(self, *args, **kwargs)
+        self._statemachine = None
+
+    def parse(self, inputstring, document):
+        inputlines = docutils.statemachine.string2lines(
+            inputstring, tab_width=document.settings.tab_width,
+            convert_whitespace=True)
+
+        # Let the default parser report any lines that are too long.
+        limit = getattr(document.settings, 'line_length_limit', None)
+        if limit is not None:
+            for line in inputlines:
+                if len(line) > limit:
+                    self._statemachine = None
+                    return docutils.parsers.rst.Parser.parse(
+                        self, inputstring, document)
+
+        self.setup_parse(inputstring, document)
+        if self._statemachine is None:
+            self._statemachine = states.RSTStateMachine(
+                state_classes=self.state_classes,
+                initial_state=self.initial_state,
+                debug=document.reporter.debug_flag)
+        self.statemachine = self._statemachine
+        try:
+            self.statemachine.run(inputlines, document, inliner=self.inliner)
+        except:
+            # Don't reuse a state machine that was interrupted.
+            self._statemachine = None
+            raise
+        # StateMachine.run() resets its observers when it is done;
+        # but if the document's source observer is still attached,
+        # detach it, so the reused state machine doesn't keep the
+        # document alive.
+        if document.note_source in self.statemachine.observers:
+            self.statemachine.detach_observer(document.note_source)
+        # restore the "default" default role after parsing a document
+        if '' in roles._roles:
+            del roles._roles['']
+        self.finish_parse()
+
 class _DocumentPseudoWriter(Writer):
     """
     A pseudo-writer for the docutils framework, that can be used to
@@ -0,0 +1,876 @@
+# epydoc -- DocIndex snapshots
+#
+# Copyright (C) 2005 Edward Loper
+# Author: Edward Loper <edloper@loper.org>
+# URL: <http://epydoc.sf.net>
+#
+# $Id$
+
+"""
+A compact binary file format for saving a L{DocIndex} to disk, and
+loading it back in again.  A X{snapshot} lets the documentation be
+built once, and then written out in several formats (e.g., HTML,
+LaTeX, and plaintext) by later runs, without building it again.
+
+A snapshot file consists of a short header, a sequence of named
+X{sections}, and a table of contents giving the offset and length of
+each section:
+
+  - C{meta}: A description of the snapshot (the epydoc and Python
+    versions that wrote it, the names of the root values, and the
+    number of objects it contains).
+  - C{classes}: The C{APIDoc} classes used by the snapshot, as
+    C{(module, name)} pairs.
+  - C{names}: A table of unique identifier strings, and a table of
+    unique L{DottedName}s, each encoded as a tuple of indices into
+    the identifier table.
+  - C{objects}: The X{object table}.  For each C{APIDoc}, this gives
+    the index of its class, and the index of its X{state}, as a pair
+    of 32-bit integers.  C{APIDoc}s that have been merged (see
+    L{APIDoc.merge_and_overwrite()}) share a single state.
+  - C{states}: A pickle stream containing the C{DocIndex}'s own
+    attributes, followed by each C{APIDoc} state.  Within this stream,
+    C{APIDoc}s, C{DottedName}s, and L{UNKNOWN} are encoded as integer
+    references into the object and name tables, rather than by value.
+
+The C{meta}, C{classes} and C{names} sections are encoded with
+C{marshal}.  The table of contents is read when a snapshot is opened,
+but each section is only read and decoded when it is first used; so,
+e.g., L{SnapshotReader.meta()} can describe a snapshot without
+loading any of its docs.
+
+Lazy Snapshots
+==============
+A X{lazy snapshot} (written with C{write_snapshot(..., lazy=True)})
+is organized so that individual C{APIDoc}s can be loaded on demand,
+using L{load_lazy_index()}.  This is useful for programs that only
+look up a few names in a large index (such as a documentation
+server).  In a lazy snapshot, the C{names} and C{states} sections are
+replaced by:
+
+  - C{name-table}: The name table, encoded as a table of offsets into
+    a string containing each name's dotted form.
+  - C{lazy-states}: The C{DocIndex}'s attributes and the C{APIDoc}
+    states, each pickled separately (so shared objects other than
+    C{APIDoc}s and C{DottedName}s are no longer shared).
+  - C{state-offsets}: The offset of each state in C{lazy-states}.
+  - C{name-index}: A sorted table mapping the canonical name of each
+    C{APIDoc} to the indices of the C{VariableDoc} and C{ValueDoc}
+    that L{DocIndex.get_vardoc()} and L{DocIndex.get_valdoc()} return
+    for that name.
+
+The file is memory-mapped, and all of these sections are read in
+place, so loading an C{APIDoc} only touches the parts of the file
+that describe it.
+
+Loading a snapshot allocates every C{APIDoc} (with an empty instance
+dictionary) before any state is read, so the references in the
+C{states} section can be resolved with a single list lookup; and then
+fills in the instance dictionaries in place.  Since an C{APIDoc}'s
+hash value depends on the identity of its instance dictionary, this
+ensures that C{APIDoc}s that are used as dictionary keys (e.g., in
+L{DocIndex.callers}) hash the same way before and after their state
+is loaded.
+
+The C{pyval} attribute of C{ValueDoc}s is only saved if it contains a
+simple builtin value (such as a string, or a list of numbers).  The
+representations returned by L{ValueDoc.pyval_repr()} and
+L{ValueDoc.summary_pyval_repr()} are computed before the snapshot is
+written, and saved along with the C{ValueDoc}.
+"""
+__docformat__ = 'epytext en'
+
+######################################################################
+## Imports
+######################################################################
+
+import sys, struct, marshal, time, mmap
+from array import array
+import pickle
+try: import cPickle
+except ImportError: import pickle as cPickle
+from cStringIO import StringIO
+import epydoc
+from epydoc import log
+from epydoc.apidoc import *
+from epydoc.buildcache import _is_simple_pyval
+from epydoc.compat import * # Backwards compatibility
+
+######################################################################
+## File Format
+######################################################################
+
+MAGIC = 'EPYDOC-SNAPSHOT\n'
+"""The string that every snapshot file begins with."""
+
+FORMAT_VERSION = 2
+"""The version of the snapshot file format.  Snapshots written with a
+different format version can not be read."""
+
+_HEADER_FORMAT = '>%dsIQ' % len(MAGIC)
+"""The C{struct} format of the snapshot header: the L{MAGIC} string,
+the L{FORMAT_VERSION}, and the offset of the table of contents."""
+
+_HEADER_SIZE = struct.calcsize(_HEADER_FORMAT)
+
+_MARSHAL_VERSION = 2
+
+_OBJECT_FORMAT = '>II'
+"""The C{struct} format of an entry in the C{objects} section: the
+object's class index and state index."""
+
+_OBJECT_SIZE = struct.calcsize(_OBJECT_FORMAT)
+
+_NAME_INDEX_FORMAT = '>IIii'
+"""The C{struct} format of an entry in the C{name-index} section: the
+offset and length of the name, and the indices of its C{VariableDoc}
+and C{ValueDoc} (or -1)."""
+
+_NAME_INDEX_SIZE = struct.calcsize(_NAME_INDEX_FORMAT)
+
+_TRANSIENT_ATTRIBS = ('pyval', '_ValueDoc__pickle_state')
+"""C{APIDoc} attributes that are not saved in a snapshot."""
+
+_DOCINDEX_CACHES = {'_container_cache': dict,
+                    '_get_cache': dict,
+                    '_submodule_index': dict,
+                    '_defining_vars': dict,
+                    '_reachable_cache': dict,
+                    '_link_graph': dict,
+                    '_root_index': lambda: None}
+"""C{DocIndex} attributes that are not saved in a snapshot, mapped to
+functions that return their initial values when it is loaded."""
+
+_UNKNOWN_ID = -1
+"""The reference used for L{UNKNOWN} in the C{states} section.  Objects
+are referenced by their (non-negative) index in the object table;
+and the M{i}th name is referenced as M{-(i+2)}.  So the reader can
+resolve every reference by indexing into the list C{objects +
+reversed(names) + [UNKNOWN]}."""
+
+class SnapshotError(Exception):
+    """
+    An exception raised when a file can not be read as a snapshot.
+    """
+
+######################################################################
+## Writing
+######################################################################
+
+class SnapshotWriter:
+    """
+    A helper class used to encode a L{DocIndex} as a snapshot.  Use
+    L{write_snapshot()} to write a snapshot file.
+    """
+    def __init__(self, docindex, lazy=False):
+        self.docindex = docindex
+        self.lazy = lazy
+        self._objects = []     # The object table.
+        self._object_ids = {}  # id(APIDoc) -> index in _objects
+        self._object_classes = []
+        self._object_states = []
+        self._states = []      # One representative APIDoc per state.
+        self._state_ids = {}   # id(APIDoc.__dict__) -> index in _states
+        self._classes = []
+        self._class_ids = {}
+        self._strings = []
+        self._string_ids = {}
+        self._names = []
+        self._name_ids = {}
+
+    def sections(self):
+        """
+        Encode the index, and return a list of C{(name, data)} pairs
+        for the snapshot's sections.
+        """
+        if self.lazy:
+            states, state_offsets = self._encode_lazy_states()
+        else:
+            states = self._encode_states()
+        sections = [('meta', self._dumps(self._meta())),
+                    ('classes', self._dumps(self._classes)),
+                    ('objects', self._encode_objects())]
+        if self.lazy:
+            sections += [('name-table', self._encode_name_table()),
+                         ('lazy-states', states),
+                         ('state-offsets', state_offsets),
+                         ('name-index', self._encode_name_index())]
+        else:
+            sections += [('names', self._dumps((self._strings,
+                                                self._names))),
+                         ('states', states)]
+        return sections
+
+    def _dumps(self, value):
+        return marshal.dumps(value, _MARSHAL_VERSION)
+
+    def _meta(self):
+        return dict(epydoc_version=epydoc.__version__,
+                    python_version=sys.version.split()[0],
+                    created=time.time(),
+                    root=[str(val_doc.canonical_name)
+                          for val_doc in self.docindex.root],
+                    objects=len(self._objects),
+                    lazy=self.lazy)
+
+    def _encode_objects(self):
+        objects = array('I')
+        for (class_id, state_id) in zip(self._object_classes,
+                                        self._object_states):
+            objects.append(class_id)
+            objects.append(state_id)
+        if sys.byteorder == 'little':
+            objects.byteswap()
+        return objects.tostring()
+
+    def _encode_states(self):
+        out = StringIO()
+        pickler = cPickle.Pickler(out, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = self._persistent_id
+        pickler.dump(self._docindex_state())
+        # Encoding a state may add new entries to self._states.
+        i = 0
+        while i < len(self._states):
+            pickler.dump(self._apidoc_state(self._states[i]))
+            i += 1
+        return out.getvalue()
+
+    def _encode_lazy_states(self):
+        """
+        Encode the C{DocIndex}'s attributes and the C{APIDoc} states as
+        separate pickles.  Return the pickles, and a string containing
+        the offset of each pickle (and of the end of the last one).
+        """
+        out = StringIO()
+        pickler = cPickle.Pickler(out, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = self._persistent_id
+        offsets = [0]
+        pickler.dump(self._docindex_state())
+        offsets.append(out.tell())
+        i = 0
+        while i < len(self._states):
+            pickler.clear_memo()
+            pickler.dump(self._apidoc_state(self._states[i]))
+            offsets.append(out.tell())
+            i += 1
+        return out.getvalue(), struct.pack('>%dQ' % len(offsets), *offsets)
+
+    def _encode_name_table(self):
+        names = ['.'.join([_encode_identifier(self._strings[i])
+                           for i in name]) for name in self._names]
+        return _encode_string_table(names)
+
+    def _encode_name_index(self):
+        """
+        Encode a sorted table that maps the canonical name of each
+        C{APIDoc} in the object table to the C{(VariableDoc,
+        ValueDoc)} pair that the index returns for that name.
+        """
+        entries = {}
+        for api_doc in self._objects:
+            name = api_doc.canonical_name
+            if not isinstance(name, DottedName): continue
+            key = '.'.join([_encode_identifier(s)
+                            for s in name._identifiers])
+            if key in entries: continue
+            var_doc, val_doc = self.docindex._get(name)
+            if var_doc is None and val_doc is None: continue
+            entries[key] = (self._object_ids.get(id(var_doc), -1),
+                            self._object_ids.get(id(val_doc), -1))
+        keys = sorted(entries)
+        index = [struct.pack('>I', len(keys))]
+        offset = 0
+        for key in keys:
+            index.append(struct.pack(_NAME_INDEX_FORMAT, offset, len(key),
+                                     *entries[key]))
+            offset += len(key)
+        return ''.join(index + keys)
+
+    def _docindex_state(self):
+        state = self.docindex.__dict__.copy()
+        for attr in _DOCINDEX_CACHES:
+            state.pop(attr, None)
+        return state
+
+    def _apidoc_state(self, api_doc):
+        # Make sure the value's representations are cached, since its
+        # pyval will not be available when the snapshot is loaded.
+        if isinstance(api_doc, ValueDoc):
+            api_doc.pyval_repr()
+            api_doc.summary_pyval_repr()
+        state = dict(api_doc.__dict__)
+        for attr in _TRANSIENT_ATTRIBS:
+            state.pop(attr, None)
+        # Simple values are kept, since writers may ask for their
+        # representations using other line lengths.
+        if ('pyval' in api_doc.__dict__ and
+            _is_simple_pyval(api_doc.__dict__['pyval'])):
+            state['pyval'] = api_doc.__dict__['pyval']
+        return state
+
+    def _persistent_id(self, obj):
+        if obj is UNKNOWN:
+            return _UNKNOWN_ID
+        elif isinstance(obj, APIDoc):
+            return self._object_id(obj)
+        elif isinstance(obj, DottedName):
+            return -2 - self._name_id(obj)
+        else:
+            return None
+
+    def _object_id(self, api_doc):
+        """
+        Return the index of C{api_doc} in the object table, adding it
+        (and its state) to the table if necessary.
+        """
+        object_id = self._object_ids.get(id(api_doc))
+        if object_id is None:
+            object_id = self._object_ids[id(api_doc)] = len(self._objects)
+            self._objects.append(api_doc)
+            cls = api_doc.__class__
+            class_id = self._class_ids.get(cls)
+            if class_id is None:
+                class_id = self._class_ids[cls] = len(self._classes)
+                self._classes.append((cls.__module__, cls.__name__))
+            self._object_classes.append(class_id)
+            state_id = self._state_ids.get(id(api_doc.__dict__))
+            if state_id is None:
+                state_id = len(self._states)
+                self._state_ids[id(api_doc.__dict__)] = state_id
+                self._states.append(api_doc)
+            self._object_states.append(state_id)
+        return object_id
+
+    def _name_id(self, name):
+        """
+        Return the index of C{name} in the name table, adding it (and
+        any new identifiers) to the table if necessary.
+        """
+        identifiers = name._identifiers
+        name_id = self._name_ids.get(identifiers)
+        if name_id is None:
+            name_id = self._name_ids[identifiers] = len(self._names)
+            self._names.append(tuple([self._string_id(s)
+                                      for s in identifiers]))
+        return name_id
+
+    def _string_id(self, s):
+        string_id = self._string_ids.get(s)
+        if string_id is None:
+            string_id = self._string_ids[s] = len(self._strings)
+            self._strings.append(s)
+        return string_id
+
+def _encode_identifier(s):
+    if isinstance(s, unicode): return s.encode('utf-8')
+    else: return s
+
+def _encode_string_table(strings):
+    """
+    Encode a list of strings as a count, followed by the offset of
+    each string (and of the end of the last one), followed by the
+    strings themselves.
+    """
+    offsets = [0]
+    for s in strings:
+        offsets.append(offsets[-1]+len(s))
+    return (struct.pack('>I%dI' % len(offsets), len(strings), *offsets) +
+            ''.join(strings))
+
+def write_snapshot(docindex, filename, lazy=False):
+    """
+    Write a snapshot of C{docindex} to the file C{filename}.
+
+    @param lazy: If true, then write a lazy snapshot, which can be
+        loaded using L{load_lazy_index()}.
+    """
+    sections = SnapshotWriter(docindex, lazy).sections()
+    toc = {}
+    offset = _HEADER_SIZE
+    for (name, data) in sections:
+        toc[name] = (offset, len(data))
+        offset += len(data)
+    out = open(filename, 'wb')
+    try:
+        out.write(struct.pack(_HEADER_FORMAT, MAGIC, FORMAT_VERSION, offset))
+        for (name, data) in sections:
+            out.write(data)
+        out.write(marshal.dumps(toc, _MARSHAL_VERSION))
+    finally:
+        out.close()
+
+######################################################################
+## Reading
+######################################################################
+
+class SnapshotReader:
+    """
+    A reader for snapshot files written by L{write_snapshot()}.  The
+    snapshot file is memory-mapped (when possible), and its table of
+    contents is read when the reader is created; its sections are
+    read when they are first used.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        """The name of the snapshot file.
+           @type: C{str}"""
+
+        self._file = open(filename, 'rb')
+        try:
+            try:
+                self._data = mmap.mmap(self._file.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+            except (EnvironmentError, ValueError):
+                self._data = self._file.read()
+            self.toc = self._read_toc()
+            """A dictionary mapping each section name to its
+               C{(offset, length)} in the snapshot file."""
+        except:
+            self.close()
+            raise
+
+    def _read_toc(self):
+        header = self._data[:_HEADER_SIZE]
+        if len(header) != _HEADER_SIZE or not header.startswith(MAGIC):
+            raise SnapshotError('%s is not an epydoc snapshot' %
+                                self.filename)
+        magic, version, toc_offset = struct.unpack(_HEADER_FORMAT, header)
+        if version != FORMAT_VERSION:
+            raise SnapshotError('%s uses snapshot format version %d; '
+                                'expected version %d' %
+                                (self.filename, version, FORMAT_VERSION))
+        try:
+            return marshal.loads(self._data[toc_offset:])
+        except (ValueError, EOFError, TypeError), e:
+            raise SnapshotError('%s is corrupt: %s' % (self.filename, e))
+
+    def close(self):
+        if isinstance(getattr(self, '_data', None), mmap.mmap):
+            self._data.close()
+        self._data = None
+        self._file.close()
+
+    def section_offset(self, name):
+        """
+        Return the offset of the section C{name} in the snapshot file.
+        @raise SnapshotError: If the snapshot has no such section.
+        """
+        if name not in self.toc:
+            raise SnapshotError('%s has no %r section' %
+                                (self.filename, name))
+        return self.toc[name][0]
+
+    def read(self, offset, length):
+        """
+        Return C{length} bytes of the snapshot file, starting at
+        C{offset}.
+        """
+        data = self._data[offset:offset+length]
+        if len(data) != length:
+            raise SnapshotError('%s is truncated' % self.filename)
+        return data
+
+    def unpack(self, format, offset):
+        """
+        Unpack a C{struct} of the given format from the snapshot file,
+        starting at C{offset}.
+        """
+        try:
+            return struct.unpack_from(format, self._data, offset)
+        except struct.error, e:
+            raise SnapshotError('%s is truncated' % self.filename)
+
+    def read_section(self, name):
+        """
+        Return the contents of the section C{name}, as a string.
+        @raise SnapshotError: If the snapshot has no such section.
+        """
+        offset = self.section_offset(name)
+        return self.read(offset, self.toc[name][1])
+
+    def _loads(self, name):
+        try:
+            return marshal.loads(self.read_section(name))
+        except (ValueError, EOFError, TypeError), e:
+            raise SnapshotError('%s is corrupt: %s' % (self.filename, e))
+
+    def meta(self):
+        """
+        Return a dictionary describing the snapshot.  Its keys are
+        C{'epydoc_version'}, C{'python_version'}, C{'created'},
+        C{'root'} (the names of the index's root values), C{'objects'}
+        (the number of C{APIDoc}s in the snapshot), and C{'lazy'}
+        (true for lazy snapshots).
+        """
+        return self._loads('meta')
+
+    def is_lazy(self):
+        """
+        Return true if this is a lazy snapshot.
+        """
+        return 'lazy-states' in self.toc
+
+    def load_names(self):
+        """
+        Return the snapshot's name table, as a list of L{DottedName}s.
+        """
+        strings, names = self._loads('names')
+        strings = [_intern(s) for s in strings]
+        return [DottedName(tuple([strings[i] for i in name]))
+                for name in names]
+
+    def load_classes(self):
+        """
+        Return the list of C{APIDoc} classes used by the snapshot.
+        @raise SnapshotError: If a class can not be found.
+        """
+        classes = []
+        for (module_name, class_name) in self._loads('classes'):
+            try:
+                __import__(module_name)
+                cls = getattr(sys.modules[module_name], class_name)
+            except (ImportError, KeyError, AttributeError):
+                cls = None
+            if not (isinstance(cls, type) and issubclass(cls, APIDoc)):
+                raise SnapshotError('%s uses unknown class %s.%s' %
+                                    (self.filename, module_name, class_name))
+            classes.append(cls)
+        return classes
+
+    def load_objects(self):
+        """
+        Return the snapshot's object table, as a pair of arrays
+        C{(class_ids, state_ids)}.
+        """
+        objects = array('I', self.read_section('objects'))
+        if sys.byteorder == 'little':
+            objects.byteswap()
+        return objects[0::2], objects[1::2]
+
+    def _check_version(self):
+        meta = self.meta()
+        if meta.get('epydoc_version') != epydoc.__version__:
+            log.warning('%s was written by epydoc %s' %
+                        (self.filename, meta.get('epydoc_version')))
+
+    def load_index(self):
+        """
+        Load the snapshot's L{DocIndex}.  If this is a lazy snapshot,
+        then all of its C{APIDoc}s are loaded.
+        """
+        if self.is_lazy():
+            docindex = self.load_lazy_index()
+            docindex._loader.load_all()
+            state = docindex.__dict__.copy()
+            del state['_loader']
+            return _new_docindex(state)
+        self._check_version()
+
+        # Allocate the APIDocs, and their (shared) instance dictionaries.
+        classes = self.load_classes()
+        object_classes, object_states = self.load_objects()
+        # (The first APIDoc with each state provides the dictionary
+        # that the others share.)
+        states = [None] * (max(object_states or [-1])+1)
+        objects = []
+        for (class_id, state_id) in zip(object_classes, object_states):
+            cls = classes[class_id]
+            api_doc = cls.__new__(cls)
+            if states[state_id] is None:
+                states[state_id] = api_doc.__dict__
+            else:
+                api_doc.__dict__ = states[state_id]
+            objects.append(api_doc)
+
+        # Fill in their contents.
+        names = self.load_names()
+        names.reverse()
+        table = objects + names + [UNKNOWN]
+        unpickler = cPickle.Unpickler(StringIO(self.read_section('states')))
+        unpickler.persistent_load = table.__getitem__
+        try:
+            docindex_state = unpickler.load()
+            for state in states:
+                state.update(unpickler.load())
+        except (pickle.UnpicklingError, EOFError, IndexError), e:
+            raise SnapshotError('%s is corrupt: %s' % (self.filename, e))
+
+        return _new_docindex(docindex_state)
+
+    def load_lazy_index(self):
+        """
+        Return a L{LazyDocIndex} for this lazy snapshot.  The reader
+        must not be closed while the index is in use.
+        @raise SnapshotError: If this is not a lazy snapshot.
+        """
+        if not self.is_lazy():
+            raise SnapshotError('%s is not a lazy snapshot' % self.filename)
+        self._check_version()
+        loader = _LazyLoader(self)
+        docindex = _new_docindex(loader.load_state(0), LazyDocIndex)
+        docindex._loader = loader
+        return docindex
+
+def _new_docindex(state, cls=DocIndex):
+    """
+    Return a new L{DocIndex} with the given attributes, without
+    calling its constructor.
+    """
+    class _Blank: pass
+    docindex = _Blank()
+    docindex.__class__ = cls
+    docindex.__dict__.update(state)
+    for (attr, initial_value) in _DOCINDEX_CACHES.items():
+        setattr(docindex, attr, initial_value())
+    return docindex
+
+######################################################################
+## Lazy Loading
+######################################################################
+
+class LazyDocIndex(DocIndex):
+    """
+    A L{DocIndex} whose C{APIDoc}s are loaded from a lazy snapshot
+    when they are first used.  Use L{load_lazy_index()} to create a
+    C{LazyDocIndex}.
+
+    The C{APIDoc}s in a lazy index are created as empty X{stubs}.  A
+    stub is an instance of a subclass of its C{APIDoc} class, so
+    C{isinstance} checks do not load it; but any attribute access or
+    assignment loads its state from the snapshot and changes its class to its
+    real class.  L{get_vardoc()} and L{get_valdoc()} look names up in
+    the snapshot's name index, so only the requested C{APIDoc}s are
+    loaded.  (Names that are not in the index, such as names that go
+    through an alias, are looked up by L{DocIndex._get()}.)
+    """
+    def _get(self, name):
+        if not isinstance(name, DottedName):
+            name = DottedName(name)
+        val = self._get_cache.get(name)
+        if val is not None: return val
+        val = self._loader.lookup(name)
+        if val is None:
+            return DocIndex._get(self, name)
+        self._get_cache[name] = val
+        return val
+
+    def close(self):
+        """
+        Close the snapshot file.  Any C{APIDoc}s that have not been
+        loaded yet can no longer be used.
+        """
+        self._loader.reader.close()
+
+def _lazy_getattribute(self, attr):
+    """
+    The C{__getattribute__} method for stub C{APIDoc}s: load the
+    stub's state, and then look up C{attr} normally.
+    """
+    type(self)._snapshot_loader.load_object(self)
+    return getattr(self, attr)
+
+def _lazy_setattr(self, attr, val):
+    type(self)._snapshot_loader.load_object(self)
+    setattr(self, attr, val)
+
+def _lazy_delattr(self, attr):
+    type(self)._snapshot_loader.load_object(self)
+    delattr(self, attr)
+
+class _LazyLoader:
+    """
+    A helper for L{LazyDocIndex}, which creates and loads C{APIDoc}s
+    from a lazy snapshot.
+    """
+    def __init__(self, reader):
+        self.reader = reader
+        self._classes = reader.load_classes()
+        self._stub_classes = {}
+        self._objects_offset = reader.section_offset('objects')
+        self._states_offset = reader.section_offset('lazy-states')
+        self._offsets_offset = reader.section_offset('state-offsets')
+        self._names_offset = reader.section_offset('name-table')
+        self._num_names = reader.unpack('>I', self._names_offset)[0]
+        self._names_data = (self._names_offset + 4 +
+                            4 * (self._num_names + 1))
+        self._index_offset = reader.section_offset('name-index')
+        self._num_index = reader.unpack('>I', self._index_offset)[0]
+        self._index_data = (self._index_offset + 4 +
+                            _NAME_INDEX_SIZE * self._num_index)
+        self._objects = {}     # object id -> APIDoc
+        self._names = {}       # name id -> DottedName
+        self._state_dicts = {} # state id -> APIDoc.__dict__
+        self._loaded = set()   # state ids
+        self._pending = {}     # id(stub) -> object id
+
+    def load_state(self, i):
+        """
+        Load the M{i}th pickle from the C{lazy-states} section.  (The
+        first pickle contains the C{DocIndex}'s attributes; and pickle
+        M{i+1} contains the M{i}th C{APIDoc} state.)
+        """
+        start, end = self.reader.unpack('>QQ', self._offsets_offset + 8*i)
+        data = self.reader.read(self._states_offset+start, end-start)
+        unpickler = cPickle.Unpickler(StringIO(data))
+        unpickler.persistent_load = self.persistent_load
+        try:
+            return unpickler.load()
+        except (pickle.UnpicklingError, EOFError, IndexError), e:
+            raise SnapshotError('%s is corrupt: %s' %
+                                (self.reader.filename, e))
+
+    def persistent_load(self, pid):
+        if pid >= 0:
+            return self.get_object(pid)
+        elif pid == _UNKNOWN_ID:
+            return UNKNOWN
+        else:
+            return self.get_name(-2-pid)
+
+    def get_name(self, name_id):
+        name = self._names.get(name_id)
+        if name is None:
+            start, end = self.reader.unpack(
+                '>II', self._names_offset + 4 + 4*name_id)
+            s = self.reader.read(self._names_data+start, end-start)
+            name = DottedName(tuple([_decode_identifier(ident)
+                                     for ident in s.split('.')]))
+            self._names[name_id] = name
+        return name
+
+    def get_object(self, object_id):
+        """
+        Return the C{APIDoc} with the given index in the object table.
+        If it has not been created yet, then create it as a stub.
+        """
+        api_doc = self._objects.get(object_id)
+        if api_doc is None:
+            class_id, state_id = self.reader.unpack(
+                _OBJECT_FORMAT, self._objects_offset+_OBJECT_SIZE*object_id)
+            stub_class = self._stub_class(self._classes[class_id])
+            api_doc = stub_class.__new__(stub_class)
+            state = self._state_dicts.get(state_id)
+            if state is None:
+                self._state_dicts[state_id] = object.__getattribute__(
+                    api_doc, '__dict__')
+            else:
+                object.__setattr__(api_doc, '__dict__', state)
+            if state_id in self._loaded:
+                object.__setattr__(api_doc, '__class__', stub_class.__base__)
+            else:
+                self._pending[id(api_doc)] = state_id
+            self._objects[object_id] = api_doc
+        return api_doc
+
+    def _stub_class(self, cls):
+        stub_class = self._stub_classes.get(cls)
+        if stub_class is None:
+            stub_class = type(cls.__name__, (cls,),
+                              dict(__slots__=(),
+                                   __getattribute__=_lazy_getattribute,
+                                   __setattr__=_lazy_setattr,
+                                   __delattr__=_lazy_delattr,
+                                   __module__=cls.__module__,
+                                   _snapshot_loader=self))
+            self._stub_classes[cls] = stub_class
+        return stub_class
+
+    def load_object(self, api_doc):
+        """
+        Load the state of the stub C{api_doc}, and change its class to
+        its real class.
+        """
+        state_id = self._pending.pop(id(api_doc))
+        # Change the class first: unpickling the state may hash
+        # api_doc (e.g., if it's used as a dictionary key).
+        object.__setattr__(api_doc, '__class__', type(api_doc).__base__)
+        if state_id not in self._loaded:
+            self._loaded.add(state_id)
+            state = self.load_state(state_id+1)
+            object.__getattribute__(api_doc, '__dict__').update(state)
+
+    def load_all(self):
+        """
+        Load every C{APIDoc} in the snapshot.
+        """
+        num_objects = (self.reader.toc['objects'][1] / _OBJECT_SIZE)
+        for object_id in range(num_objects):
+            api_doc = self.get_object(object_id)
+            if id(api_doc) in self._pending:
+                self.load_object(api_doc)
+
+    def _get_ref(self, object_id):
+        if object_id < 0: return None
+        else: return self.get_object(object_id)
+
+    def lookup(self, name):
+        """
+        Look up C{name} in the snapshot's name index, using a binary
+        search.  Return a C{(var_doc, val_doc)} pair, or C{None} if
+        C{name} is not in the index.
+        """
+        key = '.'.join([_encode_identifier(s) for s in name._identifiers])
+        lo, hi = 0, self._num_index
+        while lo < hi:
+            mid = (lo+hi)//2
+            entry = self.reader.unpack(_NAME_INDEX_FORMAT, self._index_offset
+                                       + 4 + _NAME_INDEX_SIZE*mid)
+            entry_key = self.reader.read(self._index_data+entry[0], entry[1])
+            if entry_key == key:
+                return self._get_ref(entry[2]), self._get_ref(entry[3])
+            elif entry_key < key:
+                lo = mid+1
+            else:
+                hi = mid
+        return None
+
+def _intern(s):
+    """
+    Return the interned copy of the identifier string C{s}, so that
+    the L{DottedName}s loaded from a snapshot share their strings
+    with the rest of the program.
+    """
+    if type(s) is str: return intern(s)
+    else: return s
+
+def _decode_identifier(s):
+    try:
+        s.decode('ascii')
+    except UnicodeError:
+        return s.decode('utf-8')
+    return intern(s)
+
+def read_snapshot(filename):
+    """
+    Load the L{DocIndex} from the snapshot file C{filename}.
+    @raise SnapshotError: If the file is not a valid snapshot.
+    """
+    reader = SnapshotReader(filename)
+    try:
+        return reader.load_index()
+    finally:
+        reader.close()
+
+def is_snapshot(filename):
+    """
+    Return true if C{filename} is a snapshot file.
+    """
+    f = open(filename, 'rb')
+    try:
+        return f.read(len(MAGIC)) == MAGIC
+    finally:
+        f.close()
+
+def load_lazy_index(filename):
+    """
+    Return a L{LazyDocIndex} for the lazy snapshot file C{filename}.
+    The file is kept open (and memory-mapped) until the index's
+    L{close()<LazyDocIndex.close>} method is called.
+    @raise SnapshotError: If the file is not a valid lazy snapshot.
+    """
+    reader = SnapshotReader(filename)
+    try:
+        return reader.load_lazy_index()
+    except:
+        reader.close()
+        raise
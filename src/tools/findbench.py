@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+A benchmark for cross-reference resolution with L{DocIndex.find()
+<epydoc.apidoc.DocIndex.find>}.  A synthetic index is built for a
+package with C{MODULES} modules, each of which defines C{CLASSES}
+classes with C{METHODS} methods (100,000 identifiers by default);
+and then a mix of relative, absolute, C{self.}-prefixed, module-level
+class and unresolvable names are looked up from the context of
+methods.  Each pass uses a new C{DocIndex}, so the first pass shows
+the time with empty caches.
+
+Usage::
+
+    findbench.py [MODULES CLASSES METHODS]
+"""
+__docformat__ = 'epytext en'
+
+import sys, os, time
+
+# Make sure path contains the 'right' epydoc.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from epydoc.apidoc import *
+
+def build_index(num_modules, num_classes, num_methods):
+    """
+    Return a list of C{ModuleDoc}s for a synthetic package, and a list
+    of its C{RoutineDoc}s.
+    """
+    package = ModuleDoc(canonical_name=DottedName('pkg'), variables={},
+                        submodules=[], is_package=True)
+    modules = [package]
+    methods = []
+    for m in range(num_modules):
+        mname = package.canonical_name + ('mod%d' % m)
+        module = ModuleDoc(canonical_name=mname, variables={},
+                           package=package, submodules=[])
+        module.defining_module = module
+        package.submodules.append(module)
+        for c in range(num_classes):
+            cname = mname + ('Class%d_%d' % (m, c))
+            cls = ClassDoc(canonical_name=cname, variables={}, bases=[],
+                           defining_module=module)
+            module.variables[cname[-1]] = VariableDoc(
+                name=cname[-1], value=cls, container=module,
+                is_imported=False)
+            for f in range(num_methods):
+                fname = cname + ('method%d' % f)
+                func = RoutineDoc(canonical_name=fname,
+                                  defining_module=module,
+                                  posargs=['self'], vararg=None,
+                                  kwarg=None, lineno=f)
+                cls.variables[fname[-1]] = VariableDoc(
+                    name=fname[-1], value=func, container=cls,
+                    is_imported=False)
+                methods.append(func)
+        modules.append(module)
+    return modules, methods
+
+def queries(methods, num_queries):
+    """
+    Return a list of C{(name, context)} pairs to look up.
+    """
+    step = max(1, len(methods) / num_queries)
+    result = []
+    for func in methods[::step][:num_queries]:
+        name = func.canonical_name
+        result.append(('method0', func))                # sibling
+        result.append(('self.method1', func))           # self.
+        result.append((name[-2], func))                 # enclosing class
+        result.append((str(name[-3:-1]), func))         # module.Class
+        result.append((str(name), func))                # absolute
+        result.append(('Class0_0', func))               # module-level class
+        result.append(('no_such_name', func))           # not found
+    return result
+
+def main(args):
+    if args: sizes = [int(arg) for arg in args]
+    else: sizes = [50, 20, 100]
+    modules, methods = build_index(*sizes)
+    pairs = queries(methods, 3000)
+    print '%d identifiers, %d lookups per pass' % (len(methods), len(pairs))
+    docindex = DocIndex(modules)
+    for i in range(3):
+        docindex = DocIndex(modules)
+        start = time.time()
+        for (name, context) in pairs:
+            docindex.find(name, context)
+        elapsed = time.time() - start
+        print 'pass %d: %8.3f s %10.0f lookups/s' % (
+            i+1, elapsed, len(pairs)/elapsed)
+    start = time.time()
+    for (name, context) in pairs:
+        docindex.find(name, context)
+    elapsed = time.time() - start
+    print 'cached: %8.3f s %10.0f lookups/s' % (elapsed, len(pairs)/elapsed)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Measure the peak memory use of building the API documentation for a
+set of modules, with and without compact L{APIDoc
+<epydoc.apidoc.APIDoc>} storage (see L{epydoc.COMPACT_APIDOCS}).
+
+Usage::
+
+    membench.py [--parse-only|--introspect-only] NAME...
+
+Each build is run in a separate process, so the peak resident set
+sizes do not affect each other.
+"""
+__docformat__ = 'epytext en'
+
+import sys, os, time, resource
+
+# Make sure path contains the 'right' epydoc.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+def build(names, options):
+    """
+    Build the docs for C{names}, and print a line describing the
+    time and memory that were used.  This is run in the child
+    processes.
+    """
+    import epydoc
+    from epydoc import log
+    from epydoc.docbuilder import build_doc_index
+    from epydoc.apidoc import reachable_valdocs, VariableDoc
+    log.register_logger(log.SimpleLogger(log.FATAL))
+    start = time.time()
+    docindex = build_doc_index(names, **options)
+    elapsed = time.time() - start
+    valdocs = reachable_valdocs(docindex.root, imports=False)
+    num_vars = sum([len(getattr(val_doc, 'variables', None) or ())
+                    for val_doc in valdocs])
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print '%-8s %8.1f MB %8.2f s %8d values %8d variables' % (
+        epydoc.COMPACT_APIDOCS and 'compact' or 'default',
+        peak/1024., elapsed, len(valdocs), num_vars)
+
+def main(args):
+    options = {}
+    if '--parse-only' in args: options['introspect'] = False
+    if '--introspect-only' in args: options['parse'] = False
+    names = [arg for arg in args if not arg.startswith('--')]
+    if not names:
+        print __doc__.split('Usage::')[1].split('\n\n')[0]
+        sys.exit(1)
+    if os.environ.get('MEMBENCH_CHILD'):
+        return build(names, options)
+    for compact in ('', '1'):
+        env = dict(os.environ, MEMBENCH_CHILD='1',
+                   EPYDOC_COMPACT_APIDOCS=compact)
+        status = os.spawnve(os.P_WAIT, sys.executable,
+                            [sys.executable, __file__] + args, env)
+        if status != 0: sys.exit(status)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
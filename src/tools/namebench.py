@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+A microbenchmark for L{DottedName <epydoc.apidoc.DottedName>}
+operations.  The docs for the given modules (by default, epydoc
+itself) are built, and then their canonical names are used to time
+name construction, hashing, sorting, L{DocIndex._get()
+<epydoc.apidoc.DocIndex._get>}, L{contextualize()
+<epydoc.apidoc.DottedName.contextualize>} and L{dominates()
+<epydoc.apidoc.DottedName.dominates>}.
+
+Usage::
+
+    namebench.py [NAME...]
+"""
+__docformat__ = 'epytext en'
+
+import sys, os, time
+
+# Make sure path contains the 'right' epydoc.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from epydoc import log
+from epydoc.apidoc import DottedName, UNKNOWN, reachable_valdocs
+from epydoc.docbuilder import build_doc_index
+
+def bench(label, func, repeat=20):
+    """
+    Call C{func} C{repeat} times, and print the best time.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best: best = elapsed
+    print '%-24s %8.1f ms' % (label, best*1000)
+
+def main(modules):
+    log.register_logger(log.SimpleLogger(log.FATAL))
+    docindex = build_doc_index(modules or ['epydoc'], introspect=False)
+    valdocs = reachable_valdocs(docindex.root, imports=False)
+    names = [val_doc.canonical_name for val_doc in valdocs
+             if isinstance(val_doc.canonical_name, DottedName)]
+    names.sort()
+    strings = [str(name) for name in names]
+    tuples = [name._identifiers for name in names]
+    contexts = [name.container() or UNKNOWN for name in names]
+    pairs = zip(names, contexts)
+    print '%d names' % len(names)
+
+    def construct_strings():
+        for s in strings: DottedName(s)
+    def construct_tuples():
+        for t in tuples: DottedName(t)
+    def concatenate():
+        for (name, context) in pairs:
+            if context is not UNKNOWN: context + name[-1]
+    def hashing():
+        for i in range(10):
+            d = dict.fromkeys(names)
+    def sorting():
+        for i in range(10):
+            sorted(names, reverse=True)
+    def get():
+        for name in names:
+            docindex._get_cache.clear()
+            docindex._get(name)
+    def contextualize():
+        for (name, context) in pairs:
+            name.contextualize(context)
+            name.contextualize(names[0])
+    def dominates():
+        for (name, context) in pairs:
+            if context is not UNKNOWN:
+                context.dominates(name)
+                name.dominates(context, True)
+
+    bench('DottedName(str)', construct_strings)
+    bench('DottedName(tuple)', construct_tuples)
+    bench('DottedName + str', concatenate)
+    bench('hash (x10)', hashing)
+    bench('sorted (x10)', sorting)
+    bench('DocIndex._get', get)
+    bench('contextualize', contextualize)
+    bench('dominates', dominates)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])